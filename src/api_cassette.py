@@ -0,0 +1,218 @@
+"""
+Record/replay of Google API HTTP traffic for offline runs and benchmarks.
+
+Every script needs live Workspace credentials, so the Gmail / Reports /
+Directory hot paths could not be profiled or regression-tested. With
+API_CASSETTE set, workspace_auth.build_service() puts a CassetteHttp under
+the discovery client:
+
+- record: requests go to Google as usual and every response (status,
+  headers, body, elapsed time) is appended to a gzip-compressed JSON-lines
+  cassette.
+- replay: responses come from the cassette, no credentials or network
+  needed. Identical requests are answered in the order they were recorded
+  (the last answer repeats once they run out), so a replayed run is
+  deterministic. Batch requests are matched with their random multipart
+  boundary and Content-ID prefix normalised, and the replayed response is
+  rewritten to the new Content-IDs.
+
+Requests whose exact URL is not in the cassette fall back to matching
+without the volatile query parameters in API_CASSETTE_IGNORE_PARAMS
+(startTime/endTime by default, which scripts derive from the current date),
+but only when the cassette holds exactly one window for that request.
+Anything else raises CassetteMiss rather than answering with pages from a
+different window. Runs whose windows depend on timing cannot be replayed
+that way, so while a cassette is active reports_activities fetches
+without time shards (as REPORTS_SHARDS=1 would); reports_probe bisection
+only replays when the probed windows come out the same.
+
+Replay latency can be injected to benchmark realistic concurrency:
+API_CASSETTE_LATENCY_SCALE multiplies the recorded time of each response
+(0 = as fast as possible, 1 = as recorded) and API_CASSETTE_LATENCY_MS adds
+a fixed delay per request.
+
+Usage:
+    API_CASSETTE=output/cassettes/audit.jsonl.gz API_CASSETTE_MODE=record \\
+        python askmoss/comprehensive_security_audit.py
+    API_CASSETTE=output/cassettes/audit.jsonl.gz API_CASSETTE_MODE=replay \\
+        API_CASSETTE_LATENCY_SCALE=1 python askmoss/comprehensive_security_audit.py
+
+Scripts that call googleapiclient's build() directly instead of
+build_service() are not covered.
+"""
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+import httplib2
+
+CASSETTE_PATH = os.getenv('API_CASSETTE')
+MODE = os.getenv('API_CASSETTE_MODE', 'replay').lower() if CASSETTE_PATH else None
+
+IGNORE_PARAMS = {p for p in os.getenv('API_CASSETTE_IGNORE_PARAMS', 'startTime,endTime').split(',') if p}
+LATENCY_SCALE = float(os.getenv('API_CASSETTE_LATENCY_SCALE', '0'))
+LATENCY_MS = float(os.getenv('API_CASSETTE_LATENCY_MS', '0'))
+
+BOUNDARY_RE = re.compile(rb'={15}\d+==')
+CONTENT_ID_RE = re.compile(rb'<([0-9a-f-]{36}) ?\+')
+
+
+class CassetteMiss(Exception):
+    """A replayed run made a request that was never recorded."""
+
+
+class ReplayCredentials:
+    """Stand-in for delegated credentials while replaying (never refreshed)."""
+
+    def __init__(self, subject=None):
+        self._subject = subject
+        self.valid = True
+
+
+def _content_id_prefix(body):
+    match = CONTENT_ID_RE.search(body or b'')
+    return match.group(1) if match else None
+
+
+def _normalise_body(body):
+    body = body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    body = BOUNDARY_RE.sub(b'BOUNDARY', body)
+    prefix = _content_id_prefix(body)
+    if prefix:
+        body = body.replace(prefix, b'CONTENT-ID')
+    return body
+
+
+def _keys(method, uri, body):
+    """(exact key, loose key) for a request."""
+    digest = hashlib.sha256(_normalise_body(body)).hexdigest()
+    parsed = urllib.parse.urlsplit(uri)
+    query = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+    loose_query = urllib.parse.urlencode(sorted(q for q in query if q[0] not in IGNORE_PARAMS))
+    exact = f"{method} {parsed.path}?{urllib.parse.urlencode(sorted(query))} {digest}"
+    loose = f"{method} {parsed.path}?{loose_query} {digest}"
+    return exact, loose
+
+
+class Cassette:
+    """Interactions of one cassette file, for recording or replaying."""
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._windows = {}  # loose key -> exact keys recorded under it
+        self._out = None
+        if mode == 'record':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._out = gzip.open(path, 'wt', encoding='utf-8')
+            atexit.register(self.close)
+        else:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    interaction = json.loads(line)
+                    self._exact.setdefault(interaction['key'], deque()).append(interaction)
+                    self._windows.setdefault(interaction['loose_key'], set()).add(interaction['key'])
+
+    def record(self, method, uri, body, response, content, elapsed):
+        exact, loose = _keys(method, uri, body)
+        interaction = {
+            'key': exact,
+            'loose_key': loose,
+            'method': method,
+            'uri': uri,
+            'content_id': (_content_id_prefix(body if isinstance(body, bytes) else (body or '').encode())
+                           or b'').decode(),
+            'status': response.status,
+            'headers': dict(response),
+            'body': base64.b64encode(content).decode('ascii'),
+            'elapsed': round(elapsed, 4),
+        }
+        with self._lock:
+            self._out.write(json.dumps(interaction, separators=(',', ':')) + '\n')
+
+    def replay(self, method, uri, body):
+        exact, loose = _keys(method, uri, body)
+        with self._lock:
+            if exact not in self._exact:
+                windows = self._windows.get(loose, ())
+                if len(windows) != 1:
+                    # Several recorded windows (or none): any pick would be a guess
+                    raise CassetteMiss(f"{method} {uri} is not in cassette {self.path}"
+                                       f" ({len(windows)} recorded windows for this request)")
+                exact = next(iter(windows))
+            queue = self._exact[exact]
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+
+        content = base64.b64decode(interaction['body'])
+        if interaction['content_id']:
+            new_prefix = _content_id_prefix(body if isinstance(body, bytes) else (body or '').encode())
+            if new_prefix:
+                content = content.replace(interaction['content_id'].encode(), new_prefix)
+        return httplib2.Response(interaction['headers']), content, interaction['elapsed']
+
+    def close(self):
+        with self._lock:
+            if self._out is not None:
+                self._out.close()
+                self._out = None
+
+
+class CassetteHttp:
+    """httplib2.Http-compatible object that records or replays through a Cassette."""
+
+    def __init__(self, cassette, http=None):
+        self.cassette = cassette
+        self.http = http
+
+    @property
+    def credentials(self):
+        # googleapiclient applies/refreshes credentials for batch requests itself
+        return getattr(self.http, 'credentials', None)
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        if self.cassette.mode == 'record':
+            started = time.monotonic()
+            response, content = self.http.request(uri, method=method, body=body, headers=headers,
+                                                  redirections=redirections, connection_type=connection_type)
+            self.cassette.record(method, uri, body, response, content, time.monotonic() - started)
+            return response, content
+
+        response, content, elapsed = self.cassette.replay(method, uri, body)
+        delay = elapsed * LATENCY_SCALE + LATENCY_MS / 1000
+        if delay > 0:
+            time.sleep(delay)
+        return response, content
+
+    def close(self):
+        if self.http is not None:
+            self.http.close()
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """The Cassette named by API_CASSETTE, or None if record/replay is off."""
+    global _cassette
+    if MODE is None:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            if MODE not in ('record', 'replay'):
+                raise ValueError(f"API_CASSETTE_MODE must be 'record' or 'replay', not {MODE!r}")
+            _cassette = Cassette(CASSETTE_PATH, MODE)
+    return _cassette
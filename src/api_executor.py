@@ -0,0 +1,199 @@
+"""
+Shared executor for Google API requests: rate limiting, backoff and retries.
+
+Scripts used to call request.execute() directly and either swallow every
+error (so a 429 or 503 silently dropped a user's events) or sleep a fixed
+0.1s between users. execute() replaces that:
+
+- Each API (Gmail, Reports, Directory) gets a token bucket sized to its
+  per-second quota and an adaptive cap on in-flight requests, shared by
+  every thread in the process.
+- Retryable errors (429, 5xx, 403 rateLimitExceeded/userRateLimitExceeded,
+  dropped connections) are retried with jittered exponential backoff.
+- Throttling halves that API's request rate and concurrency; successful
+  calls grow them back towards the configured ceiling (AIMD), so a run
+  settles at the quota ceiling instead of below it.
+
+Limits can be tuned per API with API_RATE_<NAME> (requests/second) and
+API_CONCURRENCY_<NAME>, e.g. API_RATE_GMAIL=40.
+
+Usage:
+    from api_executor import execute
+
+    results = execute(service.users().messages().list(userId='me', q=query))
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '8'))
+BACKOFF_BASE = 1.0   # seconds
+BACKOFF_CAP = 64.0   # seconds
+
+# Default (requests/second, max concurrent requests) per API. Gmail allows
+# 250 quota units/user/second and messages.get costs 5; the Admin SDK allows
+# 2,400 queries/minute.
+DEFAULT_LIMITS = {
+    'gmail': (40.0, 10),
+    'reports': (25.0, 4),
+    'directory': (25.0, 4),
+    'default': (10.0, 4),
+}
+
+MIN_RATE = 0.5
+
+
+class AdaptiveLimiter:
+    """Thread-safe token bucket plus in-flight cap, adjusted by AIMD."""
+
+    def __init__(self, name, rate, max_concurrency):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost=1):
+        """Block until a request slot and `cost` tokens are available."""
+        with self.cond:
+            while self.in_flight >= max(1, int(self.concurrency)):
+                self.cond.wait()
+            self.in_flight += 1
+
+            # A batch may cost more than the bucket holds; let it go once full
+            self._refill()
+            while self.tokens < min(cost, self.rate):
+                self.cond.wait((min(cost, self.rate) - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= cost
+
+    def release(self, throttled=False):
+        """Give the slot back and adapt to whether the request was throttled."""
+        with self.cond:
+            self.in_flight -= 1
+            if throttled:
+                self._decrease()
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.cond.notify_all()
+
+    def throttled(self):
+        """Record throttling seen outside acquire/release (e.g. inside a batch)."""
+        with self.cond:
+            self._decrease()
+            self.cond.notify_all()
+
+    def _decrease(self):
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self.concurrency = max(1.0, self.concurrency / 2)
+        self.tokens = min(self.tokens, 0)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api):
+    """Get the process-wide limiter for an API name."""
+    with _limiters_lock:
+        if api not in _limiters:
+            rate, concurrency = DEFAULT_LIMITS.get(api, DEFAULT_LIMITS['default'])
+            rate = float(os.getenv(f'API_RATE_{api.upper()}', rate))
+            concurrency = int(os.getenv(f'API_CONCURRENCY_{api.upper()}', concurrency))
+            _limiters[api] = AdaptiveLimiter(api, rate, concurrency)
+        return _limiters[api]
+
+
+def api_for(request):
+    """Guess which API (and so which quota) a request belongs to from its URI."""
+    uri = getattr(request, 'uri', '') or ''
+    if '/gmail/' in uri or 'gmail.googleapis.com' in uri:
+        return 'gmail'
+    if '/admin/reports/' in uri:
+        return 'reports'
+    if '/admin/directory/' in uri:
+        return 'directory'
+    return 'default'
+
+
+def _error_reasons(error):
+    reasons = set()
+    for detail in getattr(error, 'error_details', None) or []:
+        if isinstance(detail, dict) and detail.get('reason'):
+            reasons.add(detail['reason'])
+    try:
+        content = json.loads(error.content.decode('utf-8'))
+        for detail in content.get('error', {}).get('errors', []):
+            if detail.get('reason'):
+                reasons.add(detail['reason'])
+    except (AttributeError, ValueError, UnicodeDecodeError):
+        pass
+    return reasons
+
+
+def is_throttled(error):
+    """True if an error means we are over quota and should slow down."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    return status == 429 or (status == 403 and bool(_error_reasons(error) & RATE_LIMIT_REASONS))
+
+
+def is_retryable(error):
+    """True if a request that failed with this error is worth retrying."""
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES or is_throttled(error)
+    return isinstance(error, (ConnectionError, TimeoutError, socket.timeout))
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def execute(request, api=None, cost=1, max_retries=MAX_RETRIES):
+    """Execute a googleapiclient request (or batch) under the API's limiter.
+
+    Retries retryable errors with backoff and re-raises the last error once
+    max_retries is exhausted, so callers never lose data silently.
+    """
+    api = api or api_for(request)
+    limiter = get_limiter(api)
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire(cost)
+        throttled = False
+        try:
+            return request.execute()
+        except (HttpError, ConnectionError, TimeoutError, socket.timeout) as e:
+            throttled = is_throttled(e)
+            if not is_retryable(e) or attempt == max_retries:
+                raise
+            error = e
+        finally:
+            limiter.release(throttled)
+
+        delay = backoff_delay(attempt)
+        status = error.resp.status if isinstance(error, HttpError) else type(error).__name__
+        print(f"  [retry] {api} request failed ({status}), retrying in {delay:.1f}s "
+              f"({attempt + 1}/{max_retries})")
+        time.sleep(delay)
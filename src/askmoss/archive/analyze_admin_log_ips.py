@@ -3,9 +3,15 @@
 Analyze IPs in Admin Email Log Search export CSV.
 """
 
-import csv
+import os
+import sys
 from collections import defaultdict
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from evidence_store import EvidenceStore
+from ip_enrichment import annotate_rows, describe_row
+
 # Known IPs
 MOSS_OFFICE = '199.200.88.186'
 ATTACKER_IPS = {'172.120.137.37', '45.87.125.150', '46.232.34.229'}
@@ -16,19 +22,22 @@ def analyze_ips(filepath):
     ip_counts = defaultdict(int)
     ip_messages = defaultdict(set)
     ip_dates = defaultdict(set)
+    ip_networks = {}
 
-    with open(filepath, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            msg_id = row.get('Message ID', '')
-            date_str = row.get('Date', '')[:10] if row.get('Date') else ''
-            ip = row.get('IP address', '')
+    store = EvidenceStore()
+    rows = store.events(filepath, columns=['Message ID', 'Date', 'IP address'])
+    for row in annotate_rows(rows):
+        msg_id = row.get('Message ID', '')
+        date_str = row.get('Date', '')[:10] if row.get('Date') else ''
+        ip = row.get('IP address', '')
 
-            if ip and msg_id:
-                ip_counts[ip] += 1
-                ip_messages[ip].add(msg_id)
-                if date_str:
-                    ip_dates[ip].add(date_str)
+        if ip and msg_id:
+            ip_counts[ip] += 1
+            ip_messages[ip].add(msg_id)
+            if date_str:
+                ip_dates[ip].add(date_str)
+            if ip not in ip_networks:
+                ip_networks[ip] = describe_row(row)
 
     print("IP Address Analysis")
     print("=" * 80)
@@ -62,7 +71,8 @@ def analyze_ips(filepath):
         else:
             label = "[UNKNOWN]"
 
-        print(f"  {ip:<25} {label:<15} {len(msgs):>3} emails  ({date_range})")
+        network = f"  {ip_networks[ip]}" if ip_networks.get(ip) else ""
+        print(f"  {ip:<25} {label:<15} {len(msgs):>3} emails  ({date_range}){network}")
 
 if __name__ == '__main__':
     analyze_ips('/home/robert/Downloads/lori-send.csv')
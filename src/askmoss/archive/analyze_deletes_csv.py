@@ -5,9 +5,15 @@ Looking for suspicious patterns across all users.
 """
 
 import csv
+import os
+import sys
 from collections import defaultdict, Counter
 from datetime import datetime
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_classifier import is_suspicious
+
 # Known attacker IPs
 KNOWN_ATTACKER_IPS = {
     '172.120.137.37',
@@ -17,33 +23,14 @@ KNOWN_ATTACKER_IPS = {
     '158.51.123.14',
 }
 
-# Known legitimate IP patterns
-OFFICE_PATTERNS = ('199.200.',)
-AWS_PATTERNS = ('44.', '52.', '35.', '54.', '3.', '107.23.', '50.17.', '13.59.', '13.111.')
-GOOGLE_PATTERNS = ('209.85.',)
-MOBILE_IPV6 = ('2600:', '2607:')
-
 
 def is_datacenter_ip(ip):
-    """Heuristic to detect datacenter/VPS IPs."""
-    if not ip:
-        return False
-
-    # Known attacker
-    if ip in KNOWN_ATTACKER_IPS:
-        return True
-
-    # Skip known legitimate
-    for pattern in OFFICE_PATTERNS + AWS_PATTERNS + GOOGLE_PATTERNS:
-        if ip.startswith(pattern):
-            return False
-
-    # Skip IPv6 mobile
-    if ':' in ip:
-        return False
+    """Heuristic to detect datacenter/VPS IPs.
 
-    # Remaining IPs could be suspicious - return True for further analysis
-    return True
+    Known attacker IPs and any IPv4 address outside the office, AWS, Google
+    and mobile ranges could be suspicious - True for further analysis.
+    """
+    return ip in KNOWN_ATTACKER_IPS or is_suspicious(ip)
 
 
 def main():
@@ -3,30 +3,31 @@
 Check if "missing" emails are duplicate Message-IDs sent from multiple IPs.
 """
 
-import csv
+import os
+import sys
 from collections import defaultdict
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from evidence_store import EvidenceStore
+
 OFFICE_IP = '199.200.88.186'
 AWS_IPS = {'13.59.96.180', '44.224.15.38', '50.17.62.222', '35.166.188.152', '3.132.208.199', '52.4.92.69'}
 
+LORI_SEND_CSV = '/home/robert/Downloads/lori-send.csv'
+
+store = EvidenceStore()
+
 # Track Message-IDs and which IPs sent them
-msg_sources = defaultdict(set)
+msg_sources = store.ips_by_message_id(LORI_SEND_CSV)
 msg_info = {}
 
-with open('/home/robert/Downloads/lori-send.csv', 'r') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        msg_id = row.get('Message ID', '')
-        ip = row.get('IP address', '')
-
-        if msg_id:
-            msg_sources[msg_id].add(ip)
-            if msg_id not in msg_info:
-                msg_info[msg_id] = {
-                    'subject': row.get('Subject', ''),
-                    'to': row.get('To (Envelope)', ''),
-                    'date': row.get('Date', '')[:10]
-                }
+for msg_id, row in store.first_row_by_message_id(LORI_SEND_CSV, columns=['Subject', 'To (Envelope)', 'Date']).items():
+    msg_info[msg_id] = {
+        'subject': row.get('Subject', ''),
+        'to': row.get('To (Envelope)', ''),
+        'date': row.get('Date', '')[:10]
+    }
 
 print("Message-ID Source Analysis")
 print("=" * 70)
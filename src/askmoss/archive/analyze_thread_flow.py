@@ -3,6 +3,9 @@
 Analyze the thread flow to determine who initiated contact with the fraudulent domain.
 """
 
+import os
+import sys
+
 import google.auth
 from google.auth import iam
 from google.auth.transport import requests as auth_requests
@@ -10,10 +13,22 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from datetime import datetime
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from email_threads import ThreadIndex, id_source
+from gmail_fetch import get_message_metadata
+
 SERVICE_ACCOUNT_EMAIL = 'moss-service-account@hvac-labs.iam.gserviceaccount.com'
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 DELEGATED_USER = 'lori.maynard@askmoss.com'
 
+# Message-ID fragments of the mail systems in this thread
+KNOWN_ID_SOURCES = {
+    'BYAPR13MB2743': "Fraudulent email (attacker's M365 tenant)",
+    'BLAPR19MB4417': 'Legitimate Standard Supply email',
+    'mail.gmail.com': 'Gmail message (Moss employee)',
+}
+
 def get_service():
     source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
     request = auth_requests.Request()
@@ -49,7 +64,7 @@ def main():
         print(f"  Found: {len(messages)} messages")
 
         for msg in messages:
-            full = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+            full = get_message_metadata(service, msg['id'])
             headers = {h['name']: h['value'] for h in full['payload']['headers']}
 
             all_emails.append({
@@ -97,12 +112,7 @@ def main():
         if email['in_reply_to']:
             print(f"In-Reply-To: {email['in_reply_to'][:60]}...")
             # Identify what they're replying to
-            if 'BYAPR13MB2743' in email['in_reply_to']:
-                print("  ^-- REPLYING TO: Fraudulent email (attacker's M365 tenant)")
-            elif 'BLAPR19MB4417' in email['in_reply_to']:
-                print("  ^-- REPLYING TO: Legitimate Standard Supply email")
-            elif 'mail.gmail.com' in email['in_reply_to']:
-                print("  ^-- REPLYING TO: Gmail message (Moss employee)")
+            print(f"  ^-- REPLYING TO: {id_source(email['in_reply_to'], KNOWN_ID_SOURCES)}")
         else:
             print("In-Reply-To: NOT PRESENT (could be thread initiator)")
 
@@ -148,32 +158,32 @@ def main():
     print("CHECKING FOR MISSING EMAILS IN THREAD")
     print("="*80)
 
-    all_message_ids = set(e['message_id'] for e in unique_emails)
-    referenced_ids = set()
-
+    threads = ThreadIndex()
     for e in unique_emails:
-        if e['in_reply_to']:
-            referenced_ids.add(e['in_reply_to'].strip())
-        if e['references']:
-            for ref in e['references'].split():
-                referenced_ids.add(ref.strip())
-
-    missing = referenced_ids - all_message_ids
-    missing = [m for m in missing if m]  # Remove empty
+        threads.add(e['message_id'], e['references'], e['in_reply_to'], data=e)
+    missing = threads.missing()
 
     if missing:
         print(f"\nFound {len(missing)} referenced Message-IDs not in our dataset:")
-        for mid in missing[:10]:  # Show first 10
-            print(f"  - {mid[:70]}...")
-            if 'BYAPR13MB2743' in mid:
-                print("    ^-- This is from the ATTACKER'S M365 tenant (ssdhvca.com)")
-            elif 'BLAPR19MB4417' in mid:
-                print("    ^-- This is from Standard Supply's LEGITIMATE tenant (ssdhvac.com)")
-            elif 'mail.gmail.com' in mid:
-                print("    ^-- This is from Gmail (Moss)")
+        for node in missing[:10]:  # Show first 10
+            print(f"  - {node.message_id[:70]}...")
+            print(f"    ^-- {id_source(node.message_id, KNOWN_ID_SOURCES)}")
     else:
         print("\nNo missing Message-IDs detected")
 
+    print("\n" + "="*80)
+    print("RECONSTRUCTED THREADS")
+    print("="*80)
+
+    for root in threads.roots():
+        print()
+        for depth, node in threads.walk(root):
+            indent = "  " * depth
+            if node.missing:
+                print(f"{indent}[MISSING] {node.message_id[:60]} ({id_source(node.message_id, KNOWN_ID_SOURCES)})")
+            else:
+                print(f"{indent}[{node.data['direction']}] {node.data['date']} - {node.data['from'][:40]}")
+
     # Check TRASH for fraudulent emails
     print("\n" + "="*80)
     print("CHECKING TRASH FOR FRAUDULENT EMAILS")
@@ -187,7 +197,7 @@ def main():
     if trash_messages:
         print("\nTRASHED fraudulent emails:")
         for msg in trash_messages:
-            full = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+            full = get_message_metadata(service, msg['id'])
             headers = {h['name']: h['value'] for h in full['payload']['headers']}
             print(f"\n  Date: {headers.get('Date', '')}")
             print(f"  From: {headers.get('From', '')}")
@@ -4,10 +4,15 @@ Build complete attacker activity timeline from lori-all.csv.
 Focus on Canadian VPS IP (158.51.123.14) activity Dec 4-15, 2025.
 """
 
-import csv
+import os
+import sys
 from collections import defaultdict, Counter
 from datetime import datetime
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from evidence_store import EvidenceStore
+
 SUSPICIOUS_IP = '158.51.123.14'
 ATTACKER_DOMAINS = {'ssdhvca.com', 'aksmoss.com', 'sshdvac.com'}
 
@@ -28,41 +33,37 @@ def main():
     subjects_sent = []
     subjects_deleted = []
 
-    with open(filepath, 'r', errors='replace') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            ip = row.get('IP address', '')
-            if ip != SUSPICIOUS_IP:
-                continue
-
-            event = row.get('Event', '')
-            date = row.get('Date', '')
-            subject = row.get('Subject', '')
-            to_addr = row.get('To (Envelope)', '').lower()
-            from_addr = row.get('From (Envelope)', '').lower()
-
-            events_by_type[event] += 1
-
-            evt_data = {
-                'datetime': date,
-                'event': event,
-                'subject': subject,
-                'from': from_addr,
-                'to': to_addr
-            }
-            all_events.append(evt_data)
-
-            if date:
-                date_key = date[:10]
-                events_by_date[date_key].append(evt_data)
-
-            # Categorize by event type
-            if event == 'View':
-                subjects_viewed.append({'date': date, 'subject': subject})
-            elif event == 'Send':
-                subjects_sent.append({'date': date, 'subject': subject, 'to': to_addr})
-            elif event == 'Delete':
-                subjects_deleted.append({'date': date, 'subject': subject})
+    # Indexed lookup of just this IP's rows
+    store = EvidenceStore()
+    for row in store.events(filepath, ip=SUSPICIOUS_IP):
+        event = row.get('Event', '')
+        date = row.get('Date', '')
+        subject = row.get('Subject', '')
+        to_addr = row.get('To (Envelope)', '').lower()
+        from_addr = row.get('From (Envelope)', '').lower()
+
+        events_by_type[event] += 1
+
+        evt_data = {
+            'datetime': date,
+            'event': event,
+            'subject': subject,
+            'from': from_addr,
+            'to': to_addr
+        }
+        all_events.append(evt_data)
+
+        if date:
+            date_key = date[:10]
+            events_by_date[date_key].append(evt_data)
+
+        # Categorize by event type
+        if event == 'View':
+            subjects_viewed.append({'date': date, 'subject': subject})
+        elif event == 'Send':
+            subjects_sent.append({'date': date, 'subject': subject, 'to': to_addr})
+        elif event == 'Delete':
+            subjects_deleted.append({'date': date, 'subject': subject})
 
     # Summary
     print(f"\nTotal events: {len(all_events)}")
@@ -11,7 +11,7 @@ Suspicious patterns:
 """
 
 import os
-import time
+import sys
 from datetime import datetime, timedelta
 from collections import defaultdict
 from dotenv import load_dotenv
@@ -22,6 +22,13 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from directory_users import iter_users
+from ip_classifier import is_suspicious
+from reports_activities import iter_activities
+from reports_domain import list_domain_activities
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -36,10 +43,9 @@ KNOWN_ATTACKER_IPS = {
     '158.51.123.14',
 }
 
-# Known legitimate IP patterns
-OFFICE_PATTERNS = ('199.200.',)
-AWS_PATTERNS = ('44.', '52.', '35.', '54.', '3.', '107.23.', '50.17.', '13.59.', '13.111.')
-GOOGLE_PATTERNS = ('209.85.',)
+# One domain-wide email_deleted query instead of one per user; set
+# REPORTS_DOMAIN_WIDE=0 to fall back to checking users one at a time
+DOMAIN_WIDE = os.getenv('REPORTS_DOMAIN_WIDE', 'true').lower() not in ('0', 'false', 'no')
 
 
 def get_credentials(admin_email, scopes):
@@ -55,88 +61,63 @@ def get_credentials(admin_email, scopes):
 def get_all_users():
     """Get all active users from the domain."""
     creds = get_credentials(ADMIN_USER, ['https://www.googleapis.com/auth/admin.directory.user.readonly'])
-    service = build('admin', 'directory_v1', credentials=creds)
-
-    users = []
-    page_token = None
-
-    while True:
-        results = service.users().list(
-            customer='my_customer',
-            maxResults=500,
-            pageToken=page_token,
-            orderBy='email'
-        ).execute()
-
-        users.extend(results.get('users', []))
-        page_token = results.get('nextPageToken')
-        if not page_token:
-            break
-
-    return [u for u in users if not u.get('suspended', False)]
+    return list(iter_users(creds, active_only=True))
 
 
 def is_suspicious_ip(ip):
-    """Check if an IP looks suspicious (datacenter/VPS)."""
-    if not ip:
-        return False
+    """Check if an IP looks suspicious (datacenter/VPS).
 
-    # Skip known legitimate
-    if ip in KNOWN_ATTACKER_IPS:
-        return True  # Known bad
+    Known attacker IPs and any IPv4 address outside the office, AWS, Google
+    and mobile ranges are potentially suspicious.
+    """
+    return ip in KNOWN_ATTACKER_IPS or is_suspicious(ip)
 
-    for pattern in OFFICE_PATTERNS + AWS_PATTERNS + GOOGLE_PATTERNS:
-        if ip.startswith(pattern):
-            return False
 
-    # Skip IPv6 (usually mobile)
-    if ':' in ip:
-        return False
+def delete_event_record(user_email, event):
+    """Summarize one email_deleted activity."""
+    ip = event.get('ipAddress', '')
+    time_str = event.get('id', {}).get('time', '')
 
-    # Everything else is potentially suspicious
-    return True
+    return {
+        'user': user_email,
+        'time': time_str,
+        'ip': ip,
+        'is_suspicious': is_suspicious_ip(ip),
+        'is_known_attacker': ip in KNOWN_ATTACKER_IPS
+    }
 
 
 def get_user_delete_events(service, user_email, start_time, end_time):
-    """Get all delete events for a user."""
+    """Get all delete events for a user, or None if the query failed."""
     delete_events = []
 
     try:
-        page_token = None
-        while True:
-            results = service.activities().list(
-                userKey=user_email,
-                applicationName='gmail',
-                eventName='email_deleted',
-                startTime=start_time,
-                endTime=end_time,
-                maxResults=500,
-                pageToken=page_token
-            ).execute()
-
-            for event in results.get('items', []):
-                ip = event.get('ipAddress', '')
-                time_str = event.get('id', {}).get('time', '')
-
-                delete_events.append({
-                    'user': user_email,
-                    'time': time_str,
-                    'ip': ip,
-                    'is_suspicious': is_suspicious_ip(ip),
-                    'is_known_attacker': ip in KNOWN_ATTACKER_IPS
-                })
-
-            page_token = results.get('nextPageToken')
-            if not page_token:
-                break
+        for event in iter_activities(
+            service,
+            userKey=user_email,
+            applicationName='gmail',
+            eventName='email_deleted',
+            startTime=start_time,
+            endTime=end_time
+        ):
+            delete_events.append(delete_event_record(user_email, event))
 
     except HttpError as e:
         if e.resp.status not in [400, 404]:
             print(f"       Error for {user_email}: {e}")
+            return None
 
     return delete_events
 
 
+def get_domain_delete_events(service, start_time, end_time):
+    """Get delete events for every user at once: {user email: [delete events]}."""
+    by_actor = list_domain_activities(service, 'gmail', start_time, end_time, eventName='email_deleted')
+
+    return {email: [delete_event_record(email, event) for event in items]
+            for email, items in by_actor.items()}
+
+
 def main():
     print("=" * 80)
     print("DOMAIN-WIDE DELETE EVENT AUDIT")
@@ -168,8 +149,18 @@ def main():
     all_delete_events = []
     users_with_deletes = set()
     users_with_suspicious = set()
+    failed_users = []
     checked = 0
 
+    domain_events = None
+    if DOMAIN_WIDE:
+        try:
+            domain_events = get_domain_delete_events(service, start_str, end_str)
+        except HttpError as e:
+            # Never read a failed pull as "no deletions": ask per user instead
+            print(f"       Error fetching domain-wide delete events: {e}")
+            print("       Falling back to one query per user...\n")
+
     for user in users:
         email = user.get('primaryEmail', '')
         checked += 1
@@ -177,7 +168,13 @@ def main():
         if checked % 10 == 0 or checked == len(users):
             print(f"       Progress: {checked}/{len(users)} users checked...")
 
-        events = get_user_delete_events(service, email, start_str, end_str)
+        if domain_events is not None:
+            events = domain_events.pop(email.lower(), [])
+        else:
+            events = get_user_delete_events(service, email, start_str, end_str)
+            if events is None:
+                failed_users.append(email)
+                continue
 
         if events:
             users_with_deletes.add(email)
@@ -188,7 +185,11 @@ def main():
                 users_with_suspicious.add(email)
                 print(f"       ⚠️  {email}: {len(events)} deletes ({len(suspicious)} from suspicious IPs)")
 
-        time.sleep(0.1)  # Rate limiting
+    # Deletes by actors outside the active user list (suspended or deleted
+    # accounts, external actors): analysed with the rest, listed separately
+    other_actor_events = domain_events or {}
+    for events in other_actor_events.values():
+        all_delete_events.extend(events)
 
     # ================================================================
     # ANALYSIS
@@ -204,6 +205,26 @@ def main():
     print(f"  - Users with delete events: {len(users_with_deletes)}")
     print(f"  - Total delete events: {len(all_delete_events)}")
     print(f"  - Users with suspicious IP deletes: {len(users_with_suspicious)}")
+    print(f"  - Other actors with delete events: {len(other_actor_events)}")
+    print(f"  - Users NOT checked (API errors): {len(failed_users)}")
+
+    if failed_users:
+        print("\n" + "-" * 80)
+        print("USERS NOT CHECKED (delete query failed):")
+        print("-" * 80)
+        for email in failed_users:
+            print(f"    ❌ {email}")
+
+    if other_actor_events:
+        print("\n" + "-" * 80)
+        print("DELETES BY ACTORS NOT IN THE ACTIVE USER LIST:")
+        print("-" * 80)
+        print("  (suspended or deleted accounts, external actors)\n")
+        for actor, events in sorted(other_actor_events.items(), key=lambda x: -len(x[1])):
+            suspicious = [e for e in events if e['is_suspicious']]
+            ips = sorted({e['ip'] for e in events if e['ip']})
+            print(f"    {actor or '(no actor email)'}: {len(events)} deletes "
+                  f"({len(suspicious)} from suspicious IPs) | IPs: {', '.join(ips[:5])}")
 
     # Group by IP
     ip_counts = defaultdict(lambda: {'count': 0, 'users': set()})
@@ -301,10 +322,21 @@ def main():
         for user in sorted(users_with_suspicious):
             count = len(user_suspicious.get(user, []))
             print(f"       - {user} ({count} suspicious deletes)")
-    else:
+
+    if failed_users:
+        print(f"\n  ❌ {len(failed_users)} users could not be checked - results are incomplete")
+
+    if other_actor_events:
+        print(f"\n  ⚠️  {len(other_actor_events)} actors outside the active user list deleted mail")
+        print("     Review them in the section above")
+
+    if not (attacker_deletes or users_with_suspicious or failed_users or other_actor_events):
         print("\n  ✅ No concerning delete patterns detected")
         print("     All delete activity appears to be from legitimate sources")
 
+    if failed_users:
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
@@ -4,6 +4,7 @@ Categorize the "missing" emails to understand why they're not in SENT folder.
 """
 
 import os
+import sys
 import csv
 from dotenv import load_dotenv
 import google.auth
@@ -11,6 +12,10 @@ from google.auth import iam
 from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gmail_fetch import get_message
 from collections import defaultdict
 
 load_dotenv()
@@ -46,10 +51,10 @@ def get_gmail_message_ids(service):
 
     msg_ids = set()
     for msg in all_messages:
-        full_msg = service.users().messages().get(
-            userId='me', id=msg['id'], format='metadata',
+        full_msg = get_message(
+            service, msg['id'], format='metadata',
             metadataHeaders=['Message-ID']
-        ).execute()
+        )
         headers = {h['name'].lower(): h['value'] for h in full_msg.get('payload', {}).get('headers', [])}
         mid = headers.get('message-id', '')
         if mid:
@@ -4,6 +4,7 @@ Check ALL emails FROM Lori (not just SENT folder).
 """
 
 import os
+import sys
 from collections import defaultdict
 from dotenv import load_dotenv
 import google.auth
@@ -13,6 +14,10 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from datetime import datetime
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gmail_fetch import get_message
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -56,10 +61,10 @@ def main():
     labels_seen = defaultdict(int)
 
     for msg in all_messages:
-        full_msg = service.users().messages().get(
-            userId='me', id=msg['id'], format='metadata',
+        full_msg = get_message(
+            service, msg['id'], format='metadata',
             metadataHeaders=['Date']
-        ).execute()
+        )
 
         # Get internal date
         internal_date = full_msg.get('internalDate', 0)
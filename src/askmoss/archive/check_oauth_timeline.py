@@ -4,7 +4,8 @@ Check OAuth/token events timeline, especially around Dec 10 and Dec 15.
 """
 
 import os
-from datetime import datetime
+import sys
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import google.auth
 from google.auth import iam
@@ -12,6 +13,11 @@ from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from reports_activities import iter_activities
+from reports_probe import ActivityProbe, format_time
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -33,19 +39,30 @@ def main():
     creds = get_credentials(ADMIN_USER, ['https://www.googleapis.com/auth/admin.reports.audit.readonly'])
     service = build('admin', 'reports_v1', credentials=creds)
 
+    # Days with any OAuth activity over the whole retention period, by
+    # probing rather than downloading every token event
+    print("OAuth/Token activity timeline (days with events):")
+    print("=" * 70)
+
+    probe = ActivityProbe(service, userKey=TARGET_USER, applicationName='token')
+    first = probe.first()
+    if first is not None:
+        print(f"First token event: {first['id']['time']}")
+        for interval in reversed(probe.intervals(resolution=timedelta(days=1))):
+            print(f"  {format_time(interval.start)[:10]} - {format_time(interval.end)[:10]}")
+    print(f"({probe.calls} API calls)\n")
+
     # Check Dec 1-17 for OAuth events
     print("OAuth/Token events Dec 1-17, 2025:")
     print("=" * 70)
 
-    results = service.activities().list(
+    events = list(iter_activities(
+        service,
         userKey=TARGET_USER,
         applicationName='token',
         startTime='2025-12-01T00:00:00.000Z',
-        endTime='2025-12-18T00:00:00.000Z',
-        maxResults=200
-    ).execute()
-
-    events = results.get('items', [])
+        endTime='2025-12-18T00:00:00.000Z'
+    ))
     print(f"Total events: {len(events)}\n")
 
     # Group by date
@@ -5,7 +5,7 @@ Find the "missing" emails.
 """
 
 import os
-import csv
+import sys
 from dotenv import load_dotenv
 import google.auth
 from google.auth import iam
@@ -13,6 +13,11 @@ from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from evidence_store import EvidenceStore
+from gmail_fetch import get_message
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -33,17 +38,15 @@ def get_credentials(target_user):
 def get_admin_log_message_ids(filepath):
     """Get all Message-IDs from Admin Email Log CSV."""
     msg_ids = {}
-    with open(filepath, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            msg_id = row.get('Message ID', '')
-            if msg_id and msg_id not in msg_ids:
-                msg_ids[msg_id] = {
-                    'date': row.get('Date', '')[:10],
-                    'subject': row.get('Subject', ''),
-                    'to': row.get('To (Envelope)', ''),
-                    'ip': row.get('IP address', '')
-                }
+    first_rows = EvidenceStore().first_row_by_message_id(
+        filepath, columns=['Date', 'Subject', 'To (Envelope)', 'IP address'])
+    for msg_id, row in first_rows.items():
+        msg_ids[msg_id] = {
+            'date': row.get('Date', '')[:10],
+            'subject': row.get('Subject', ''),
+            'to': row.get('To (Envelope)', ''),
+            'ip': row.get('IP address', '')
+        }
     return msg_ids
 
 
@@ -64,10 +67,10 @@ def get_gmail_message_ids(service):
 
     msg_ids = {}
     for msg in all_messages:
-        full_msg = service.users().messages().get(
-            userId='me', id=msg['id'], format='metadata',
+        full_msg = get_message(
+            service, msg['id'], format='metadata',
             metadataHeaders=['Message-ID', 'Subject', 'To', 'Date']
-        ).execute()
+        )
         headers = {h['name'].lower(): h['value'] for h in full_msg.get('payload', {}).get('headers', [])}
         mid = headers.get('message-id', '')
         if mid:
@@ -4,9 +4,14 @@ Comprehensive IP audit - don't just look at volume, look at behavior.
 Find ALL suspicious activity regardless of IP event count.
 """
 
-import csv
+import os
+import sys
 from collections import defaultdict, Counter
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from evidence_store import EvidenceStore
+
 # Known legitimate IPs
 OFFICE_IP = '199.200.88.186'
 KNOWN_LEGITIMATE = {
@@ -38,51 +43,51 @@ def main():
     # Track all sends to attacker domains regardless of IP
     all_attacker_sends = []
 
-    with open(filepath, 'r', errors='replace') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            ip = row.get('IP address', '')
-            if not ip:
-                continue
-
-            event = row.get('Event', '')
-            date = row.get('Date', '')
-            subject = row.get('Subject', '')
-            to_addr = row.get('To (Envelope)', '').lower()
-            from_addr = row.get('From (Envelope)', '').lower()
-
-            # Track all events by IP
-            ip_events[ip].append({
-                'date': date,
-                'event': event,
-                'subject': subject,
-                'to': to_addr,
-                'from': from_addr
-            })
-
-            # Check for sends to attacker domains
-            if event == 'Send':
-                ip_sends[ip].append({'date': date, 'to': to_addr, 'subject': subject})
-                for domain in ATTACKER_DOMAINS:
-                    if domain in to_addr:
-                        ip_sends_to_attacker[ip].append({
-                            'date': date, 'to': to_addr, 'subject': subject
-                        })
-                        all_attacker_sends.append({
-                            'ip': ip, 'date': date, 'to': to_addr, 'subject': subject
-                        })
-
-            # Track deletes
-            if event == 'Delete':
-                ip_deletes[ip].append({'date': date, 'subject': subject})
-
-            # Track drafts
-            if event == 'Draft':
-                ip_drafts[ip].append({'date': date, 'to': to_addr, 'subject': subject})
-
-            # Track forwards
-            if 'Forward' in event or 'Fwd' in event:
-                ip_forwards[ip].append({'date': date, 'to': to_addr, 'subject': subject})
+    store = EvidenceStore()
+    columns = ['IP address', 'Event', 'Date', 'Subject', 'To (Envelope)', 'From (Envelope)']
+    for row in store.events(filepath, columns=columns):
+        ip = row.get('IP address', '')
+        if not ip:
+            continue
+
+        event = row.get('Event', '')
+        date = row.get('Date', '')
+        subject = row.get('Subject', '')
+        to_addr = row.get('To (Envelope)', '').lower()
+        from_addr = row.get('From (Envelope)', '').lower()
+
+        # Track all events by IP
+        ip_events[ip].append({
+            'date': date,
+            'event': event,
+            'subject': subject,
+            'to': to_addr,
+            'from': from_addr
+        })
+
+        # Check for sends to attacker domains
+        if event == 'Send':
+            ip_sends[ip].append({'date': date, 'to': to_addr, 'subject': subject})
+            for domain in ATTACKER_DOMAINS:
+                if domain in to_addr:
+                    ip_sends_to_attacker[ip].append({
+                        'date': date, 'to': to_addr, 'subject': subject
+                    })
+                    all_attacker_sends.append({
+                        'ip': ip, 'date': date, 'to': to_addr, 'subject': subject
+                    })
+
+        # Track deletes
+        if event == 'Delete':
+            ip_deletes[ip].append({'date': date, 'subject': subject})
+
+        # Track drafts
+        if event == 'Draft':
+            ip_drafts[ip].append({'date': date, 'to': to_addr, 'subject': subject})
+
+        # Track forwards
+        if 'Forward' in event or 'Fwd' in event:
+            ip_forwards[ip].append({'date': date, 'to': to_addr, 'subject': subject})
 
     # ============================================================
     # CRITICAL: All sends to attacker domains
@@ -7,14 +7,14 @@ Checks every email for Reply-To poisoning and other anomalies.
 
 import os
 import sys
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gmail_fetch import get_message_metadata
+from workspace_auth import build_service, get_delegated_credentials
+
 SERVICE_ACCOUNT_EMAIL = 'moss-service-account@hvac-labs.iam.gserviceaccount.com'
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -31,17 +31,8 @@ FRAUDULENT_DOMAIN = 'ssdhvca.com'
 
 def get_service(delegated_user):
     """Create Gmail API service with domain-wide delegation for a specific user."""
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-    request = auth_requests.Request()
-    signer = iam.Signer(request=request, credentials=source_credentials, service_account_email=SERVICE_ACCOUNT_EMAIL)
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=delegated_user
-    )
-    return build('gmail', 'v1', credentials=delegated_credentials)
+    delegated_credentials = get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, delegated_user, SCOPES)
+    return build_service('gmail', 'v1', credentials=delegated_credentials)
 
 def extract_domain(email_addr):
     """Extract domain from email address."""
@@ -51,7 +42,7 @@ def extract_domain(email_addr):
 
 def analyze_email(service, msg_id):
     """Fetch and analyze a single email."""
-    full = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
+    full = get_message_metadata(service, msg_id)
     headers = {h['name']: h['value'] for h in full['payload']['headers']}
 
     date = headers.get('Date', 'UNKNOWN')
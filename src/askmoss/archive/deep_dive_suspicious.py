@@ -4,9 +4,15 @@ Deep dive into suspicious IP activity.
 """
 
 import csv
+import os
+import sys
 from collections import defaultdict, Counter
 from datetime import datetime
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_enrichment import describe
+
 SUSPICIOUS_IP = '158.51.123.14'
 SECOND_IP = '138.199.114.2'
 
@@ -15,6 +21,11 @@ def analyze_ip(filepath, target_ip):
     print(f"DEEP DIVE: {target_ip}")
     print(f"{'='*80}")
 
+    # ASN / provider / country from the offline enrichment database
+    network = describe(target_ip)
+    if network:
+        print(f"Network: {network}")
+
     events_by_type = Counter()
     events_by_date = Counter()
     send_events = []
@@ -10,7 +10,7 @@ Uses Gmail API with domain-wide delegation.
 
 import os
 import re
-import base64
+import sys
 import google.auth
 from google.auth import iam
 from google.auth.transport import requests as auth_requests
@@ -18,6 +18,10 @@ from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from datetime import datetime
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from mime_text import get_body_text
+
 SERVICE_ACCOUNT_EMAIL = 'moss-service-account@hvac-labs.iam.gserviceaccount.com'
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -41,30 +45,6 @@ def get_service(delegated_user):
     )
     return build('gmail', 'v1', credentials=delegated_credentials)
 
-def get_body_text(payload):
-    """Extract plain text body from email payload."""
-    body_text = ""
-
-    if 'body' in payload and payload['body'].get('data'):
-        try:
-            body_text = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='replace')
-        except:
-            pass
-
-    if 'parts' in payload:
-        for part in payload['parts']:
-            mime_type = part.get('mimeType', '')
-            if mime_type == 'text/plain':
-                if part.get('body', {}).get('data'):
-                    try:
-                        body_text += base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
-                    except:
-                        pass
-            elif 'parts' in part:
-                body_text += get_body_text(part)
-
-    return body_text
-
 def extract_action_items(body, subject, from_addr, to_addr, user_email):
     """
     Extract action items from email body.
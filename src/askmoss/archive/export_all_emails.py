@@ -5,16 +5,18 @@ Includes INBOX, SENT, TRASH, and ALL OTHER LOCATIONS.
 Outputs to a single comprehensive file for evidence preservation.
 """
 
+import csv
 import os
-import base64
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import sys
 from datetime import datetime
-from email import policy
-from email.parser import BytesParser
+from email.header import decode_header, make_header
+
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gmail_fetch import get_message
+from mime_text import iter_body_text
+from raw_message import RawMessage
+from workspace_auth import build_service, get_delegated_credentials
 
 SERVICE_ACCOUNT_EMAIL = 'moss-service-account@hvac-labs.iam.gserviceaccount.com'
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
@@ -30,25 +32,18 @@ DOMAINS_TO_EXPORT = ['ssdhvac.com', 'ssdhvca.com']
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output')
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'all_emails_complete_export.txt')
 
+# Original RFC 2822 bytes of every exported message, one .eml per Gmail ID,
+# listed in a manifest next to them (the text export itself is unchanged)
+EML_DIR = os.path.join(OUTPUT_DIR, 'all_emails_eml')
+EML_MANIFEST = os.path.join(EML_DIR, 'manifest.csv')
+
 def get_service(delegated_user):
     """Create Gmail API service with domain-wide delegation."""
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-    request = auth_requests.Request()
-    signer = iam.Signer(request=request, credentials=source_credentials, service_account_email=SERVICE_ACCOUNT_EMAIL)
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=delegated_user
-    )
-    return build('gmail', 'v1', credentials=delegated_credentials)
-
-def get_email_labels(service, msg_id):
-    """Get the labels for an email to determine its location."""
-    msg = service.users().messages().get(userId='me', id=msg_id, format='minimal').execute()
-    label_ids = msg.get('labelIds', [])
+    delegated_credentials = get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, delegated_user, SCOPES)
+    return build_service('gmail', 'v1', credentials=delegated_credentials)
 
+def get_email_labels(label_ids):
+    """Map Gmail label IDs to the mailbox locations used in the export."""
     locations = []
     if 'INBOX' in label_ids:
         locations.append('INBOX')
@@ -63,45 +58,39 @@ def get_email_labels(service, msg_id):
 
     return locations if locations else ['ARCHIVE/OTHER']
 
-def get_body_text(payload):
-    """Extract body text from email payload."""
-    body_text = ""
+def get_raw_message(service, msg_id):
+    """Fetch a message once, as raw RFC 2822 bytes plus its current label IDs."""
+    return get_message(service, msg_id, format='raw', live_labels=True)
 
-    if 'body' in payload and payload['body'].get('data'):
+def gmail_header_value(value):
+    """Render a raw header value the way the Gmail API 'full' format reports it."""
+    value = value.replace('\r\n', '').replace('\n', '')
+    if '=?' in value:
         try:
-            body_text = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='replace')
-        except:
-            body_text = "[Could not decode body]"
-
-    if 'parts' in payload:
-        for part in payload['parts']:
-            mime_type = part.get('mimeType', '')
-            if mime_type == 'text/plain':
-                if part.get('body', {}).get('data'):
-                    try:
-                        body_text += base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
-                    except:
-                        pass
-            elif mime_type == 'text/html' and not body_text:
-                if part.get('body', {}).get('data'):
-                    try:
-                        body_text += "\n[HTML Content]\n" + base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
-                    except:
-                        pass
-            elif 'parts' in part:
-                body_text += get_body_text(part)
-
-    return body_text
-
-def export_email(service, msg_id, f, email_num, location):
-    """Export a single email with full headers and body."""
-    # Get raw format for complete headers
-    raw_msg = service.users().messages().get(userId='me', id=msg_id, format='raw').execute()
-    raw_data = base64.urlsafe_b64decode(raw_msg['raw'])
-
-    # Also get full format for easier body extraction
-    full_msg = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
-    headers = {h['name']: h['value'] for h in full_msg['payload']['headers']}
+            value = str(make_header(decode_header(value)))
+        except Exception:
+            pass
+    return value
+
+def attachment_size(part):
+    """Decoded size of an attachment, worked out without decoding it."""
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return len(payload or b'')
+    if str(part.get('content-transfer-encoding', '')).strip().lower() != 'base64':
+        return len(payload)
+    encoded = len(payload) - sum(payload.count(c) for c in ' \t\r\n')
+    return encoded * 3 // 4 - payload.rstrip().endswith('==') - payload.rstrip().endswith('=')
+
+def export_email(msg_id, raw, f, email_num, location):
+    """Export a single email with full headers and body.
+
+    Works entirely from one format='raw' fetch (a RawMessage): headers and
+    MIME bodies are parsed locally instead of downloading the message a
+    second time as 'full'.
+    """
+    parsed = raw.parse()
+    headers = {name: gmail_header_value(value) for name, value in parsed.raw_items()}
 
     f.write(f"\n{'#'*80}\n")
     f.write(f"# EMAIL #{email_num}\n")
@@ -150,37 +139,37 @@ def export_email(service, msg_id, f, email_num, location):
     f.write("COMPLETE RAW HEADERS\n")
     f.write("="*60 + "\n")
 
-    # Parse raw message to separate headers from body
     try:
-        parsed = BytesParser(policy=policy.default).parsebytes(raw_data)
         for header_name, header_value in parsed.items():
             f.write(f"{header_name}: {header_value}\n")
     except Exception as e:
         f.write(f"[Error parsing headers: {e}]\n")
-        # Fallback: write all headers from full format
-        for h in full_msg['payload']['headers']:
-            f.write(f"{h['name']}: {h['value']}\n")
+        # Fallback: write the unparsed header values
+        for header_name, header_value in headers.items():
+            f.write(f"{header_name}: {header_value}\n")
 
     # Write body
     f.write("\n" + "="*60 + "\n")
     f.write("EMAIL BODY\n")
     f.write("="*60 + "\n")
 
-    body = get_body_text(full_msg['payload'])
-    if body:
-        f.write(body)
-    else:
+    body_written = False
+    # Evidence export: the whole body, never truncated
+    for chunk in iter_body_text(parsed, max_bytes=None, html_marker="\n[HTML Content]\n"):
+        f.write(chunk)
+        body_written = True
+    if not body_written:
         f.write("[No text body found or body is empty]\n")
 
     # Write attachments info
     attachments = []
-    if 'parts' in full_msg['payload']:
-        for part in full_msg['payload']['parts']:
-            if part.get('filename'):
+    if parsed.is_multipart():
+        for part in parsed.get_payload():
+            if part.get_filename():
                 attachments.append({
-                    'filename': part['filename'],
-                    'mimeType': part.get('mimeType', 'unknown'),
-                    'size': part.get('body', {}).get('size', 0)
+                    'filename': part.get_filename(),
+                    'mimeType': part.get_content_type(),
+                    'size': attachment_size(part)
                 })
 
     if attachments:
@@ -197,8 +186,9 @@ def export_email(service, msg_id, f, email_num, location):
     return headers.get('From', ''), headers.get('Subject', ''), headers.get('Date', '')
 
 def main():
-    # Ensure output directory exists
+    # Ensure output directories exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(EML_DIR, exist_ok=True)
 
     print("="*80)
     print("EXPORTING ALL EMAILS - FULL HEADERS AND BODY")
@@ -221,7 +211,11 @@ def main():
         'to_fraud': 0,
     }
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f, \
+            open(EML_MANIFEST, 'w', newline='', encoding='utf-8') as manifest_file:
+        manifest = csv.writer(manifest_file)
+        manifest.writerow(['email_num', 'gmail_id', 'location', 'eml_file', 'bytes'])
+
         f.write("="*80 + "\n")
         f.write("EMAIL FORENSICS - COMPLETE EMAIL EXPORT\n")
         f.write("INCLUDING ALL LOCATIONS: INBOX, SENT, TRASH, SPAM, ARCHIVE\n")
@@ -277,8 +271,18 @@ def main():
                             continue
                         seen_message_ids.add(msg_id)
 
+                        # Single fetch: raw bytes for the export, label IDs for the location
+                        try:
+                            message = get_raw_message(service, msg_id)
+                            raw = RawMessage(message['raw'], message.get('labelIds'))
+                        except Exception as e:
+                            print(f"    ERROR fetching {msg_id}: {e}")
+                            continue
+                        # Only the decoded bytes are kept from here on
+                        del message
+
                         # Get email location
-                        locations = get_email_labels(service, msg_id)
+                        locations = get_email_labels(raw.labels)
                         location_str = ', '.join(locations)
 
                         # Update stats
@@ -296,7 +300,12 @@ def main():
 
                         email_count += 1
                         try:
-                            from_addr, subject, date = export_email(service, msg_id, f, email_count, location_str)
+                            with raw:
+                                # Original bytes, unchanged, as evidence
+                                eml_path = raw.save(os.path.join(EML_DIR, f"{msg_id}.eml"))
+                                manifest.writerow([email_count, msg_id, location_str,
+                                                   os.path.basename(eml_path), raw.size])
+                                from_addr, subject, date = export_email(msg_id, raw, f, email_count, location_str)
 
                             # Update domain stats
                             if 'ssdhvac.com' in from_addr.lower():
@@ -342,6 +351,7 @@ def main():
     print(f"  - From ssdhvac.com (legitimate): {stats['from_legit']}")
     print(f"  - From ssdhvca.com (FRAUDULENT): {stats['from_fraud']}")
     print(f"\nOutput saved to: {OUTPUT_FILE}")
+    print(f"Original messages (.eml): {EML_DIR} (see {os.path.basename(EML_MANIFEST)})")
 
 if __name__ == '__main__':
     main()
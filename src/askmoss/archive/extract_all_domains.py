@@ -4,9 +4,24 @@ Extract all domains from email logs and look for potential typosquats/fakes.
 """
 
 import csv
-import re
+import os
+import sys
 from collections import Counter, defaultdict
-from difflib import SequenceMatcher
+
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lookalike_domains import LookalikeIndex
+
+# Common email providers to exclude
+COMMON = {
+    'gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com',
+    'googlemail.com', 'icloud.com', 'aol.com', 'msn.com',
+    'live.com', 'me.com', 'mail.com', 'protonmail.com',
+    'google.com', 'amazonses.com'
+}
+
+# Legitimate vendor/partner domains to protect, besides our own and Standard Supply
+KNOWN_VENDORS = {d.strip().lower() for d in os.getenv('KNOWN_VENDOR_DOMAINS', '').split(',') if d.strip()}
 
 def extract_domain(email):
     """Extract domain from email address."""
@@ -14,31 +29,26 @@ def extract_domain(email):
         return None
     return email.split('@')[-1].lower().strip()
 
-def similar(a, b):
-    """Return similarity ratio between two strings."""
-    return SequenceMatcher(None, a, b).ratio()
+def find_similar_domains(domains, protected):
+    """Find domains that look like typosquats of a protected domain.
 
-def find_similar_domains(domains):
-    """Find domains that look like typosquats of each other."""
-    domain_list = list(domains)
+    Each domain is matched against a lookalike index of the protected set
+    instead of against every other domain. Two protected domains that look
+    alike are reported once.
+    """
+    index = LookalikeIndex(protected - COMMON)
     similar_pairs = []
+    seen = set()
 
-    for i, d1 in enumerate(domain_list):
-        for d2 in domain_list[i+1:]:
-            # Skip if same domain
-            if d1 == d2:
-                continue
-            # Skip common domains
-            if d1 in ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']:
+    for domain, matches in sorted(index.match_many(d for d in domains if d not in COMMON).items()):
+        for match in matches:
+            pair = frozenset((domain, match.protected))
+            if pair in seen:
                 continue
-            if d2 in ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com']:
-                continue
-
-            ratio = similar(d1, d2)
-            if ratio > 0.7 and ratio < 1.0:  # Similar but not identical
-                similar_pairs.append((d1, d2, ratio))
+            seen.add(pair)
+            similar_pairs.append((domain, match.protected, match.distance, match.kind))
 
-    return sorted(similar_pairs, key=lambda x: x[2], reverse=True)
+    return sorted(similar_pairs, key=lambda x: (x[2], x[0]))
 
 def main():
     filepath = '/home/robert/Downloads/lori-all.csv'
@@ -99,15 +109,18 @@ def main():
     print("\n" + "=" * 80)
     print("POTENTIAL TYPOSQUATS (similar domain pairs):")
     print("=" * 80)
-    similar_pairs = find_similar_domains(all_domains)
+    # Protect only the curated domains: a correspondent domain can be the
+    # attacker's (the victim replies to the lookalike in a BEC)
+    protected = KNOWN_MOSS | KNOWN_SSDHVAC | KNOWN_VENDORS
+    similar_pairs = find_similar_domains(all_domains, protected)
 
     if similar_pairs:
-        for d1, d2, ratio in similar_pairs[:30]:
+        for d1, d2, dist, kind in similar_pairs[:30]:
             flag = ""
             if d1 in KNOWN_ATTACKER or d2 in KNOWN_ATTACKER:
                 flag = " *** KNOWN ATTACKER ***"
             print(f"\n  {d1} <-> {d2}")
-            print(f"    Similarity: {ratio:.1%}{flag}")
+            print(f"    Distance: {dist:g} ({kind}){flag}")
             print(f"    {d1}: From={from_domains.get(d1, 0)}, To={to_domains.get(d1, 0)}")
             print(f"    {d2}: From={from_domains.get(d2, 0)}, To={to_domains.get(d2, 0)}")
 
@@ -115,14 +128,6 @@ def main():
     print("ALL EXTERNAL DOMAINS (excluding common providers):")
     print("=" * 80)
 
-    # Common email providers to exclude
-    COMMON = {
-        'gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com',
-        'googlemail.com', 'icloud.com', 'aol.com', 'msn.com',
-        'live.com', 'me.com', 'mail.com', 'protonmail.com',
-        'google.com', 'amazonses.com'
-    }
-
     # Also exclude Google/AWS infrastructure
     INFRASTRUCTURE = {d for d in all_domains if
                       'google' in d or 'amazon' in d or 'aws' in d or
@@ -4,6 +4,7 @@ Find email deletion events (mail_event_type=27) in Gmail audit logs.
 """
 
 import os
+import sys
 from dotenv import load_dotenv
 import google.auth
 from google.auth import iam
@@ -11,6 +12,10 @@ from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from reports_activities import iter_activities
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -40,15 +45,13 @@ def main():
     print("=" * 70)
 
     # Query Gmail delivery events Dec 1-17
-    results = service.activities().list(
+    events = list(iter_activities(
+        service,
         userKey=TARGET_USER,
         applicationName='gmail',
         startTime='2025-12-01T00:00:00.000Z',
-        endTime='2025-12-18T00:00:00.000Z',
-        maxResults=1000
-    ).execute()
-
-    events = results.get('items', [])
+        endTime='2025-12-18T00:00:00.000Z'
+    ))
     print(f"Total Gmail events: {len(events)}")
 
     deletion_events = []
@@ -4,6 +4,7 @@ Search for "missing" emails in other locations (Trash, All Mail, etc.)
 """
 
 import os
+import sys
 import csv
 from dotenv import load_dotenv
 import google.auth
@@ -12,6 +13,10 @@ from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gmail_fetch import get_message
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -49,10 +54,10 @@ def get_missing_message_ids():
 
     gmail_ids = set()
     for msg in all_messages:
-        full_msg = service.users().messages().get(
-            userId='me', id=msg['id'], format='metadata',
+        full_msg = get_message(
+            service, msg['id'], format='metadata',
             metadataHeaders=['Message-ID']
-        ).execute()
+        )
         headers = {h['name'].lower(): h['value'] for h in full_msg.get('payload', {}).get('headers', [])}
         mid = headers.get('message-id', '')
         if mid:
@@ -90,7 +95,7 @@ def main():
 
             if results.get('messages'):
                 msg = results['messages'][0]
-                # Get labels
+                # Get labels (not cached: labels change, messages don't)
                 full_msg = service.users().messages().get(
                     userId='me', id=msg['id'], format='metadata'
                 ).execute()
@@ -4,8 +4,14 @@ Deep investigation of IP 147.124.205.9 - potential second attacker IP.
 """
 
 import csv
+import os
+import sys
 from collections import Counter
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_enrichment import describe
+
 TARGET_IP = '147.124.205.9'
 
 def main():
@@ -15,6 +21,11 @@ def main():
     print(f"INVESTIGATION: {TARGET_IP}")
     print("=" * 80)
 
+    # ASN / provider / country from the offline enrichment database
+    network = describe(TARGET_IP)
+    if network:
+        print(f"Network: {network}")
+
     events = []
 
     with open(filepath, 'r', errors='replace') as f:
@@ -4,7 +4,9 @@ Deep investigation of the Canadian VPS IP (158.51.123.14) activity.
 """
 
 import os
+import sys
 import csv
+from datetime import timedelta
 from dotenv import load_dotenv
 import google.auth
 from google.auth import iam
@@ -12,6 +14,12 @@ from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_enrichment import describe
+from reports_activities import iter_activities
+from reports_probe import ActivityProbe, format_time
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -19,6 +27,9 @@ ADMIN_USER = os.getenv('ADMIN_USER')
 TARGET_USER = 'lori.maynard@askmoss.com'
 SUSPICIOUS_IP = '158.51.123.14'
 
+# Granularity of the activity timeline found by probing
+PROBE_RESOLUTION = timedelta(hours=1)
+
 
 def get_credentials(admin_email, scopes):
     source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
@@ -34,6 +45,11 @@ def main():
     print(f"Deep investigation of IP: {SUSPICIOUS_IP}")
     print("=" * 70)
 
+    # ASN / provider / country from the offline enrichment database
+    network = describe(SUSPICIOUS_IP)
+    if network:
+        print(f"Network: {network}")
+
     # Get full details from admin log
     print("\n1. Full Admin Email Log entries for this IP:")
     print("-" * 70)
@@ -53,80 +69,53 @@ def main():
                 print(f"DKIM domain: {row.get('DKIM domain')}")
                 print(f"Client Type: {row.get('Client Type')}")
 
-    # Check login audit logs for this IP
-    print("\n\n2. Login events from this IP:")
-    print("-" * 70)
-
+    # Check audit logs for this IP: when was it active, then what did it do
     creds = get_credentials(ADMIN_USER, ['https://www.googleapis.com/auth/admin.reports.audit.readonly'])
     service = build('admin', 'reports_v1', credentials=creds)
 
-    # Search login events
-    results = service.activities().list(
-        userKey=TARGET_USER,
-        applicationName='login',
-        maxResults=500
-    ).execute()
-
-    found_login = False
-    for event in results.get('items', []):
-        ip = event.get('ipAddress', '')
-        if ip == SUSPICIOUS_IP:
-            found_login = True
-            print(f"\nTime: {event.get('id', {}).get('time')}")
+    sections = [
+        ('2', 'login', 'Login events', True),
+        ('3', 'token', 'OAuth/Token events', True),
+        ('4', 'gmail', 'Gmail activity events', False),
+    ]
+    for number, application, label, show_params in sections:
+        print(f"\n\n{number}. {label} from this IP (whole tenant):")
+        print("-" * 70)
+        probe_ip_activity(service, application, show_params)
+
+
+def probe_ip_activity(service, application, show_params):
+    """Locate the IP's activity with cheap probes, then fetch only those stretches."""
+    probe = ActivityProbe(service, userKey='all', applicationName=application,
+                          actorIpAddress=SUSPICIOUS_IP)
+    first = probe.first()
+    if first is None:
+        print(f"  No {application} events found from this IP! ({probe.calls} API calls)")
+        return
+    last = probe.last()
+    intervals = probe.intervals(resolution=PROBE_RESOLUTION)
+
+    print(f"  First seen: {first.get('id', {}).get('time')} ({first.get('actor', {}).get('email')})")
+    print(f"  Last seen:  {last.get('id', {}).get('time')} ({last.get('actor', {}).get('email')})")
+    print(f"  Active intervals ({probe.calls} API calls):")
+    for interval in reversed(intervals):
+        print(f"    {format_time(interval.start)} - {format_time(interval.end)}")
+
+    for interval in reversed(intervals):
+        for event in iter_activities(
+            service,
+            userKey='all',
+            applicationName=application,
+            actorIpAddress=SUSPICIOUS_IP,
+            startTime=format_time(interval.start),
+            endTime=format_time(interval.end)
+        ):
+            print(f"\nTime: {event.get('id', {}).get('time')}  User: {event.get('actor', {}).get('email')}")
             for e in event.get('events', []):
                 print(f"  Event: {e.get('name')}")
-                for p in e.get('parameters', []):
-                    print(f"    {p.get('name')}: {p.get('value')}")
-
-    if not found_login:
-        print("  No login events found from this IP!")
-
-    # Check token/OAuth events for this IP
-    print("\n\n3. OAuth/Token events from this IP:")
-    print("-" * 70)
-
-    results = service.activities().list(
-        userKey=TARGET_USER,
-        applicationName='token',
-        maxResults=500
-    ).execute()
-
-    found_token = False
-    for event in results.get('items', []):
-        ip = event.get('ipAddress', '')
-        if ip == SUSPICIOUS_IP:
-            found_token = True
-            print(f"\nTime: {event.get('id', {}).get('time')}")
-            for e in event.get('events', []):
-                print(f"  Event: {e.get('name')}")
-                for p in e.get('parameters', []):
-                    print(f"    {p.get('name')}: {p.get('value')}")
-
-    if not found_token:
-        print("  No OAuth/token events found from this IP!")
-
-    # Check Gmail activity from this IP
-    print("\n\n4. Gmail activity events from this IP:")
-    print("-" * 70)
-
-    results = service.activities().list(
-        userKey=TARGET_USER,
-        applicationName='gmail',
-        maxResults=1000
-    ).execute()
-
-    found_gmail = False
-    for event in results.get('items', []):
-        ip = event.get('ipAddress', '')
-        if ip == SUSPICIOUS_IP:
-            found_gmail = True
-            print(f"\nTime: {event.get('id', {}).get('time')}")
-            for e in event.get('events', []):
-                print(f"  Event: {e.get('name')}")
-
-    if not found_gmail:
-        print("  No Gmail activity events found from this IP in audit logs!")
-
+                if show_params:
+                    for p in e.get('parameters', []):
+                        print(f"    {p.get('name')}: {p.get('value')}")
 
 if __name__ == '__main__':
     main()
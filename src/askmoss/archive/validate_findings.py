@@ -6,8 +6,14 @@ Validate our findings:
 """
 
 import csv
+import os
+import sys
 from collections import defaultdict, Counter
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_classifier import classify
+
 # Known legitimate
 OFFICE_IP = '199.200.88.186'
 KNOWN_LEGIT = {
@@ -24,18 +30,9 @@ KNOWN_ATTACKER = {
     '158.51.123.14',   # Operations
 }
 
-# AWS IPs (Abnormal Security)
-AWS_PREFIXES = ('44.', '52.', '35.', '50.17.', '13.59.', '3.132.', '3.231.', '34.', '100.', '107.23.')
-
-# Google IPs
-GOOGLE_PREFIXES = ('209.85.',)
-
 def is_known_service(ip):
     """Check if IP is a known service (AWS, Google, etc.)"""
-    for prefix in AWS_PREFIXES + GOOGLE_PREFIXES:
-        if ip.startswith(prefix):
-            return True
-    return False
+    return classify(ip) in ('aws', 'google', 'salesforce', 'private')
 
 def main():
     filepath = '/home/robert/Downloads/lori-all.csv'
@@ -96,7 +93,7 @@ def main():
         # Skip known
         if ip in KNOWN_LEGIT or ip in KNOWN_ATTACKER:
             continue
-        if ip.startswith('199.200.'):  # Office range
+        if classify(ip) == 'office':  # Office range
             continue
         if ':' in ip:  # IPv6 (mobile)
             continue
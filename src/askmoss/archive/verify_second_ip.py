@@ -4,8 +4,14 @@ Verify that 138.199.114.2 (second highest IP) is legitimate.
 """
 
 import csv
+import os
+import sys
 from collections import Counter
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_enrichment import describe
+
 SECOND_IP = '138.199.114.2'
 
 def main():
@@ -14,6 +20,11 @@ def main():
     print(f"Verifying IP: {SECOND_IP}")
     print("=" * 60)
 
+    # ASN / provider / country from the offline enrichment database
+    network = describe(SECOND_IP)
+    if network:
+        print(f"Network: {network}")
+
     events_by_date = Counter()
     events_by_type = Counter()
 
@@ -4,6 +4,7 @@ Re-verify the Gmail SENT count for Dec 1-17 to understand discrepancy.
 """
 
 import os
+import sys
 from dotenv import load_dotenv
 import google.auth
 from google.auth import iam
@@ -11,6 +12,10 @@ from google.auth.transport import requests as auth_requests
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gmail_fetch import get_message
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -77,10 +82,10 @@ def main():
 
     message_ids = set()
     for msg in all_messages[:100]:  # Sample first 100
-        full_msg = service.users().messages().get(
-            userId='me', id=msg['id'], format='metadata',
+        full_msg = get_message(
+            service, msg['id'], format='metadata',
             metadataHeaders=['Message-ID']
-        ).execute()
+        )
         headers = full_msg.get('payload', {}).get('headers', [])
         for h in headers:
             if h['name'].lower() == 'message-id':
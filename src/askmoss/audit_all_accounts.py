@@ -5,16 +5,18 @@ Comprehensive check across all 89 active users.
 """
 
 import os
-import time
+import sys
 from collections import defaultdict
 from dotenv import load_dotenv
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from directory_users import iter_users
+from reports_activities import iter_activities
+from reports_domain import list_domain_activities
+from workspace_auth import build_service, get_delegated_credentials
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -29,122 +31,123 @@ ATTACKER_IPS = {
     '158.51.123.14',    # Operations - Dec 4-15
 }
 
+# (application, start, end) windows searched for attacker IP activity
+AUDIT_WINDOWS = [
+    ('login', '2025-11-01T00:00:00.000Z', '2025-12-24T00:00:00.000Z'),
+    ('token', '2025-11-01T00:00:00.000Z', '2025-12-24T00:00:00.000Z'),
+    # Gmail events limited to Dec 1-17 attack window
+    ('gmail', '2025-12-01T00:00:00.000Z', '2025-12-18T00:00:00.000Z'),
+]
+
+# One domain-wide query per application/attacker IP instead of per-user calls;
+# set REPORTS_DOMAIN_WIDE=0 to fall back to checking users one at a time
+DOMAIN_WIDE = os.getenv('REPORTS_DOMAIN_WIDE', 'true').lower() not in ('0', 'false', 'no')
+
 
 def get_credentials(admin_email, scopes):
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-    request = auth_requests.Request()
-    signer = iam.Signer(request=request, credentials=source_credentials, service_account_email=SERVICE_ACCOUNT_EMAIL)
-    return service_account.Credentials(
-        signer=signer, service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token', scopes=scopes, subject=admin_email
-    )
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, admin_email, scopes)
 
 
 def get_all_users():
     """Get all active users from the domain."""
     creds = get_credentials(ADMIN_USER, ['https://www.googleapis.com/auth/admin.directory.user.readonly'])
-    service = build('admin', 'directory_v1', credentials=creds)
-
-    users = []
-    page_token = None
-
-    while True:
-        results = service.users().list(
-            customer='my_customer',
-            maxResults=500,
-            pageToken=page_token,
-            orderBy='email'
-        ).execute()
+    return list(iter_users(creds, active_only=True))
 
-        users.extend(results.get('users', []))
-        page_token = results.get('nextPageToken')
-        if not page_token:
-            break
 
-    # Filter to active users only
-    active_users = [u for u in users if not u.get('suspended', False)]
-    return active_users
-
-
-def check_user_for_attacker_ips(service, user_email):
-    """Quick check of a user for attacker IP activity."""
+def attacker_events_for(user_email, application, items):
+    """Turn one application's activity items into attacker event records."""
     attacker_events = []
 
-    # Check login events
-    try:
-        results = service.activities().list(
-            userKey=user_email,
-            applicationName='login',
-            startTime='2025-11-01T00:00:00.000Z',
-            endTime='2025-12-24T00:00:00.000Z',
-            maxResults=200
-        ).execute()
-
-        for event in results.get('items', []):
-            ip = event.get('ipAddress', '')
-            if ip in ATTACKER_IPS:
+    for event in items:
+        ip = event.get('ipAddress', '')
+        if ip not in ATTACKER_IPS:
+            continue
+
+        if application == 'login':
+            attacker_events.append({
+                'user': user_email,
+                'type': 'LOGIN',
+                'ip': ip,
+                'time': event.get('id', {}).get('time', '')
+            })
+        elif application == 'token':
+            for e in event.get('events', []):
+                params = {p['name']: p.get('value', '') for p in e.get('parameters', [])}
                 attacker_events.append({
                     'user': user_email,
-                    'type': 'LOGIN',
+                    'type': 'OAUTH',
                     'ip': ip,
-                    'time': event.get('id', {}).get('time', '')
+                    'time': event.get('id', {}).get('time', ''),
+                    'app': params.get('app_name', 'Unknown')
+                })
+        elif application == 'gmail':
+            for e in event.get('events', []):
+                attacker_events.append({
+                    'user': user_email,
+                    'type': 'GMAIL',
+                    'ip': ip,
+                    'time': event.get('id', {}).get('time', ''),
+                    'event': e.get('name', '')
                 })
-    except HttpError as e:
-        if e.resp.status != 400:  # Ignore "user not found" type errors
-            pass
-
-    # Check token events
-    try:
-        results = service.activities().list(
-            userKey=user_email,
-            applicationName='token',
-            startTime='2025-11-01T00:00:00.000Z',
-            endTime='2025-12-24T00:00:00.000Z',
-            maxResults=200
-        ).execute()
-
-        for event in results.get('items', []):
-            ip = event.get('ipAddress', '')
-            if ip in ATTACKER_IPS:
-                for e in event.get('events', []):
-                    params = {p['name']: p.get('value', '') for p in e.get('parameters', [])}
-                    attacker_events.append({
-                        'user': user_email,
-                        'type': 'OAUTH',
-                        'ip': ip,
-                        'time': event.get('id', {}).get('time', ''),
-                        'app': params.get('app_name', 'Unknown')
-                    })
-    except HttpError:
-        pass
-
-    # Check Gmail events (limited to Dec 1-17 attack window)
-    try:
-        results = service.activities().list(
-            userKey=user_email,
-            applicationName='gmail',
-            startTime='2025-12-01T00:00:00.000Z',
-            endTime='2025-12-18T00:00:00.000Z',
-            maxResults=200
-        ).execute()
-
-        for event in results.get('items', []):
-            ip = event.get('ipAddress', '')
-            if ip in ATTACKER_IPS:
-                for e in event.get('events', []):
-                    attacker_events.append({
-                        'user': user_email,
-                        'type': 'GMAIL',
-                        'ip': ip,
-                        'time': event.get('id', {}).get('time', ''),
-                        'event': e.get('name', '')
-                    })
-    except HttpError:
-        pass
 
     return attacker_events
 
 
+def check_user_for_attacker_ips(service, user_email, windows=AUDIT_WINDOWS, failures=None):
+    """Quick check of a user for attacker IP activity.
+
+    Queries that fail are appended to failures as (user, application, error).
+    """
+    attacker_events = []
+
+    for application, start_time, end_time in windows:
+        try:
+            events = list(iter_activities(
+                service,
+                userKey=user_email,
+                applicationName=application,
+                startTime=start_time,
+                endTime=end_time
+            ))
+        except HttpError as e:
+            # Ignore "user not found" type errors; anything else survived retries
+            if e.resp.status not in (400, 404):
+                print(f"       [!] {application} events for {user_email} incomplete: {e}")
+                if failures is not None:
+                    failures.append((user_email, application, str(e)))
+            continue
+
+        attacker_events.extend(attacker_events_for(user_email, application, events))
+
+    return attacker_events
+
+
+def check_domain_for_attacker_ips(service):
+    """Check every account at once: ({actor email: attacker events}, failed windows).
+
+    Makes one userKey='all' query per application and attacker IP, then
+    splits the events by actor locally. Windows whose query failed are
+    returned so they can be checked user by user instead.
+    """
+    events_by_user = defaultdict(list)
+    failed_windows = []
+
+    for window in AUDIT_WINDOWS:
+        application, start_time, end_time = window
+        try:
+            by_actor = list_domain_activities(service, application, start_time, end_time,
+                                              actor_ip_addresses=ATTACKER_IPS)
+        except HttpError as e:
+            print(f"       Error fetching {application} events: {e}")
+            failed_windows.append(window)
+            continue
+
+        for email, items in by_actor.items():
+            events_by_user[email].extend(attacker_events_for(email, application, items))
+
+    return events_by_user, failed_windows
+
+
 def main():
     print("=" * 80)
     print("FULL DOMAIN AUDIT - Checking ALL accounts for attacker IPs")
@@ -161,7 +164,7 @@ def main():
 
     # Set up reports API
     creds = get_credentials(ADMIN_USER, ['https://www.googleapis.com/auth/admin.reports.audit.readonly'])
-    service = build('admin', 'reports_v1', credentials=creds)
+    service = build_service('admin', 'reports_v1', credentials=creds)
 
     # Check each user
     print(f"\n[2/2] Checking each user for attacker IP activity...")
@@ -169,8 +172,18 @@ def main():
 
     all_attacker_events = []
     compromised_users = set()
+    failures = []
     checked = 0
 
+    domain_events = {}
+    per_user_windows = AUDIT_WINDOWS
+    if DOMAIN_WIDE:
+        domain_events, per_user_windows = check_domain_for_attacker_ips(service)
+        if per_user_windows:
+            # Never read a failed pull as "no activity": ask per user instead
+            apps = ', '.join(application for application, _, _ in per_user_windows)
+            print(f"       Falling back to one query per user for: {apps}\n")
+
     for user in users:
         email = user.get('primaryEmail', '')
         checked += 1
@@ -179,16 +192,15 @@ def main():
         if checked % 10 == 0 or checked == len(users):
             print(f"       Progress: {checked}/{len(users)} users checked...")
 
-        events = check_user_for_attacker_ips(service, email)
+        events = domain_events.pop(email.lower(), [])
+        if per_user_windows:
+            events += check_user_for_attacker_ips(service, email, per_user_windows, failures)
 
         if events:
             compromised_users.add(email)
             all_attacker_events.extend(events)
             print(f"       *** FOUND: {email} - {len(events)} attacker events ***")
 
-        # Small delay to avoid rate limiting
-        time.sleep(0.1)
-
     # ================================================================
     # RESULTS
     # ================================================================
@@ -199,6 +211,25 @@ def main():
     print(f"\nUsers checked: {len(users)}")
     print(f"Users with attacker activity: {len(compromised_users)}")
     print(f"Total attacker events found: {len(all_attacker_events)}")
+    print(f"Other actors with attacker activity: {len(domain_events)}")
+    print(f"Queries that failed: {len(failures)}")
+
+    if failures:
+        print("\n" + "-" * 80)
+        print("NOT CHECKED (query failed):")
+        print("-" * 80)
+        for email, application, error in failures:
+            print(f"  ❌ {email} ({application}): {error}")
+
+    if domain_events:
+        # Suspended or deleted accounts and external actors
+        print("\n" + "-" * 80)
+        print("ATTACKER ACTIVITY BY ACTORS NOT IN THE ACTIVE USER LIST:")
+        print("-" * 80)
+        for actor, actor_events in sorted(domain_events.items()):
+            print(f"\n  {actor or '(no actor email)'}:")
+            for event in sorted(actor_events, key=lambda x: x['time']):
+                print(f"    {event['time']} | {event['type']:<6} | {event['ip']}")
 
     if compromised_users:
         print("\n" + "-" * 80)
@@ -215,7 +246,9 @@ def main():
                     print(f"      App: {event['app']}")
                 if event.get('event'):
                     print(f"      Event: {event['event']}")
-    else:
+    elif failures:
+        print("\n  No attacker IP activity found by the queries that succeeded")
+    elif not domain_events:
         print("\n  ✅ No attacker IP activity found in any account!")
 
     # ================================================================
@@ -236,10 +269,21 @@ def main():
         print("    3. Revoke all OAuth tokens")
         print("    4. Check Gmail settings for persistence")
         print("    5. Pull full activity logs for forensic analysis")
-    else:
+
+    if domain_events:
+        print(f"\n  ⚠️  {len(domain_events)} actor(s) outside the active user list used attacker IPs")
+        print("     Review them in the results above")
+
+    if failures:
+        print(f"\n  ❌ {len(failures)} queries failed - results are incomplete")
+
+    if not (compromised_users or domain_events or failures):
         print("\n  ✅ CLEAN - No accounts accessed by attacker IPs")
         print("     (besides lori.maynard@askmoss.com which was already remediated)")
 
+    if failures:
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
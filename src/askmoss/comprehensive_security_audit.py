@@ -10,17 +10,20 @@ Checks all users for:
 """
 
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
 from dotenv import load_dotenv
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from api_executor import execute
+from directory_users import iter_users
+from reports_activities import iter_activities
+from workspace_auth import build_service, get_delegated_credentials
+
 load_dotenv('/home/robert/Work/_archive/email-forensics/.env')
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -39,51 +42,24 @@ ATTACKER_IPS = {
     '158.51.123.14',
 }
 
+# Users whose Gmail settings are audited in parallel (each worker builds its own service)
+AUDIT_CONCURRENCY = int(os.getenv('AUDIT_CONCURRENCY', '10'))
+
 
 def get_admin_credentials(scopes):
     """Get credentials with domain-wide delegation as admin."""
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-    request = auth_requests.Request()
-    signer = iam.Signer(request=request, credentials=source_credentials, service_account_email=SERVICE_ACCOUNT_EMAIL)
-    return service_account.Credentials(
-        signer=signer, service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token', scopes=scopes, subject=ADMIN_USER
-    )
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, ADMIN_USER, scopes)
 
 
 def get_user_credentials(user_email, scopes):
     """Get credentials impersonating a specific user."""
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-    request = auth_requests.Request()
-    signer = iam.Signer(request=request, credentials=source_credentials, service_account_email=SERVICE_ACCOUNT_EMAIL)
-    return service_account.Credentials(
-        signer=signer, service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token', scopes=scopes, subject=user_email
-    )
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, user_email, scopes)
 
 
 def get_all_users():
-    """Get all active users from the domain."""
+    """Stream all active users from the domain as directory pages arrive."""
     creds = get_admin_credentials(['https://www.googleapis.com/auth/admin.directory.user.readonly'])
-    service = build('admin', 'directory_v1', credentials=creds)
-
-    users = []
-    page_token = None
-
-    while True:
-        results = service.users().list(
-            customer='my_customer',
-            maxResults=500,
-            pageToken=page_token,
-            orderBy='email'
-        ).execute()
-
-        users.extend(results.get('users', []))
-        page_token = results.get('nextPageToken')
-        if not page_token:
-            break
-
-    return [u for u in users if not u.get('suspended', False)]
+    return iter_users(creds, active_only=True)
 
 
 def check_user_gmail_settings(user_email):
@@ -95,11 +71,11 @@ def check_user_gmail_settings(user_email):
             'https://www.googleapis.com/auth/gmail.settings.basic',
             'https://www.googleapis.com/auth/gmail.readonly'
         ])
-        gmail = build('gmail', 'v1', credentials=creds)
+        gmail = build_service('gmail', 'v1', credentials=creds)
 
         # Check filters
         try:
-            filters = gmail.users().settings().filters().list(userId='me').execute()
+            filters = execute(gmail.users().settings().filters().list(userId='me'))
             for f in filters.get('filter', []):
                 criteria = f.get('criteria', {})
                 action = f.get('action', {})
@@ -129,11 +105,12 @@ def check_user_gmail_settings(user_email):
                     })
 
         except Exception as e:
-            pass
+            # Record it: a check that failed is not a clean result
+            issues.append({'type': 'CHECK_ERROR', 'user': user_email, 'check': 'filters', 'error': str(e)})
 
         # Check auto-forwarding
         try:
-            auto_fwd = gmail.users().settings().getAutoForwarding(userId='me').execute()
+            auto_fwd = execute(gmail.users().settings().getAutoForwarding(userId='me'))
             if auto_fwd.get('enabled'):
                 issues.append({
                     'type': 'FORWARDING',
@@ -142,11 +119,11 @@ def check_user_gmail_settings(user_email):
                     'disposition': auto_fwd.get('disposition')
                 })
         except Exception as e:
-            pass
+            issues.append({'type': 'CHECK_ERROR', 'user': user_email, 'check': 'auto-forwarding', 'error': str(e)})
 
         # Check forwarding addresses
         try:
-            forwards = gmail.users().settings().forwardingAddresses().list(userId='me').execute()
+            forwards = execute(gmail.users().settings().forwardingAddresses().list(userId='me'))
             for fwd in forwards.get('forwardingAddresses', []):
                 issues.append({
                     'type': 'FORWARDING_ADDRESS',
@@ -155,11 +132,11 @@ def check_user_gmail_settings(user_email):
                     'status': fwd.get('verificationStatus')
                 })
         except Exception as e:
-            pass
+            issues.append({'type': 'CHECK_ERROR', 'user': user_email, 'check': 'forwarding addresses', 'error': str(e)})
 
         # Check delegates
         try:
-            delegates = gmail.users().settings().delegates().list(userId='me').execute()
+            delegates = execute(gmail.users().settings().delegates().list(userId='me'))
             for delegate in delegates.get('delegates', []):
                 issues.append({
                     'type': 'DELEGATE',
@@ -168,7 +145,7 @@ def check_user_gmail_settings(user_email):
                     'status': delegate.get('verificationStatus')
                 })
         except Exception as e:
-            pass
+            issues.append({'type': 'CHECK_ERROR', 'user': user_email, 'check': 'delegates', 'error': str(e)})
 
     except Exception as e:
         return None
@@ -176,6 +153,32 @@ def check_user_gmail_settings(user_email):
     return issues
 
 
+def audit_users_gmail_settings(emails, max_workers=AUDIT_CONCURRENCY):
+    """Run check_user_gmail_settings() for many users on a bounded thread pool.
+
+    Yields (email, issues) in the same order as emails regardless of which
+    worker finishes first, so the report is identical from run to run.
+    emails may be a lazy iterable (e.g. streamed from the directory); users
+    are submitted as they arrive, keeping at most two per worker queued.
+    Closing the generator early cancels any users not yet started.
+    """
+    max_workers = max(1, max_workers)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for email in emails:
+                pending.append((email, executor.submit(check_user_gmail_settings, email)))
+                while pending and (pending[0][1].done() or len(pending) >= 2 * max_workers):
+                    email, future = pending.popleft()
+                    yield email, future.result()
+            while pending:
+                email, future = pending.popleft()
+                yield email, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
 def check_admin_changes():
     """Check for admin-level changes during the compromise window."""
     print("\n" + "=" * 80)
@@ -183,24 +186,23 @@ def check_admin_changes():
     print("=" * 80)
 
     creds = get_admin_credentials(['https://www.googleapis.com/auth/admin.reports.audit.readonly'])
-    service = build('admin', 'reports_v1', credentials=creds)
+    service = build_service('admin', 'reports_v1', credentials=creds)
 
-    results = service.activities().list(
+    events = iter_activities(
+        service,
         userKey='all',
         applicationName='admin',
         startTime=ATTACK_START.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        endTime=ATTACK_END.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        maxResults=1000
-    ).execute()
-
-    events = results.get('items', [])
-    print(f"\nFound {len(events)} admin events during compromise window")
+        endTime=ATTACK_END.strftime('%Y-%m-%dT%H:%M:%SZ')
+    )
+    event_count = 0
 
     suspicious_events = []
     user_changes = []
     security_changes = []
 
     for event in events:
+        event_count += 1
         ip = event.get('ipAddress', 'Unknown')
         actor = event.get('actor', {}).get('email', 'Unknown')
         timestamp = event.get('id', {}).get('time', '')[:19]
@@ -226,6 +228,8 @@ def check_admin_changes():
             if 'SECURITY' in event_name or '2SV' in event_name or 'PASSWORD' in event_name:
                 security_changes.append(event_data)
 
+    print(f"\nFound {event_count} admin events during compromise window")
+
     print("\n--- EVENTS FROM ATTACKER IPs ---")
     if suspicious_events:
         for evt in suspicious_events:
@@ -268,18 +272,16 @@ def check_oauth_tokens():
     print("=" * 80)
 
     creds = get_admin_credentials(['https://www.googleapis.com/auth/admin.reports.audit.readonly'])
-    service = build('admin', 'reports_v1', credentials=creds)
+    service = build_service('admin', 'reports_v1', credentials=creds)
 
-    results = service.activities().list(
+    events = iter_activities(
+        service,
         userKey='all',
         applicationName='token',
         startTime=ATTACK_START.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        endTime=ATTACK_END.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        maxResults=1000
-    ).execute()
-
-    events = results.get('items', [])
-    print(f"\nFound {len(events)} token events during compromise window")
+        endTime=ATTACK_END.strftime('%Y-%m-%dT%H:%M:%SZ')
+    )
+    event_count = 0
 
     legit_apps = {
         'Google Chrome', 'Gmail', 'Google Drive', 'Google Docs', 'Google Sheets',
@@ -291,6 +293,7 @@ def check_oauth_tokens():
     attacker_grants = []
 
     for event in events:
+        event_count += 1
         ip = event.get('ipAddress', 'Unknown')
         actor = event.get('actor', {}).get('email', 'Unknown')
         timestamp = event.get('id', {}).get('time', '')[:19]
@@ -316,6 +319,8 @@ def check_oauth_tokens():
                 if any(s in scopes.lower() for s in ['mail', 'gmail', 'drive', 'admin']):
                     suspicious_grants.append(grant_data)
 
+    print(f"\nFound {event_count} token events during compromise window")
+
     print("\n--- TOKEN GRANTS FROM ATTACKER IPs ---")
     if attacker_grants:
         for grant in attacker_grants:
@@ -346,13 +351,13 @@ def check_mobile_devices():
 
     try:
         creds = get_admin_credentials(['https://www.googleapis.com/auth/admin.directory.device.mobile.readonly'])
-        service = build('admin', 'directory_v1', credentials=creds)
+        service = build_service('admin', 'directory_v1', credentials=creds)
 
-        results = service.mobiledevices().list(
+        results = execute(service.mobiledevices().list(
             customerId='my_customer',
             query=f"email:{compromised_user}",
             maxResults=100
-        ).execute()
+        ))
 
         devices = results.get('mobiledevices', [])
         print(f"\nDevices for {compromised_user}: {len(devices)}")
@@ -400,35 +405,37 @@ def main():
     print("=" * 80)
 
     users = get_all_users()
-    print(f"\nChecking {len(users)} users...")
+    print("\nChecking all active users as the directory is enumerated...")
 
     all_issues = []
+    check_errors = []
     checked = 0
     failed = 0
 
-    for user in users:
-        email = user.get('primaryEmail', '')
+    emails = (user.get('primaryEmail', '') for user in users)
+
+    for email, issues in audit_users_gmail_settings(emails):
         checked += 1
 
         if checked % 20 == 0:
-            print(f"  Progress: {checked}/{len(users)}...")
-
-        issues = check_user_gmail_settings(email)
+            print(f"  Progress: {checked} users...")
 
         if issues is None:
             failed += 1
             if failed == 1:
                 print(f"\n  ⚠️ Cannot check Gmail settings - scope not configured")
                 break
-        elif issues:
-            all_issues.extend(issues)
-            print(f"  ⚠️ Found {len(issues)} issue(s) for {email}")
-
-        time.sleep(0.1)
+        else:
+            check_errors.extend(i for i in issues if i['type'] == 'CHECK_ERROR')
+            issues = [i for i in issues if i['type'] != 'CHECK_ERROR']
+            if issues:
+                all_issues.extend(issues)
+                print(f"  ⚠️ Found {len(issues)} issue(s) for {email}")
 
     if failed == 0:
         print(f"\n  Checked: {checked} users")
         print(f"  Issues found: {len(all_issues)}")
+        print(f"  Checks that failed: {len(check_errors)}")
 
         if all_issues:
             print("\n--- SUSPICIOUS GMAIL SETTINGS ---\n")
@@ -450,6 +457,11 @@ def main():
         else:
             print("\n  ✅ No suspicious Gmail settings found!")
 
+        if check_errors:
+            print("\n--- GMAIL SETTINGS CHECKS THAT FAILED (not audited) ---\n")
+            for error in check_errors:
+                print(f"    ❌ {error['user']}: {error['check']} - {error['error']}")
+
     # Summary
     print("\n" + "=" * 80)
     print("AUDIT SUMMARY")
@@ -457,7 +469,7 @@ def main():
 
     issues_found = len(admin_suspicious) + len(attacker_tokens) + len(all_issues)
 
-    if issues_found == 0 and failed == 0:
+    if issues_found == 0 and failed == 0 and not check_errors:
         print("\n  ✅ No suspicious activity found")
     else:
         if admin_suspicious:
@@ -466,6 +478,8 @@ def main():
             print(f"  🚨 Token grants from attacker IPs: {len(attacker_tokens)}")
         if all_issues:
             print(f"  ⚠️ Suspicious Gmail settings: {len(all_issues)}")
+        if check_errors:
+            print(f"  ❌ Gmail settings checks that failed: {len(check_errors)}")
         if failed > 0:
             print(f"\n  ⚠️ Gmail settings incomplete - add gmail.settings.basic scope")
 
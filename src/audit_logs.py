@@ -19,6 +19,9 @@ Usage:
     # Then run:
     python audit_logs.py --user lori.maynard@domain.com --days 30
     python audit_logs.py --user lori.maynard@domain.com --start 2024-12-01 --end 2024-12-15
+
+    # Re-run hourly during an incident, fetching only new events each time
+    python audit_logs.py --user lori.maynard@domain.com --days 30 --sync
 """
 
 import argparse
@@ -29,13 +32,12 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from ip_enrichment import annotate_events, describe
+from reports_sync import list_activities, sync_activities
+from workspace_auth import build_service, get_delegated_credentials
+
 # Load environment
 load_dotenv()
 
@@ -50,28 +52,7 @@ SCOPES = [
 
 def get_credentials(admin_email: str):
     """Get credentials with domain-wide delegation via ADC impersonation."""
-    # Get ADC credentials (already impersonating the service account via gcloud)
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-
-    request = auth_requests.Request()
-
-    # Use IAM Credentials API to sign JWTs for domain-wide delegation
-    signer = iam.Signer(
-        request=request,
-        credentials=source_credentials,
-        service_account_email=SERVICE_ACCOUNT_EMAIL
-    )
-
-    # Create service account credentials with the signer and subject for domain-wide delegation
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=admin_email
-    )
-
-    return delegated_credentials
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, admin_email, SCOPES)
 
 
 def format_timestamp(ts_str: str) -> str:
@@ -85,7 +66,7 @@ def format_timestamp(ts_str: str) -> str:
         return ts_str
 
 
-def get_login_events(service, user_email: str, start_time: str, end_time: str):
+def get_login_events(service, user_email: str, start_time: str, end_time: str, sync: bool = False):
     """Fetch login audit events for a user."""
     print(f"\n{'='*80}")
     print(f"LOGIN AUDIT EVENTS FOR: {user_email}")
@@ -94,19 +75,17 @@ def get_login_events(service, user_email: str, start_time: str, end_time: str):
 
     events = []
     try:
-        request = service.activities().list(
-            userKey=user_email,
-            applicationName='login',
-            startTime=start_time,
-            endTime=end_time,
-            maxResults=1000
-        )
-
-        while request:
-            response = request.execute()
-            items = response.get('items', [])
-            events.extend(items)
-            request = service.activities().list_next(request, response)
+        if sync:
+            events = sync_activities(service, user_email, 'login', start_time, end_time)
+        else:
+            events = list_activities(
+                service,
+                userKey=user_email,
+                applicationName='login',
+                startTime=start_time,
+                endTime=end_time,
+                maxResults=1000
+            )
 
     except HttpError as e:
         print(f"Error fetching login events: {e}")
@@ -118,6 +97,9 @@ def get_login_events(service, user_email: str, start_time: str, end_time: str):
 
     print(f"\nFound {len(events)} login events:\n")
 
+    # Attach ASN / provider / country to each event (saved with the JSON)
+    annotate_events(events)
+
     # Categorize events
     suspicious = []
     normal = []
@@ -160,6 +142,9 @@ def get_login_events(service, user_email: str, start_time: str, end_time: str):
         for e in suspicious:
             print(f"  [{e['time']}] {e['name']}")
             print(f"    IP: {e['ip']}")
+            network = describe(e['ip'])
+            if network:
+                print(f"    Network: {network}")
             print(f"    Type: {e['login_type']}")
             if e['challenge_method']:
                 print(f"    Challenge: {e['challenge_method']}")
@@ -177,7 +162,7 @@ def get_login_events(service, user_email: str, start_time: str, end_time: str):
     return events
 
 
-def get_gmail_events(service, user_email: str, start_time: str, end_time: str):
+def get_gmail_events(service, user_email: str, start_time: str, end_time: str, sync: bool = False):
     """Fetch Gmail audit events (requires enterprise/E5)."""
     print(f"\n{'='*80}")
     print(f"GMAIL AUDIT EVENTS FOR: {user_email}")
@@ -187,19 +172,17 @@ def get_gmail_events(service, user_email: str, start_time: str, end_time: str):
     events = []
     try:
         # Note: Gmail audit logs may require Gmail Enterprise
-        request = service.activities().list(
-            userKey=user_email,
-            applicationName='gmail',
-            startTime=start_time,
-            endTime=end_time,
-            maxResults=1000
-        )
-
-        while request:
-            response = request.execute()
-            items = response.get('items', [])
-            events.extend(items)
-            request = service.activities().list_next(request, response)
+        if sync:
+            events = sync_activities(service, user_email, 'gmail', start_time, end_time)
+        else:
+            events = list_activities(
+                service,
+                userKey=user_email,
+                applicationName='gmail',
+                startTime=start_time,
+                endTime=end_time,
+                maxResults=1000
+            )
 
     except HttpError as e:
         if 'not enabled' in str(e).lower() or '400' in str(e):
@@ -232,7 +215,7 @@ def get_gmail_events(service, user_email: str, start_time: str, end_time: str):
     return events
 
 
-def get_token_events(service, user_email: str, start_time: str, end_time: str):
+def get_token_events(service, user_email: str, start_time: str, end_time: str, sync: bool = False):
     """Fetch OAuth token/app authorization events."""
     print(f"\n{'='*80}")
     print(f"OAUTH/TOKEN EVENTS FOR: {user_email}")
@@ -241,19 +224,17 @@ def get_token_events(service, user_email: str, start_time: str, end_time: str):
 
     events = []
     try:
-        request = service.activities().list(
-            userKey=user_email,
-            applicationName='token',
-            startTime=start_time,
-            endTime=end_time,
-            maxResults=1000
-        )
-
-        while request:
-            response = request.execute()
-            items = response.get('items', [])
-            events.extend(items)
-            request = service.activities().list_next(request, response)
+        if sync:
+            events = sync_activities(service, user_email, 'token', start_time, end_time)
+        else:
+            events = list_activities(
+                service,
+                userKey=user_email,
+                applicationName='token',
+                startTime=start_time,
+                endTime=end_time,
+                maxResults=1000
+            )
 
     except HttpError as e:
         print(f"Error fetching token events: {e}")
@@ -289,7 +270,7 @@ def get_token_events(service, user_email: str, start_time: str, end_time: str):
     return events
 
 
-def get_user_settings_events(service, user_email: str, start_time: str, end_time: str):
+def get_user_settings_events(service, user_email: str, start_time: str, end_time: str, sync: bool = False):
     """Fetch user settings changes (filters, forwarding, etc.)."""
     print(f"\n{'='*80}")
     print(f"USER/ADMIN SETTINGS CHANGES FOR: {user_email}")
@@ -299,20 +280,19 @@ def get_user_settings_events(service, user_email: str, start_time: str, end_time
     events = []
     try:
         # Check admin audit log for changes to this user
-        request = service.activities().list(
-            userKey='all',
-            applicationName='admin',
-            startTime=start_time,
-            endTime=end_time,
-            filters=f'USER_EMAIL=={user_email}',
-            maxResults=1000
-        )
-
-        while request:
-            response = request.execute()
-            items = response.get('items', [])
-            events.extend(items)
-            request = service.activities().list_next(request, response)
+        if sync:
+            events = sync_activities(service, 'all', 'admin', start_time, end_time,
+                                     filters=f'USER_EMAIL=={user_email}')
+        else:
+            events = list_activities(
+                service,
+                userKey='all',
+                applicationName='admin',
+                startTime=start_time,
+                endTime=end_time,
+                filters=f'USER_EMAIL=={user_email}',
+                maxResults=1000
+            )
 
     except HttpError as e:
         print(f"Error fetching admin events: {e}")
@@ -364,6 +344,8 @@ def main():
     parser.add_argument('--start', '-s', help='Start date (YYYY-MM-DD)')
     parser.add_argument('--end', '-e', help='End date (YYYY-MM-DD)')
     parser.add_argument('--output', '-o', help='Output JSON file prefix')
+    parser.add_argument('--sync', action='store_true',
+                        help='Incremental mode: only fetch events newer than the last --sync run')
 
     args = parser.parse_args()
 
@@ -391,7 +373,7 @@ def main():
     # Build service
     try:
         credentials = get_credentials(admin_email)
-        service = build('admin', 'reports_v1', credentials=credentials)
+        service = build_service('admin', 'reports_v1', credentials=credentials)
     except Exception as e:
         print(f"ERROR: Failed to authenticate: {e}")
         print("\nMake sure you have:")
@@ -404,10 +386,10 @@ def main():
     all_events = {}
 
     # Fetch all audit types
-    all_events['login'] = get_login_events(service, args.user, start_time, end_time)
-    all_events['gmail'] = get_gmail_events(service, args.user, start_time, end_time)
-    all_events['token'] = get_token_events(service, args.user, start_time, end_time)
-    all_events['admin'] = get_user_settings_events(service, args.user, start_time, end_time)
+    all_events['login'] = get_login_events(service, args.user, start_time, end_time, sync=args.sync)
+    all_events['gmail'] = get_gmail_events(service, args.user, start_time, end_time, sync=args.sync)
+    all_events['token'] = get_token_events(service, args.user, start_time, end_time, sync=args.sync)
+    all_events['admin'] = get_user_settings_events(service, args.user, start_time, end_time, sync=args.sync)
 
     # Save to files
     if args.output or True:  # Always save
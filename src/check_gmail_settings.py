@@ -26,13 +26,11 @@ from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from api_executor import execute
+from workspace_auth import build_service, get_delegated_credentials
+
 # Load environment
 load_dotenv()
 
@@ -48,28 +46,7 @@ SCOPES = [
 
 def get_credentials(user_email: str):
     """Get credentials with domain-wide delegation via ADC impersonation."""
-    # Get ADC credentials (already impersonating the service account via gcloud)
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-
-    request = auth_requests.Request()
-
-    # Use IAM Credentials API to sign JWTs for domain-wide delegation
-    signer = iam.Signer(
-        request=request,
-        credentials=source_credentials,
-        service_account_email=SERVICE_ACCOUNT_EMAIL
-    )
-
-    # Create service account credentials with the signer and subject for domain-wide delegation
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=user_email
-    )
-
-    return delegated_credentials
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, user_email, SCOPES)
 
 
 def check_forwarding(service, user_email: str) -> dict:
@@ -81,7 +58,7 @@ def check_forwarding(service, user_email: str) -> dict:
     result = {'enabled': False, 'address': None, 'disposition': None}
 
     try:
-        settings = service.users().settings().getAutoForwarding(userId='me').execute()
+        settings = execute(service.users().settings().getAutoForwarding(userId='me'))
 
         enabled = settings.get('enabled', False)
         forward_to = settings.get('emailAddress', '')
@@ -117,7 +94,7 @@ def check_filters(service, user_email: str) -> list:
     suspicious = []
 
     try:
-        result = service.users().settings().filters().list(userId='me').execute()
+        result = execute(service.users().settings().filters().list(userId='me'))
         filters = result.get('filter', [])
 
         if not filters:
@@ -215,7 +192,7 @@ def check_delegates(service, user_email: str) -> list:
     delegates = []
 
     try:
-        result = service.users().settings().delegates().list(userId='me').execute()
+        result = execute(service.users().settings().delegates().list(userId='me'))
         delegates = result.get('delegates', [])
 
         if not delegates:
@@ -251,7 +228,7 @@ def check_send_as(service, user_email: str) -> list:
     send_as = []
 
     try:
-        result = service.users().settings().sendAs().list(userId='me').execute()
+        result = execute(service.users().settings().sendAs().list(userId='me'))
         send_as = result.get('sendAs', [])
 
         print(f"\nConfigured send-as addresses:\n")
@@ -301,7 +278,7 @@ def check_vacation_responder(service, user_email: str) -> dict:
     vacation = {}
 
     try:
-        result = service.users().settings().getVacation(userId='me').execute()
+        result = execute(service.users().settings().getVacation(userId='me'))
 
         enabled = result.get('enableAutoReply', False)
         subject = result.get('responseSubject', '')
@@ -336,8 +313,8 @@ def check_imap_pop(service, user_email: str) -> dict:
     settings = {}
 
     try:
-        imap = service.users().settings().getImap(userId='me').execute()
-        pop = service.users().settings().getPop(userId='me').execute()
+        imap = execute(service.users().settings().getImap(userId='me'))
+        pop = execute(service.users().settings().getPop(userId='me'))
 
         settings = {
             'imap_enabled': imap.get('enabled', False),
@@ -396,7 +373,7 @@ def main():
     # Build service
     try:
         credentials = get_credentials(user_email)
-        service = build('gmail', 'v1', credentials=credentials)
+        service = build_service('gmail', 'v1', credentials=credentials)
     except Exception as e:
         print(f"ERROR: Failed to authenticate: {e}")
         print("\nMake sure you have:")
@@ -3,25 +3,25 @@
 Check SPF/DKIM fields for all emails to understand if Canadian VPS is anomalous.
 """
 
-import csv
 from collections import defaultdict
 
+from evidence_store import EvidenceStore
+
 spf_by_ip = defaultdict(set)
 dkim_by_ip = defaultdict(set)
 
 OFFICE_IP = '199.200.88.186'
 SUSPICIOUS_IP = '158.51.123.14'
 
-with open('/home/robert/Downloads/lori-send.csv', 'r') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        ip = row.get('IP address', '')
-        spf = row.get('SPF domain', '') or '(empty)'
-        dkim = row.get('DKIM domain', '') or '(empty)'
+store = EvidenceStore()
+for row in store.events('/home/robert/Downloads/lori-send.csv', columns=['IP address', 'SPF domain', 'DKIM domain']):
+    ip = row.get('IP address', '')
+    spf = row.get('SPF domain', '') or '(empty)'
+    dkim = row.get('DKIM domain', '') or '(empty)'
 
-        if ip:
-            spf_by_ip[ip].add(spf)
-            dkim_by_ip[ip].add(dkim)
+    if ip:
+        spf_by_ip[ip].add(spf)
+        dkim_by_ip[ip].add(dkim)
 
 print("SPF/DKIM Analysis by IP")
 print("=" * 70)
@@ -0,0 +1,150 @@
+"""
+Streaming Directory API user enumeration.
+
+Every audit script used to page through users().list 500 at a time and
+build the whole list before doing any per-user work. iter_users() yields
+users as soon as each page arrives, while a background thread is already
+fetching the next page, so enumeration overlaps with whatever the caller
+does per user.
+
+Optionally (DIRECTORY_SNAPSHOT=/path/to/users.json, or snapshot_path=...)
+each page is persisted with its etag. Later runs send If-None-Match with
+the stored etag and reuse the page from disk when the directory answers
+304 Not Modified, so an unchanged directory is read from the snapshot
+instead of being downloaded again.
+
+Usage:
+    from directory_users import iter_users
+
+    for user in iter_users(credentials, active_only=True):
+        audit(user['primaryEmail'])
+"""
+
+import json
+import os
+import queue
+import threading
+
+from googleapiclient.errors import HttpError
+
+from api_executor import execute
+from workspace_auth import build_service
+
+DEFAULT_SNAPSHOT_PATH = os.getenv('DIRECTORY_SNAPSHOT')
+
+# Pages fetched ahead of the consumer
+PREFETCH_PAGES = 2
+
+_DONE = object()
+
+
+def _load_snapshot(snapshot_path, key):
+    if not snapshot_path or not os.path.exists(snapshot_path):
+        return []
+    with open(snapshot_path, 'r') as f:
+        return json.load(f).get(key, [])
+
+
+def _save_snapshot(snapshot_path, key, pages):
+    snapshot = {}
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r') as f:
+            snapshot = json.load(f)
+    snapshot[key] = pages
+
+    os.makedirs(os.path.dirname(os.path.abspath(snapshot_path)), exist_ok=True)
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, snapshot_path)
+
+
+def _put(pages, item, stop):
+    """Queue an item for the consumer; False if the consumer has gone away."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch_pages(credentials, query, snapshot_path, pages, stop):
+    """Producer thread: page through users().list and queue each page's users."""
+    try:
+        # httplib2 clients are not thread-safe, so this thread gets its own
+        service = build_service('admin', 'directory_v1', credentials=credentials)
+        key = json.dumps(query, sort_keys=True)
+        cached = _load_snapshot(snapshot_path, key)
+        fetched = []
+        page_token = None
+
+        while True:
+            index = len(fetched)
+            page = None
+            if index < len(cached) and cached[index].get('token') == page_token:
+                page = cached[index]
+
+            request = service.users().list(pageToken=page_token, **query)
+            if page and page.get('etag'):
+                request.headers['If-None-Match'] = page['etag']
+
+            try:
+                results = execute(request)
+                page = {
+                    'token': page_token,
+                    'etag': results.get('etag'),
+                    'users': results.get('users', []),
+                    'next': results.get('nextPageToken'),
+                }
+            except HttpError as e:
+                # 304: this page is unchanged since the snapshot
+                if e.resp.status != 304 or page is None:
+                    raise
+
+            fetched.append(page)
+            if not _put(pages, page['users'], stop):
+                return
+
+            page_token = page['next']
+            if not page_token:
+                break
+
+        if snapshot_path:
+            _save_snapshot(snapshot_path, key, fetched)
+    except Exception as e:
+        _put(pages, e, stop)
+    finally:
+        _put(pages, _DONE, stop)
+
+
+def iter_users(credentials, active_only=False, snapshot_path=DEFAULT_SNAPSHOT_PATH,
+               customer='my_customer', order_by='email', **kwargs):
+    """Yield Directory users page by page, prefetching the next page.
+
+    active_only skips suspended users. Extra kwargs (query, domain, ...) are
+    passed to users().list. Errors from the API are re-raised in the caller.
+    """
+    query = dict(customer=customer, maxResults=500, orderBy=order_by, **kwargs)
+    pages = queue.Queue(maxsize=PREFETCH_PAGES)
+    stop = threading.Event()
+
+    producer = threading.Thread(target=_fetch_pages, args=(credentials, query, snapshot_path, pages, stop),
+                                daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            for user in item:
+                if active_only and user.get('suspended', False):
+                    continue
+                yield user
+    finally:
+        # Lets the producer exit if the caller stops iterating early
+        stop.set()
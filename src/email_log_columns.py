@@ -0,0 +1,371 @@
+"""
+Columnar cache for Admin console Email Log Search CSV exports.
+
+Walking a 1.5M-row export with csv.DictReader re-parses every date, builds a
+dict per row and keeps whatever the analysis appends in memory. Instead, an
+export is converted once into a directory of flat column files next to the
+CSV, and analyzers scan those through mmap:
+
+- Dictionary columns (Event, Owner, IP address, envelope/header addresses,
+  geo, client type, ...) are stored as uint32 codes plus a small value list,
+  so counting or filtering them never touches a string per row.
+- The Date column is also stored as int64 UTC microseconds ('Date.ts'),
+  parsed once at ingest time.
+- Every other column is stored Arrow-style as uint64 offsets into a UTF-8
+  blob, read only for the rows an analysis actually reports.
+
+Re-running an analysis against the same export only maps the files. Ingest
+and scans run in constant memory apart from the dictionaries, which grow
+with distinct values rather than rows. The column files are rebuilt
+automatically when the CSV's size or mtime changes.
+
+Usage:
+    from email_log_columns import open_export
+
+    log = open_export('/home/robert/Downloads/utilities-all.csv')
+    events_by_ip = log.value_counts('IP address')
+    for row in log.rows_where('IP address', ATTACKER_IPS):
+        print(log.value('Date', row), log.value('Event', row))
+"""
+
+import array
+import csv
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+FORMAT_VERSION = 1
+
+DATE_COLUMN = 'Date'
+TIMESTAMP_COLUMN = 'Date.ts'
+NO_TIMESTAMP = -(2 ** 63)
+
+# Low-cardinality columns worth dictionary-encoding
+DICTIONARY_COLUMNS = {
+    'Event',
+    'Owner',
+    'IP address',
+    'From (Header address)',
+    'From (Envelope)',
+    'To (Envelope)',
+    'From (Header name)',
+    'Delegate',
+    'Domain',
+    'Client Type',
+    'Confidential mode',
+    'Link domain',
+    'SPF domain',
+    'DKIM domain',
+    'Traffic source',
+    'Spam classification',
+    'Spam classification reason',
+    'Geo location',
+}
+
+CODE_TYPE = 'I'       # uint32 dictionary codes
+OFFSET_TYPE = 'Q'     # uint64 string offsets
+TIMESTAMP_TYPE = 'q'  # int64 microseconds since the epoch (UTC)
+
+# Rows buffered per column before appending to disk
+FLUSH_ROWS = 65536
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_timestamp(date_str):
+    """Parse an export date (2025-12-25T16:19:36-06:00) to UTC epoch microseconds."""
+    if not date_str:
+        return NO_TIMESTAMP
+    try:
+        dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except ValueError:
+        return NO_TIMESTAMP
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def to_timestamp(dt):
+    """Convert an aware datetime to the epoch microseconds used by 'Date.ts'."""
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def default_store_dir(csv_path):
+    """Column files live next to the export: utilities-all.csv -> utilities-all.csv.columns/"""
+    return csv_path + '.columns'
+
+
+def _column_file(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_').lower()
+
+
+class _ColumnWriter:
+    """Buffers one column and appends it to its file(s) every FLUSH_ROWS rows."""
+
+    def __init__(self, store_dir, name, kind):
+        self.name = name
+        self.kind = kind
+        base = os.path.join(store_dir, _column_file(name))
+        if kind == 'dictionary':
+            self.codes = array.array(CODE_TYPE)
+            self.lookup = {}
+            self.values = []
+            self.files = [open(base + '.codes', 'wb')]
+        elif kind == 'timestamp':
+            self.stamps = array.array(TIMESTAMP_TYPE)
+            self.files = [open(base + '.ts', 'wb')]
+        else:
+            self.offsets = array.array(OFFSET_TYPE, [0])
+            self.position = 0
+            self.data = bytearray()
+            self.files = [open(base + '.offsets', 'wb'), open(base + '.data', 'wb')]
+
+    def append(self, value):
+        if self.kind == 'dictionary':
+            code = self.lookup.get(value)
+            if code is None:
+                code = self.lookup[value] = len(self.values)
+                self.values.append(value)
+            self.codes.append(code)
+        elif self.kind == 'timestamp':
+            self.stamps.append(parse_timestamp(value))
+        else:
+            encoded = value.encode('utf-8')
+            self.data += encoded
+            self.position += len(encoded)
+            self.offsets.append(self.position)
+
+    def flush(self):
+        if self.kind == 'dictionary':
+            self.codes.tofile(self.files[0])
+            del self.codes[:]
+        elif self.kind == 'timestamp':
+            self.stamps.tofile(self.files[0])
+            del self.stamps[:]
+        else:
+            self.offsets.tofile(self.files[0])
+            self.files[1].write(self.data)
+            del self.offsets[:]
+            self.data.clear()
+
+    def close(self):
+        self.flush()
+        for f in self.files:
+            f.close()
+
+
+def ingest_export(csv_path, store_dir=None, progress=True):
+    """Convert an Email Log Search CSV export into column files (one pass)."""
+    store_dir = store_dir or default_store_dir(csv_path)
+    build_dir = store_dir + '.tmp'
+    if os.path.exists(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+
+    stat = os.stat(csv_path)
+    rows = 0
+
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+
+        writers = []
+        for name in header:
+            kind = 'dictionary' if name in DICTIONARY_COLUMNS else 'string'
+            writers.append(_ColumnWriter(build_dir, name, kind))
+        date_index = header.index(DATE_COLUMN) if DATE_COLUMN in header else None
+        if date_index is not None:
+            ts_writer = _ColumnWriter(build_dir, TIMESTAMP_COLUMN, 'timestamp')
+            all_writers = writers + [ts_writer]
+        else:
+            all_writers = writers
+        width = len(header)
+
+        for row in reader:
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            for writer, value in zip(writers, row):
+                writer.append(value)
+            if date_index is not None:
+                ts_writer.append(row[date_index])
+            rows += 1
+
+            if rows % FLUSH_ROWS == 0:
+                for writer in all_writers:
+                    writer.flush()
+            if progress and rows % 200000 == 0:
+                print(f"  Ingested {rows:,} rows...")
+
+        for writer in all_writers:
+            writer.close()
+
+    columns = []
+    for writer in all_writers:
+        columns.append({'name': writer.name, 'kind': writer.kind, 'file': _column_file(writer.name)})
+        if writer.kind == 'dictionary':
+            with open(os.path.join(build_dir, _column_file(writer.name) + '.dict.json'), 'w', encoding='utf-8') as f:
+                json.dump(writer.values, f)
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'source': os.path.abspath(csv_path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'rows': rows,
+        'columns': columns,
+    }
+    with open(os.path.join(build_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.replace(build_dir, store_dir)
+    return store_dir
+
+
+class ColumnarExport:
+    """Read-only, memory-mapped view of an ingested export."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self._columns = {c['name']: c for c in self.meta['columns']}
+        self._maps = []
+        self._views = {}
+        self._dictionaries = {}
+        self._lookups = {}
+        self._readers = {}
+
+    @property
+    def columns(self):
+        return [c['name'] for c in self.meta['columns'] if c['kind'] != 'timestamp']
+
+    def _column(self, name):
+        if name not in self._columns:
+            raise KeyError(f"Column not in export: {name}")
+        return self._columns[name]
+
+    def _view(self, filename, typecode):
+        """Map a column file and view it as an array of typecode (cached)."""
+        key = (filename, typecode)
+        if key not in self._views:
+            path = os.path.join(self.store_dir, filename)
+            if os.path.getsize(path) == 0:
+                view = memoryview(array.array(typecode)) if typecode else b''
+            else:
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                view = memoryview(mapped).cast(typecode) if typecode else mapped
+            self._views[key] = view
+        return self._views[key]
+
+    def codes(self, name):
+        """Per-row dictionary codes of a dictionary column (uint32 memoryview)."""
+        column = self._column(name)
+        if column['kind'] != 'dictionary':
+            raise ValueError(f"{name} is not a dictionary column")
+        return self._view(column['file'] + '.codes', CODE_TYPE)
+
+    def dictionary(self, name):
+        """Distinct values of a dictionary column, indexed by code."""
+        if name not in self._dictionaries:
+            column = self._column(name)
+            with open(os.path.join(self.store_dir, column['file'] + '.dict.json'), 'r', encoding='utf-8') as f:
+                self._dictionaries[name] = json.load(f)
+        return self._dictionaries[name]
+
+    def code(self, name, value):
+        """Dictionary code for value, or None if it never occurs in the column."""
+        if name not in self._lookups:
+            self._lookups[name] = {v: i for i, v in enumerate(self.dictionary(name))}
+        return self._lookups[name].get(value)
+
+    def timestamps(self):
+        """Per-row Date as UTC epoch microseconds (NO_TIMESTAMP if unparseable)."""
+        return self._view(self._column(TIMESTAMP_COLUMN)['file'] + '.ts', TIMESTAMP_TYPE)
+
+    def reader(self, name):
+        """A fast row -> original CSV string function for one column (cached)."""
+        reader = self._readers.get(name)
+        if reader is None:
+            column = self._column(name)
+            if column['kind'] == 'dictionary':
+                dictionary, codes = self.dictionary(name), self.codes(name)
+                reader = lambda row: dictionary[codes[row]]
+            elif column['kind'] == 'timestamp':
+                reader = self.timestamps().__getitem__
+            else:
+                offsets = self._view(column['file'] + '.offsets', OFFSET_TYPE)
+                data = self._view(column['file'] + '.data', None)
+                reader = lambda row: data[offsets[row]:offsets[row + 1]].decode('utf-8')
+            self._readers[name] = reader
+        return reader
+
+    def value(self, name, row):
+        """The original CSV string for one cell."""
+        return self.reader(name)(row)
+
+    def row(self, row, columns=None):
+        """One row as a dict, like csv.DictReader would have produced."""
+        return {name: self.value(name, row) for name in (columns or self.columns)}
+
+    def value_counts(self, name):
+        """{value: rows} for a dictionary column, in first-seen order."""
+        dictionary = self.dictionary(name)
+        return {dictionary[code]: count for code, count in Counter(self.codes(name)).items()}
+
+    def rows_where(self, name, values):
+        """Row numbers whose dictionary column value is in values."""
+        wanted = {self.code(name, v) for v in values} - {None}
+        if not wanted:
+            return []
+        return [i for i, code in enumerate(self.codes(name)) if code in wanted]
+
+    def rows_between(self, start, end):
+        """Row numbers whose Date falls within [start, end] (aware datetimes)."""
+        lo, hi = to_timestamp(start), to_timestamp(end)
+        return [i for i, ts in enumerate(self.timestamps()) if lo <= ts <= hi]
+
+    def close(self):
+        self._readers.clear()
+        for view in self._views.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._views.clear()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps.clear()
+
+
+def is_fresh(csv_path, store_dir):
+    """True if store_dir holds a usable conversion of the current csv_path."""
+    try:
+        with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        stat = os.stat(csv_path)
+    except (OSError, ValueError):
+        return False
+    return (meta.get('format_version') == FORMAT_VERSION
+            and meta.get('byteorder') == sys.byteorder
+            and meta.get('source_size') == stat.st_size
+            and meta.get('source_mtime_ns') == stat.st_mtime_ns)
+
+
+def open_export(csv_path, store_dir=None, rebuild=False):
+    """Open the columnar copy of an export, converting the CSV first if needed."""
+    store_dir = store_dir or default_store_dir(csv_path)
+    if rebuild or not is_fresh(csv_path, store_dir):
+        print(f"Converting {csv_path} to columnar format (one-time)...")
+        ingest_export(csv_path, store_dir)
+    return ColumnarExport(store_dir)
@@ -0,0 +1,206 @@
+"""
+JWZ-style conversation threading over Message-ID / References / In-Reply-To.
+
+The investigation scripts used to follow References chains by hand for a
+single thread and label Message-IDs with hard-coded tenant fragments. A
+ThreadIndex instead builds a Message-ID -> node hash index over any corpus
+(Gmail API headers, .eml files, eml_bulk JSONL) and links every message
+into its conversation tree, following Jamie Zawinski's threading algorithm:
+
+- Each References chain, with any In-Reply-To IDs it lacks appended,
+  links consecutive IDs parent -> child, without overriding links already
+  made and without creating loops; the message itself hangs under its
+  last reference. Every ID in either header is indexed, so a parent that
+  only appears in In-Reply-To is still reported if it is missing.
+- Messages without a Message-ID get a synthetic one (is_synthetic_id())
+  so they can still be threaded; leave those out of any report of IDs.
+- IDs that are referenced but not present in the corpus become empty
+  placeholder nodes, so missing() reports exactly which messages a thread
+  points to that were never collected (deleted, in another mailbox, or
+  forged by an attacker).
+
+Linking a message costs one dict lookup per referenced ID plus a walk up
+its (usually shallow) thread to refuse loops, so 100k-message mailboxes
+thread in a single pass. The subject-based merging step of the original
+algorithm is deliberately left out: forensic threading should only trust
+header evidence.
+
+Usage:
+    from email_threads import ThreadIndex
+
+    index = ThreadIndex()
+    for e in emails:
+        index.add(e['message_id'], e['references'], e['in_reply_to'], data=e)
+
+    for root in index.roots():
+        for depth, node in index.walk(root):
+            print('  ' * depth, node.message_id, node.data['from'] if node.data else '(missing)')
+"""
+
+import re
+
+MESSAGE_ID_RE = re.compile(r'<[^<>\s]+>')
+
+# Stand-in for a missing Message-ID header ('.invalid' can never be real)
+SYNTHETIC_ID_FORMAT = '<no-message-id-{}@email-threads.invalid>'
+
+
+def parse_message_ids(header):
+    """Message-IDs (with angle brackets) in a References / In-Reply-To value, in order."""
+    if not header or header == 'NOT PRESENT':
+        return []
+    return MESSAGE_ID_RE.findall(str(header))
+
+
+def normalize_id(message_id):
+    """Canonical form of a Message-ID for index keys: '<local@domain>'."""
+    message_id = (message_id or '').strip()
+    if not message_id or message_id in ('NOT PRESENT', 'UNKNOWN'):
+        return None
+    if not message_id.startswith('<'):
+        message_id = f"<{message_id.strip('<>')}>"
+    return message_id
+
+
+def is_synthetic_id(message_id):
+    """True for IDs ThreadIndex made up for messages without a Message-ID."""
+    return (message_id or '').endswith('@email-threads.invalid>')
+
+
+def id_domain(message_id):
+    """Right-hand side of a Message-ID, which identifies the generating system."""
+    return (message_id or '').strip('<>').rpartition('@')[2].lower()
+
+
+def id_source(message_id, known_sources=None):
+    """Label for a Message-ID: the first matching known_sources fragment, else its domain.
+
+    known_sources maps ID fragments (e.g. an Exchange Online server name
+    like 'BLAPR19MB4417') to a description of the system that issues them.
+    """
+    for fragment, label in (known_sources or {}).items():
+        if fragment in message_id:
+            return label
+    return id_domain(message_id) or 'unknown'
+
+
+class ThreadNode:
+    """One Message-ID in the index; data is None if the message is not in the corpus."""
+
+    __slots__ = ('message_id', 'data', 'parent', 'children', 'referenced_by')
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+        self.data = None
+        self.parent = None
+        self.children = []
+        self.referenced_by = []
+
+    @property
+    def missing(self):
+        return self.data is None
+
+    def __repr__(self):
+        return f"ThreadNode({self.message_id!r}{', missing' if self.missing else ''})"
+
+
+class ThreadIndex:
+    """Message-ID -> ThreadNode index that links messages into conversation trees."""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def _node(self, message_id):
+        node = self.nodes.get(message_id)
+        if node is None:
+            node = self.nodes[message_id] = ThreadNode(message_id)
+        return node
+
+    @staticmethod
+    def _is_ancestor(node, other):
+        """True if node is other or one of other's ancestors."""
+        while other is not None:
+            if other is node:
+                return True
+            other = other.parent
+        return False
+
+    def _link(self, parent, child):
+        if child.parent is parent or self._is_ancestor(child, parent):
+            return
+        if child.parent is not None:
+            child.parent.children.remove(child)
+        child.parent = parent
+        parent.children.append(child)
+
+    def add(self, message_id, references=None, in_reply_to=None, data=None):
+        """Add one message. Duplicate Message-IDs keep the first message's data."""
+        message_id = normalize_id(message_id)
+        references = parse_message_ids(references)
+        # In-Reply-To names the direct parent, so it goes last if References lacks it
+        references += [ref for ref in parse_message_ids(in_reply_to) if ref not in references]
+        if message_id is None:
+            # Still index what it references so missing() sees those IDs
+            message_id = SYNTHETIC_ID_FORMAT.format(len(self.nodes))
+        node = self._node(message_id)
+        if node.data is not None:
+            return node
+        node.data = data if data is not None else {}
+
+        # Link the References chain without overriding existing links
+        previous = None
+        for ref in references:
+            if ref == message_id:
+                continue
+            ref_node = self._node(ref)
+            ref_node.referenced_by.append(message_id)
+            if previous is not None and ref_node.parent is None:
+                self._link(previous, ref_node)
+            previous = ref_node
+
+        # The message's own parent is always its last reference
+        if previous is not None:
+            self._link(previous, node)
+        return node
+
+    def get(self, message_id):
+        return self.nodes.get(normalize_id(message_id))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def roots(self):
+        """Top of every conversation tree (including missing thread starters)."""
+        return [node for node in self.nodes.values() if node.parent is None]
+
+    def walk(self, root):
+        """(depth, node) for a tree in depth-first order, without recursion."""
+        stack = [(0, root)]
+        while stack:
+            depth, node = stack.pop()
+            yield depth, node
+            stack.extend((depth + 1, child) for child in reversed(node.children))
+
+    def ancestors(self, message_id):
+        """Nodes from the message's parent up to the root of its thread."""
+        node = self.get(message_id)
+        chain = []
+        while node is not None and node.parent is not None:
+            node = node.parent
+            chain.append(node)
+        return chain
+
+    def thread_of(self, message_id):
+        """Root node of the thread containing message_id (None if unknown)."""
+        node = self.get(message_id)
+        while node is not None and node.parent is not None:
+            node = node.parent
+        return node
+
+    def missing(self):
+        """Referenced Message-IDs that are not in the corpus, as ThreadNodes."""
+        return [node for node in self.nodes.values() if node.missing]
+
+    def messages(self):
+        """Nodes for the messages that are in the corpus."""
+        return [node for node in self.nodes.values() if not node.missing]
@@ -0,0 +1,144 @@
+"""
+Header-only fast path for forensic header extraction.
+
+email.message_from_binary_file(..., policy=policy.default) reads and parses
+the whole message, multi-megabyte attachments included, and builds a
+structured header object for every field, just so the scripts can print a
+dozen headers. read_headers() instead:
+
+- reads the file (or mbox slice) only up to the blank line that ends the
+  header block, in small chunks;
+- splits and unfolds the header lines itself, keeping the raw values
+  (compat32-style) and skipping MIME body parsing entirely;
+- decodes RFC 2047 encoded-words only for values that contain one, and only
+  when the value is asked for.
+
+The returned HeaderBlock has the get() / get_all() / items() / keys() /
+[] interface of email.message.Message that parse_eml.py and
+eml_bulk.message_fields() use.
+
+Usage:
+    from eml_headers import read_headers
+
+    headers = read_headers('suspicious.eml')
+    print(headers.get('Reply-To'), len(headers.get_all('Received', [])))
+"""
+
+from email.header import decode_header, make_header
+
+CHUNK_SIZE = 64 * 1024
+
+# Stop reading after this much header data even without a blank line
+MAX_HEADER_BYTES = 4 * 1024 * 1024
+
+
+def _decode(value):
+    """RFC 2047-decode a raw header value if it contains an encoded-word."""
+    if '=?' not in value:
+        return value
+    try:
+        return str(make_header(decode_header(value)))
+    except (UnicodeError, LookupError, ValueError):
+        return value
+
+
+class HeaderBlock:
+    """Raw header fields of one message with lazy RFC 2047 decoding."""
+
+    def __init__(self, fields):
+        self._fields = fields      # [(name, raw value)] in message order
+        self._decoded = {}
+        self._index = {}           # lowercase name -> field indexes
+        for index, (name, _) in enumerate(fields):
+            self._index.setdefault(name.lower(), []).append(index)
+
+    @classmethod
+    def from_bytes(cls, data):
+        text = data.decode('utf-8', 'surrogateescape')
+        fields = []
+        for line in text.split('\n'):
+            line = line.rstrip('\r')
+            if not line:
+                break
+            if line[0] in ' \t':
+                if fields:
+                    name, value = fields[-1]
+                    fields[-1] = (name, value + ' ' + line.strip())
+                continue
+            name, sep, value = line.partition(':')
+            if not sep or ' ' in name.strip():
+                continue  # mbox 'From ' line or garbage
+            fields.append((name.strip(), value.strip()))
+        return cls(fields)
+
+    def _value(self, index):
+        value = self._decoded.get(index)
+        if value is None:
+            value = _decode(self._fields[index][1])
+            self._decoded[index] = value
+        return value
+
+    def raw(self, name, failobj=None):
+        """First value of a header exactly as it appears in the message."""
+        indexes = self._index.get(name.lower())
+        return self._fields[indexes[0]][1] if indexes else failobj
+
+    def get(self, name, failobj=None):
+        indexes = self._index.get(name.lower())
+        return self._value(indexes[0]) if indexes else failobj
+
+    def get_all(self, name, failobj=None):
+        indexes = self._index.get(name.lower())
+        return [self._value(index) for index in indexes] if indexes else failobj
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name.lower() in self._index
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return [name for name, _ in self._fields]
+
+    def items(self):
+        return [(name, self._value(index)) for index, (name, _) in enumerate(self._fields)]
+
+
+def _header_end(data, start=0):
+    """Offset just past the blank line ending the headers (searching from start), or -1."""
+    ends = [pos + len(sep) for sep in (b'\n\n', b'\r\n\r\n') for pos in [data.find(sep, start)] if pos >= 0]
+    return min(ends) if ends else -1
+
+
+def read_header_block(f, limit=MAX_HEADER_BYTES):
+    """Bytes of the header block read from a binary file object's current position."""
+    limit = min(limit, MAX_HEADER_BYTES)
+    data = b''
+    while len(data) < limit:
+        chunk = f.read(min(CHUNK_SIZE, limit - len(data)))
+        if not chunk:
+            break
+        # Re-check from just before the old end in case the separator straddles chunks
+        search_from = max(0, len(data) - 3)
+        data += chunk
+        if data.startswith((b'\n', b'\r\n')):
+            return b''
+        end = _header_end(data, search_from)
+        if end >= 0:
+            return data[:end]
+    return data
+
+
+def read_header_bytes(path, offset=0, length=None):
+    """Bytes of the header block of a message file or an mbox slice."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return read_header_block(f, MAX_HEADER_BYTES if length is None else length)
+
+
+def read_headers(path, offset=0, length=None):
+    """HeaderBlock for a message file, or one message of an mbox."""
+    return HeaderBlock.from_bytes(read_header_bytes(path, offset, length))
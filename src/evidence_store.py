@@ -0,0 +1,234 @@
+"""
+Local SQLite evidence store for Admin console Email Log Search CSV exports.
+
+The archive scripts each re-open lori-send.csv / lori-all.csv and rebuild
+their own Message-ID -> IPs (or IP -> events) dicts on every run. The store
+ingests each export exactly once into an indexed SQLite database and answers
+the recurring questions as indexed queries:
+
+- events by Message ID, IP address, Owner, Event and Date range
+- Message ID -> set of sending IPs
+- first row seen for each Message ID
+
+Rows come back as plain dicts keyed by the original CSV column names, so a
+loop written against csv.DictReader keeps working unchanged. An export is
+re-ingested automatically if the CSV's size or mtime changes.
+
+Usage:
+    from evidence_store import EvidenceStore
+
+    store = EvidenceStore()
+    for row in store.events('/home/robert/Downloads/lori-all.csv', ip='158.51.123.14'):
+        print(row['Date'], row['Event'], row['Subject'])
+"""
+
+import csv
+import os
+import sqlite3
+from datetime import datetime
+
+from email_log_columns import parse_timestamp, to_timestamp
+
+# Default database location: output/evidence.sqlite (relative to src/)
+DEFAULT_DB_PATH = os.getenv('EVIDENCE_DB', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'evidence.sqlite'))
+
+# Query keyword -> CSV column; each gets an (export, column) index
+INDEXED_COLUMNS = {
+    'message_id': 'Message ID',
+    'ip': 'IP address',
+    'owner': 'Owner',
+    'event': 'Event',
+}
+
+INSERT_BATCH_ROWS = 10000
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class EvidenceStore:
+    """Indexed, ingest-once store of Email Log Search CSV exports."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS exports (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                ingested_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                _export INTEGER NOT NULL,
+                _row INTEGER NOT NULL,
+                _ts INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS events_row ON events (_export, _row);
+            CREATE INDEX IF NOT EXISTS events_ts ON events (_export, _ts);
+        ''')
+        self._columns = None
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def _event_columns(self):
+        if self._columns is None:
+            info = self.conn.execute('PRAGMA table_info(events)').fetchall()
+            self._columns = [r['name'] for r in info if not r['name'].startswith('_')]
+        return self._columns
+
+    def _ensure_columns(self, header):
+        existing = set(self._event_columns())
+        for name in header:
+            if name and name not in existing and not name.startswith('_'):
+                self.conn.execute(f'ALTER TABLE events ADD COLUMN {_quote(name)} TEXT')
+                existing.add(name)
+        self._columns = None
+        for key, column in INDEXED_COLUMNS.items():
+            if column in existing:
+                self.conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS events_{key} ON events (_export, {_quote(column)})')
+
+    def _export_id(self, csv_path):
+        row = self.conn.execute('SELECT id FROM exports WHERE path = ?', (os.path.abspath(csv_path),)).fetchone()
+        return row['id'] if row else None
+
+    def is_current(self, csv_path):
+        """True if csv_path is already ingested and unchanged since."""
+        row = self.conn.execute('SELECT size, mtime_ns FROM exports WHERE path = ?',
+                                (os.path.abspath(csv_path),)).fetchone()
+        if row is None:
+            return False
+        stat = os.stat(csv_path)
+        return row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns
+
+    def ingest_csv(self, csv_path, force=False):
+        """Load an export into the store (once); returns its export id."""
+        if not force and self.is_current(csv_path):
+            return self._export_id(csv_path)
+
+        path = os.path.abspath(csv_path)
+        stat = os.stat(csv_path)
+        print(f"Ingesting {csv_path} into evidence store (one-time)...")
+
+        with self.conn:
+            old_id = self._export_id(csv_path)
+            if old_id is not None:
+                self.conn.execute('DELETE FROM events WHERE _export = ?', (old_id,))
+                self.conn.execute('DELETE FROM exports WHERE id = ?', (old_id,))
+
+            cursor = self.conn.execute(
+                'INSERT INTO exports (path, size, mtime_ns, rows, ingested_at) VALUES (?, ?, ?, 0, ?)',
+                (path, stat.st_size, stat.st_mtime_ns, datetime.now().isoformat(timespec='seconds')))
+            export_id = cursor.lastrowid
+
+            with open(csv_path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                self._ensure_columns(header)
+
+                keep = [i for i, name in enumerate(header) if name and not name.startswith('_')]
+                names = [header[i] for i in keep]
+                date_index = header.index('Date') if 'Date' in header else None
+                sql = 'INSERT INTO events (_export, _row, _ts, {}) VALUES (?, ?, ?, {})'.format(
+                    ', '.join(_quote(n) for n in names), ', '.join('?' * len(names)))
+
+                width = len(header)
+                batch = []
+                rows = 0
+                for row in reader:
+                    if len(row) < width:
+                        row = row + [''] * (width - len(row))
+                    ts = parse_timestamp(row[date_index]) if date_index is not None else None
+                    batch.append([export_id, rows, ts] + [row[i] for i in keep])
+                    rows += 1
+                    if len(batch) >= INSERT_BATCH_ROWS:
+                        self.conn.executemany(sql, batch)
+                        batch = []
+                if batch:
+                    self.conn.executemany(sql, batch)
+
+            self.conn.execute('UPDATE exports SET rows = ? WHERE id = ?', (rows, export_id))
+
+        print(f"  Stored {rows:,} rows")
+        return export_id
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def events(self, csv_path, message_id=None, ip=None, owner=None, event=None,
+               start=None, end=None, columns=None):
+        """Rows of an export matching every given filter, in original CSV order.
+
+        message_id/ip/owner/event each take a single value or a collection of
+        values. start/end are aware datetimes bounding the Date column
+        (inclusive). columns limits which CSV columns are returned.
+        """
+        export_id = self.ingest_csv(csv_path)
+        where = ['_export = ?']
+        params = [export_id]
+
+        filters = {'message_id': message_id, 'ip': ip, 'owner': owner, 'event': event}
+        for key, value in filters.items():
+            if value is None:
+                continue
+            column = _quote(INDEXED_COLUMNS[key])
+            if isinstance(value, str):
+                where.append(f'{column} = ?')
+                params.append(value)
+            else:
+                values = list(value)
+                if not values:
+                    return []
+                where.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if start is not None:
+            where.append('_ts >= ?')
+            params.append(to_timestamp(start))
+        if end is not None:
+            where.append('_ts <= ?')
+            params.append(to_timestamp(end))
+
+        available = self._event_columns()
+        selected = [c for c in (columns or available) if c in available]
+        sql = 'SELECT {} FROM events WHERE {} ORDER BY _row'.format(
+            ', '.join(_quote(c) for c in selected), ' AND '.join(where))
+        return [{c: (v if v is not None else '') for c, v in zip(selected, r)}
+                for r in self.conn.execute(sql, params)]
+
+    def ips_by_message_id(self, csv_path):
+        """{Message ID: set of IP addresses} for every non-empty Message ID."""
+        export_id = self.ingest_csv(csv_path)
+        result = {}
+        for r in self.conn.execute(
+                'SELECT "Message ID", "IP address" FROM events '
+                'WHERE _export = ? AND "Message ID" != \'\' ORDER BY _row', (export_id,)):
+            result.setdefault(r[0], set()).add(r[1] or '')
+        return result
+
+    def first_row_by_message_id(self, csv_path, columns=None):
+        """{Message ID: first row seen for it}, keyed in first-seen order."""
+        export_id = self.ingest_csv(csv_path)
+        available = self._event_columns()
+        selected = [c for c in (['Message ID'] + list(columns) if columns else available) if c in available]
+        sql = ('SELECT {} FROM events WHERE _export = ? AND _row IN ('
+               'SELECT MIN(_row) FROM events WHERE _export = ? AND "Message ID" != \'\' '
+               'GROUP BY "Message ID") ORDER BY _row').format(', '.join(_quote(c) for c in selected))
+        result = {}
+        for r in self.conn.execute(sql, (export_id, export_id)):
+            row = {c: (v if v is not None else '') for c, v in zip(selected, r)}
+            result[row['Message ID']] = row
+        return result
+
+    def close(self):
+        self.conn.close()
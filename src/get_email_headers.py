@@ -10,17 +10,23 @@ Usage:
     # Then run:
     python get_email_headers.py
 
+    # Messages are fetched in Gmail HTTP batches of 50; tune or disable with:
+    GMAIL_BATCH_SIZE=100 python get_email_headers.py
+    GMAIL_BATCH_SIZE=0 python get_email_headers.py
+
 Prerequisites:
     pip install google-auth google-api-python-client python-dotenv
 """
 
 import os
-import base64
 from datetime import datetime
 from dotenv import load_dotenv
-import google.auth
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+
+from api_executor import execute
+from email_threads import ThreadIndex, id_source, is_synthetic_id, parse_message_ids
+from gmail_fetch import FORENSIC_HEADER_GROUPS, batch_get_metadata, get_message, get_message_metadata
+from raw_message import RawMessage
+from workspace_auth import build_service, get_delegated_credentials
 
 # Load environment variables from .env file
 load_dotenv()
@@ -38,46 +44,36 @@ TARGET_FROM_DOMAIN = 'ssdhvca.com'  # Note: vca not vac
 TARGET_SUBJECT = os.getenv('TARGET_SUBJECT', 'Re: 125604 Moss Mechanical LLC & 128659 Moss Mechanical LLC- Heritage')
 TARGET_DATE = '2025/12/04'  # Dec 4, 2025
 
+# Messages fetched per Gmail HTTP batch request (0 = fetch one at a time)
+GMAIL_BATCH_SIZE = int(os.getenv('GMAIL_BATCH_SIZE', '50'))
+
+# Message-ID fragments of the mail systems in this case, for labelling
+# referenced messages that are not in the mailbox
+KNOWN_ID_SOURCES = {
+    'CAEDQfw': 'Gmail (likely Lori Maynard)',
+    'BYAPR13MB2743': 'FRAUDULENT (warehouseathletics tenant)',
+    'BLAPR19MB4417': 'Standard Supply (ssdhvac.com)',
+}
+
 
 def get_gmail_service():
     """Create Gmail API service with domain-wide delegation via ADC impersonation."""
-    from google.auth import iam
-    from google.auth.transport import requests as auth_requests
-
-    # Get ADC credentials (already impersonating the service account via gcloud)
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-
-    request = auth_requests.Request()
-
-    # Use IAM Credentials API to sign JWTs for domain-wide delegation
-    signer = iam.Signer(
-        request=request,
-        credentials=source_credentials,
-        service_account_email=SERVICE_ACCOUNT_EMAIL
-    )
-
-    # Create service account credentials with the signer and subject for domain-wide delegation
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=DELEGATED_USER
-    )
+    # Cached signer + delegated credentials for DELEGATED_USER (see workspace_auth.py)
+    delegated_credentials = get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, DELEGATED_USER, SCOPES)
 
     # Build the Gmail API service
-    service = build('gmail', 'v1', credentials=delegated_credentials)
+    service = build_service('gmail', 'v1', credentials=delegated_credentials)
     return service
 
 
 def search_emails_by_query(service, query):
     """Search for emails using a specific query."""
     try:
-        results = service.users().messages().list(
+        results = execute(service.users().messages().list(
             userId='me',
             q=query,
             maxResults=50
-        ).execute()
+        ))
         return results.get('messages', [])
     except Exception as e:
         print(f"[-] Search failed for query '{query}': {e}")
@@ -123,30 +119,23 @@ def get_full_headers(service, message_id):
     """Retrieve full email headers for a specific message."""
 
     # Get the message in 'full' format to access headers
-    message = service.users().messages().get(
-        userId='me',
-        id=message_id,
-        format='full'
-    ).execute()
+    return get_message(service, message_id, format='full')
+
 
-    return message
+def get_metadata_headers_batch(service, message_ids, batch_size=GMAIL_BATCH_SIZE):
+    """Retrieve only the forensic headers of many messages, batched, in the order given."""
+    if batch_size <= 0:
+        return [get_message_metadata(service, message_id) for message_id in message_ids]
+    return batch_get_metadata(service, message_ids, batch_size=batch_size)
 
 
 def get_raw_message(service, message_id):
-    """Retrieve raw email (RFC 2822 format) for complete headers."""
+    """Retrieve raw email (RFC 2822 format) for complete headers, as a RawMessage."""
 
-    message = service.users().messages().get(
-        userId='me',
-        id=message_id,
-        format='raw'
-    ).execute()
+    message = get_message(service, message_id, format='raw', live_labels=True)
 
-    # Decode the raw message
-    raw_data = message.get('raw', '')
-    if raw_data:
-        decoded = base64.urlsafe_b64decode(raw_data).decode('utf-8', errors='replace')
-        return decoded
-    return None
+    # Decoded straight to bytes; parse with .headers() / .parse(), save with .save()
+    return RawMessage(message['raw'], message.get('labelIds'))
 
 
 def extract_headers(message):
@@ -178,14 +167,7 @@ def print_forensic_headers(headers, raw_headers=None):
     print("="*80)
 
     # Critical headers for reply-to investigation
-    critical_headers = [
-        'From',
-        'Reply-To',
-        'Return-Path',
-        'Sender',
-        'X-Original-Sender',
-        'X-Original-From',
-    ]
+    critical_headers = FORENSIC_HEADER_GROUPS['reply']
 
     print("\n[CRITICAL - Reply Destination Headers]")
     print("-"*40)
@@ -200,14 +182,7 @@ def print_forensic_headers(headers, raw_headers=None):
         print(f"{h}: {value}{flag}")
 
     # Message routing headers
-    routing_headers = [
-        'To',
-        'Cc',
-        'Bcc',
-        'Delivered-To',
-        'X-Forwarded-To',
-        'X-Forwarded-For',
-    ]
+    routing_headers = FORENSIC_HEADER_GROUPS['routing']
 
     print("\n[Message Routing]")
     print("-"*40)
@@ -217,13 +192,7 @@ def print_forensic_headers(headers, raw_headers=None):
             print(f"{h}: {value}")
 
     # Message identification
-    id_headers = [
-        'Message-ID',
-        'Message-Id',
-        'In-Reply-To',
-        'References',
-        'Thread-Index',
-    ]
+    id_headers = FORENSIC_HEADER_GROUPS['identification']
 
     print("\n[Message Identification]")
     print("-"*40)
@@ -233,13 +202,7 @@ def print_forensic_headers(headers, raw_headers=None):
             print(f"{h}: {value}")
 
     # Authentication headers (SPF, DKIM, DMARC)
-    auth_headers = [
-        'Authentication-Results',
-        'ARC-Authentication-Results',
-        'Received-SPF',
-        'DKIM-Signature',
-        'X-Google-DKIM-Signature',
-    ]
+    auth_headers = FORENSIC_HEADER_GROUPS['authentication']
 
     print("\n[Authentication Results]")
     print("-"*40)
@@ -253,7 +216,7 @@ def print_forensic_headers(headers, raw_headers=None):
                 print(f"{h}: {value}")
 
     # Date/time headers
-    date_headers = ['Date', 'X-MS-Exchange-Organization-SCL', 'X-MS-Exchange-Organization-AuthSource']
+    date_headers = FORENSIC_HEADER_GROUPS['timestamp']
 
     print("\n[Timestamp & Exchange Headers]")
     print("-"*40)
@@ -490,13 +453,22 @@ def main():
         all_emails = []
         legit_emails = []
         fraud_emails = []
+        failed_ids = []
+
+        # Fetch the forensic headers of all messages up front in batched
+        # requests (results keep search order); bodies are never downloaded
+        full_messages = get_metadata_headers_batch(service, [msg['id'] for msg in messages])
 
         # Process each message
-        for i, msg in enumerate(messages, 1):
+        for i, (msg, full_message) in enumerate(zip(messages, full_messages), 1):
             gmail_id = msg['id']
 
+            if full_message is None:
+                # Already reported by the fetch; listed again in the summary
+                failed_ids.append(gmail_id)
+                continue
+
             # Get full message with headers
-            full_message = get_full_headers(service, gmail_id)
             headers = extract_headers(full_message)
 
             # Get detailed forensic data
@@ -575,12 +547,12 @@ def main():
         print("MESSAGE-ID CHAIN ANALYSIS")
         print("="*80)
 
-        # Collect all Message-IDs
-        all_message_ids = {}
+        # Thread every collected email by Message-ID / References
+        threads = ThreadIndex()
         for e in all_emails:
-            mid = e['message_id']
-            if mid and mid != 'UNKNOWN':
-                all_message_ids[mid] = e
+            threads.add(e['message_id'], e['references'], e['in_reply_to'], data=e)
+        all_message_ids = {node.message_id: node.data for node in threads.messages()
+                           if not is_synthetic_id(node.message_id)}
 
         # Analyze References chains
         print("\nFirst fraudulent email analysis:")
@@ -590,28 +562,30 @@ def main():
             print(f"Message-ID: {first_fraud['message_id']}")
             print(f"In-Reply-To: {first_fraud['in_reply_to']}")
             print(f"\nReferences chain:")
-            refs = first_fraud['references']
-            if refs and refs != 'NOT PRESENT':
-                ref_list = refs.replace('\n', ' ').replace('\t', ' ').split()
-                ref_list = [r.strip() for r in ref_list if r.strip().startswith('<')]
-                for i, ref in enumerate(ref_list):
-                    source = "UNKNOWN"
-                    if ref in all_message_ids:
-                        source = f"Found: {all_message_ids[ref]['from']}"
-                    elif 'CAEDQfw' in ref:
-                        source = "Gmail (likely Lori Maynard)"
-                    elif 'BYAPR13MB2743' in ref:
-                        source = "FRAUDULENT (warehouseathletics tenant)"
-                    elif 'BLAPR19MB4417' in ref:
-                        source = "Standard Supply (ssdhvac.com)"
-                    print(f"  [{i+1}] {ref}")
-                    print(f"      -> {source}")
+            for i, ref in enumerate(parse_message_ids(first_fraud['references'])):
+                node = threads.get(ref)
+                if node is not None and not node.missing:
+                    source = f"Found: {node.data['from']}"
+                else:
+                    source = f"Not in mailbox - {id_source(ref, KNOWN_ID_SOURCES)}"
+                print(f"  [{i+1}] {ref}")
+                print(f"      -> {source}")
+
+        missing = threads.missing()
+        print(f"\nThreads: {len(threads.roots())}, referenced Message-IDs not in mailbox: {len(missing)}")
+        for node in sorted(missing, key=lambda n: n.message_id):
+            print(f"  {node.message_id}")
+            print(f"      -> {id_source(node.message_id, KNOWN_ID_SOURCES)} "
+                  f"(referenced by {len(node.referenced_by)} message(s))")
 
         # Summary statistics
         print("\n" + "="*80)
         print("SUMMARY STATISTICS")
         print("="*80)
         print(f"\nTotal emails analyzed: {len(all_emails)}")
+        print(f"Emails that could not be fetched: {len(failed_ids)}")
+        for gmail_id in failed_ids:
+            print(f"  [!] {gmail_id} - NOT ANALYZED")
         print(f"Legitimate emails (ssdhvac.com): {len(legit_emails)}")
         print(f"Fraudulent emails (ssdhvca.com): {len(fraud_emails)}")
 
@@ -637,7 +611,8 @@ def main():
             'all_emails': all_emails,
             'legit_emails': legit_emails,
             'fraud_emails': fraud_emails,
-            'all_message_ids': all_message_ids
+            'all_message_ids': all_message_ids,
+            'failed_ids': failed_ids
         }
 
     except Exception as e:
@@ -0,0 +1,140 @@
+"""
+Immutable on-disk cache of Gmail users().messages().get responses.
+
+A delivered Gmail message never changes, yet every investigation script
+re-downloads the same messages on each run. This cache keeps every
+messages.get response in a local SQLite file, zlib-compressed, keyed by
+(mailbox, message id, format, metadataHeaders, fields). gmail_fetch checks
+it before any network request, so re-running an investigation only fetches
+messages it has never seen.
+
+- The mailbox is the delegated subject of the service's credentials (or an
+  explicit userId); if it cannot be determined the call is not cached, so
+  two mailboxes' 'me' can never collide.
+- Entries are evicted least-recently-used once the file passes
+  GMAIL_CACHE_MAX_MB (default 1024).
+- Labels (labelIds) are part of the cached response and reflect the first
+  fetch. Anything that reports them asks gmail_fetch for live labels, which
+  re-reads just the labels from the API (format='minimal').
+
+Configuration:
+    GMAIL_CACHE=0                 disable the cache (also off when API_CASSETTE is set)
+    GMAIL_CACHE_PATH=...          default output/gmail_cache.sqlite
+    GMAIL_CACHE_MAX_MB=1024       size limit before LRU eviction
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Off while recording/replaying API cassettes, so every fetch hits the transport
+ENABLED = (os.getenv('GMAIL_CACHE', 'true').lower() not in ('0', 'false', 'no')
+           and not os.getenv('API_CASSETTE'))
+
+DEFAULT_CACHE_PATH = os.getenv('GMAIL_CACHE_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'gmail_cache.sqlite'))
+
+MAX_BYTES = int(os.getenv('GMAIL_CACHE_MAX_MB', '1024')) * 1024 * 1024
+
+# Only rewrite last_used for hits older than this, to keep reads read-only
+TOUCH_INTERVAL = 3600
+
+
+def mailbox_of(service, user_id='me'):
+    """Mailbox a request is for: an explicit userId or the credentials' subject."""
+    if user_id and user_id != 'me':
+        return user_id.lower()
+    credentials = getattr(getattr(service, '_http', None), 'credentials', None)
+    subject = getattr(credentials, '_subject', None)
+    return subject.lower() if subject else None
+
+
+def cache_key(mailbox, message_id, params):
+    """Stable key for a messages.get call (params: format, metadataHeaders, fields, ...)."""
+    params = dict(params)
+    if 'metadataHeaders' in params:
+        params['metadataHeaders'] = sorted(h.lower() for h in params['metadataHeaders'])
+    params.setdefault('format', 'full')
+    text = json.dumps([mailbox, message_id, params], sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class GmailCache:
+    """SQLite-backed, compressed, size-bounded cache of message resources."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=MAX_BYTES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS messages (
+                key TEXT PRIMARY KEY,
+                mailbox TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                format TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS messages_last_used ON messages (last_used)')
+        self._total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM messages').fetchone()[0]
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute('SELECT body, last_used FROM messages WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                self.conn.execute('UPDATE messages SET last_used = ? WHERE key = ?', (now, key))
+                self.conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, mailbox, message_id, fmt, message):
+        body = zlib.compress(json.dumps(message, separators=(',', ':')).encode('utf-8'))
+        with self._lock:
+            old = self.conn.execute('SELECT size FROM messages WHERE key = ?', (key,)).fetchone()
+            self.conn.execute('INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                              (key, mailbox, message_id, fmt, body, len(body), time.time()))
+            self._total += len(body) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache is under 90% of its limit."""
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute('SELECT key, size FROM messages ORDER BY last_used')
+        doomed = []
+        for key, size in rows:
+            if self._total <= target:
+                break
+            doomed.append((key,))
+            self._total -= size
+        self.conn.executemany('DELETE FROM messages WHERE key = ?', doomed)
+
+    def close(self):
+        self.conn.close()
+
+
+_default = None
+
+
+def get_cache():
+    """The shared cache at DEFAULT_CACHE_PATH, or None if GMAIL_CACHE is off."""
+    global _default
+    if _default is None and ENABLED:
+        _default = GmailCache()
+    return _default
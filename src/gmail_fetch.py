@@ -0,0 +1,162 @@
+"""
+Gmail message fetching helpers shared by the investigation scripts.
+
+Fetching messages one at a time costs a full HTTPS round trip per
+users().messages().get call. batch_get_messages() groups those calls into
+Gmail HTTP batch requests and hands the results back in the original order.
+
+Header-only reviews should not pull format='full' either: that returns the
+whole MIME payload. get_message_metadata() / batch_get_metadata() request
+format='metadata' limited to FORENSIC_HEADERS, with a fields= partial
+response mask, so only those headers come back over the wire and through
+the JSON decoder.
+
+Every messages.get made through this module goes through gmail_cache
+first: messages already fetched (same mailbox, id, format and header set)
+are served from disk without any network I/O. Labels are the exception:
+they change when a message is moved, so callers that report them pass
+live_labels=True (or call get_labels()) to read them from the API.
+
+Usage:
+    from gmail_fetch import batch_get_messages, batch_get_metadata
+
+    messages = batch_get_messages(service, [m['id'] for m in results], format='full')
+    headers_only = batch_get_metadata(service, [m['id'] for m in results])
+"""
+
+import time
+
+from api_executor import MAX_RETRIES, backoff_delay, execute, get_limiter, is_retryable, is_throttled
+from gmail_cache import cache_key, get_cache, mailbox_of
+
+# Gmail accepts up to 100 calls per batch, but recommends staying at or below
+# 50 to avoid per-user rate limiting inside a single batch.
+GMAIL_BATCH_LIMIT = 100
+DEFAULT_BATCH_SIZE = 50
+
+# Headers the investigation scripts read, by the section that prints them.
+# print_forensic_headers() lays its report out from these groups, so a
+# header it shows is always one that metadata fetches ask for.
+FORENSIC_HEADER_GROUPS = {
+    'reply': ['From', 'Reply-To', 'Return-Path', 'Sender', 'X-Original-Sender', 'X-Original-From'],
+    'routing': ['To', 'Cc', 'Bcc', 'Delivered-To', 'X-Forwarded-To', 'X-Forwarded-For'],
+    'identification': ['Message-ID', 'Message-Id', 'In-Reply-To', 'References', 'Thread-Index'],
+    'authentication': ['Authentication-Results', 'ARC-Authentication-Results', 'Received-SPF',
+                       'DKIM-Signature', 'X-Google-DKIM-Signature'],
+    'timestamp': ['Date', 'X-MS-Exchange-Organization-SCL', 'X-MS-Exchange-Organization-AuthSource'],
+    'content': ['Subject'],
+    'path': ['Received', 'X-Originating-IP', 'X-Mailer', 'X-OriginatorOrg', 'X-MS-Exchange-CrossTenant-id'],
+}
+
+# Every header above once (Gmail matches metadataHeaders case-insensitively)
+FORENSIC_HEADERS = list({h.lower(): h for group in FORENSIC_HEADER_GROUPS.values() for h in group}.values())
+
+# Partial-response mask for metadata fetches
+METADATA_FIELDS = 'id,threadId,labelIds,internalDate,sizeEstimate,payload/headers'
+
+
+def batch_get_messages(service, message_ids, format='full', user_id='me', batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+    """Fetch messages with batched users().messages().get calls.
+
+    Returns a list aligned with message_ids. Calls that fail inside a batch
+    with a retryable error (429, 5xx, rate limit) are re-batched with
+    backoff. Messages that still could not be fetched are returned as None
+    and the error is printed, so one bad ID does not abort a whole
+    investigation run.
+    """
+    message_ids = list(message_ids)
+    results = [None] * len(message_ids)
+    batch_size = max(1, min(batch_size, GMAIL_BATCH_LIMIT))
+    limiter = get_limiter('gmail')
+
+    # Serve what we can from the local cache; only misses go to the API
+    cache = get_cache()
+    mailbox = mailbox_of(service, user_id) if cache else None
+    keys = {}
+    pending = []
+    for index, message_id in enumerate(message_ids):
+        if mailbox:
+            keys[index] = cache_key(mailbox, message_id, dict(format=format, **kwargs))
+            results[index] = cache.get(keys[index])
+        if results[index] is None:
+            pending.append(index)
+
+    for attempt in range(MAX_RETRIES + 1):
+        if not pending:
+            break
+        retry = []
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is None:
+                results[index] = response
+                if mailbox:
+                    cache.put(keys[index], mailbox, message_ids[index], format, response)
+            elif is_retryable(exception) and attempt < MAX_RETRIES:
+                retry.append(index)
+            else:
+                print(f"[-] Failed to fetch message {message_ids[index]}: {exception}")
+            if exception is not None and is_throttled(exception):
+                limiter.throttled()
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(
+                    service.users().messages().get(userId=user_id, id=message_ids[index], format=format, **kwargs),
+                    request_id=str(index)
+                )
+            execute(batch, api='gmail', cost=len(chunk))
+
+        if not retry:
+            break
+        pending = sorted(retry)
+        delay = backoff_delay(attempt)
+        print(f"  [retry] {len(pending)} message fetches throttled, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    return results
+
+
+def get_labels(service, message_id, user_id='me'):
+    """A message's current labelIds, always from the API (format='minimal', never cached)."""
+    message = execute(service.users().messages().get(userId=user_id, id=message_id, format='minimal',
+                                                     fields='labelIds'),
+                      api='gmail')
+    return message.get('labelIds', [])
+
+
+def get_message(service, message_id, user_id='me', format='full', live_labels=False, **kwargs):
+    """users().messages().get for one message, served from the local cache when possible.
+
+    With live_labels, a cached response gets its labelIds refreshed by
+    get_labels(), for callers that report where the message is now.
+    """
+    cache = get_cache()
+    mailbox = mailbox_of(service, user_id) if cache else None
+    if mailbox:
+        key = cache_key(mailbox, message_id, dict(format=format, **kwargs))
+        message = cache.get(key)
+        if message is not None:
+            if live_labels:
+                message['labelIds'] = get_labels(service, message_id, user_id=user_id)
+            return message
+
+    message = execute(service.users().messages().get(userId=user_id, id=message_id, format=format, **kwargs),
+                      api='gmail')
+    if mailbox:
+        cache.put(key, mailbox, message_id, format, message)
+    return message
+
+
+def get_message_metadata(service, message_id, headers=FORENSIC_HEADERS, user_id='me'):
+    """Fetch one message's forensic headers (format='metadata', partial response)."""
+    return get_message(service, message_id, user_id=user_id, format='metadata',
+                       metadataHeaders=list(headers), fields=METADATA_FIELDS)
+
+
+def batch_get_metadata(service, message_ids, headers=FORENSIC_HEADERS, **kwargs):
+    """batch_get_messages() for format='metadata' limited to the given headers."""
+    return batch_get_messages(service, message_ids, format='metadata',
+                              metadataHeaders=list(headers), fields=METADATA_FIELDS, **kwargs)
@@ -0,0 +1,271 @@
+"""
+Shared CIDR-based IP classification for the investigation scripts.
+
+The scripts used to classify IPs with hand-written startswith() tuples, so
+every '172.' check swept in all of 172/8 (private space, T-Mobile and the
+attacker's 172.120.137.37 alike) and '3.'/'35.'/'52.' treated whole /8s as
+"AWS". This module classifies against explicit CIDR ranges instead:
+
+- Only the offices and mobile carrier allocations are treated as legitimate
+  for interactive logins. Cloud hosting (AWS, Google Cloud) is fine as a
+  mail source, but a person logging in from it is on a server, so for
+  logins it counts as datacenter space (is_datacenter()).
+- No range is guessed from a first octet. Addresses outside the listed
+  provider allocations are 'unknown'; whether one belongs to a hosting AS
+  is ip_enrichment's question.
+- IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) are classified as the IPv4
+  address they carry.
+
+- The ranges are flattened once into disjoint, sorted integer intervals
+  (most specific prefix wins), and a lookup is one bisect over them.
+- Results are cached per address, so per-row calls over an export cost a
+  dict lookup after the first sighting of each IP.
+- classify_many() / classify_codes() classify a whole column at once by
+  classifying each distinct address once; classify_codes() works directly
+  on a dictionary-encoded email_log_columns column.
+
+Usage:
+    from ip_classifier import classify, is_suspicious
+
+    classify('158.51.123.14')   # 'attacker'
+    classify('199.200.88.186')  # 'office'
+    is_suspicious('73.15.2.9')  # True - IPv4 not in any known-good range
+    is_datacenter('54.12.3.4')  # True - AWS is hosting, not a person's device
+"""
+
+import bisect
+import ipaddress
+import socket
+from array import array
+
+# Every category classify() can return, in the order used by classify_codes()
+CATEGORIES = (
+    'none',        # empty / missing
+    'invalid',     # not an IP address
+    'unknown',     # valid, but in no known range
+    'attacker',
+    'datacenter',
+    'office',
+    'aws',
+    'google',
+    'salesforce',
+    'mobile',
+    'private',
+)
+
+# Where the organisation's people legitimately log in from
+LEGIT_CATEGORIES = {'office', 'mobile'}
+
+# Hosting ranges: an interactive login from one of these is a server/VPS
+DATACENTER_CATEGORIES = {'attacker', 'datacenter', 'aws', 'google', 'salesforce'}
+
+# (cidr, category, label). Overlaps are fine: the longest prefix wins.
+DEFAULT_RANGES = [
+    # Known attacker IPs - askmoss.com (Dec 1-15, 2025)
+    ('172.120.137.37/32', 'attacker', 'askmoss login'),
+    ('45.87.125.150/32', 'attacker', 'askmoss login'),
+    ('46.232.34.229/32', 'attacker', 'askmoss login'),
+    ('147.124.205.9/32', 'attacker', 'askmoss operations'),
+    ('158.51.123.14/32', 'attacker', 'askmoss operations (Canadian VPS)'),
+    # Known attacker IPs - mossutilities.com (Dec 2, 2025)
+    ('45.159.127.16/32', 'attacker', 'Singularity Telecom'),
+    ('156.229.254.40/32', 'attacker', 'mossutilities login'),
+    ('45.192.39.3/32', 'attacker', 'IT_HOST_BLSYNC'),
+    ('38.69.8.106/32', 'attacker', 'VIRTUO NETWORKS'),
+    ('142.111.254.241/32', 'attacker', 'ITHOSTLINE'),
+
+    # Datacenter/VPS providers. Only real provider allocations belong here;
+    # for anything else ip_enrichment's ASN hosting flag is the answer
+    ('2600:3c00::/30', 'datacenter', 'Linode IPv6'),
+
+    # Offices
+    ('199.200.88.186/32', 'office', 'askmoss.com office'),
+    ('138.199.114.0/24', 'office', 'mossutilities.com office'),
+
+    # AWS (Abnormal Security and other mail tooling)
+    ('3.0.0.0/8', 'aws', 'AWS'),
+    ('13.56.0.0/14', 'aws', 'AWS'),
+    ('34.192.0.0/10', 'aws', 'AWS'),
+    ('44.192.0.0/10', 'aws', 'AWS'),
+    ('50.16.0.0/15', 'aws', 'AWS'),
+    ('52.0.0.0/10', 'aws', 'AWS'),
+    ('54.0.0.0/8', 'aws', 'AWS'),
+    ('107.20.0.0/14', 'aws', 'AWS'),
+
+    # Google (mail servers and Google Cloud)
+    ('209.85.128.0/17', 'google', 'Google mail'),
+    ('142.250.0.0/15', 'google', 'Google'),
+    ('172.217.0.0/16', 'google', 'Google'),
+    ('172.253.0.0/16', 'google', 'Google'),
+    ('2607:f8b0::/32', 'google', 'Google IPv6'),
+    ('34.0.0.0/9', 'google', 'Google Cloud'),
+    ('34.128.0.0/10', 'google', 'Google Cloud'),
+    ('35.184.0.0/13', 'google', 'Google Cloud'),
+    ('35.192.0.0/12', 'google', 'Google Cloud'),
+    ('35.208.0.0/12', 'google', 'Google Cloud'),
+    ('35.224.0.0/12', 'google', 'Google Cloud'),
+    ('35.240.0.0/13', 'google', 'Google Cloud'),
+
+    # Salesforce Marketing Cloud (ExactTarget) mail
+    ('13.111.0.0/16', 'salesforce', 'Salesforce Marketing Cloud'),
+
+    # Mobile carriers
+    ('2600:380::/25', 'mobile', 'AT&T Mobility IPv6'),
+    ('2600:1000::/28', 'mobile', 'Verizon Wireless IPv6'),
+    ('2607:fb90::/32', 'mobile', 'T-Mobile IPv6'),
+    ('172.32.0.0/11', 'mobile', 'T-Mobile CGNAT'),
+    ('172.56.0.0/13', 'mobile', 'T-Mobile CGNAT'),
+
+    # Non-routable
+    ('10.0.0.0/8', 'private', 'Private network'),
+    ('172.16.0.0/12', 'private', 'Private network'),
+    ('192.168.0.0/16', 'private', 'Private network'),
+    ('100.64.0.0/10', 'private', 'Carrier-grade NAT'),
+    ('127.0.0.0/8', 'private', 'Loopback'),
+]
+
+
+def ip_to_int(ip):
+    """(version, integer) for an address string, or None if it isn't one.
+
+    IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) come back as IPv4.
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except OSError:
+        pass
+    try:
+        address = ipaddress.IPv6Address(ip)
+    except ValueError:
+        return None
+    if address.ipv4_mapped is not None:
+        return 4, int(address.ipv4_mapped)
+    return 6, int(address)
+
+
+def _flatten(intervals):
+    """Disjoint, sorted (start, end, category, label) with the longest prefix winning."""
+    points = sorted({p for start, end, *_ in intervals for p in (start, end + 1)})
+    segments = []
+    for start, next_start in zip(points, points[1:]):
+        covering = [iv for iv in intervals if iv[0] <= start and next_start - 1 <= iv[1]]
+        if not covering:
+            continue
+        _, _, prefixlen, order, category, label = max(covering, key=lambda iv: (iv[2], -iv[3]))
+        end = next_start - 1
+        if segments and segments[-1][1] == start - 1 and segments[-1][2:] == (category, label):
+            segments[-1] = (segments[-1][0], end, category, label)
+        else:
+            segments.append((start, end, category, label))
+    return segments
+
+
+class IPClassifier:
+    """Classifies addresses against CIDR ranges via bisect over integer intervals."""
+
+    def __init__(self, ranges=DEFAULT_RANGES):
+        by_version = {4: [], 6: []}
+        for order, (cidr, category, label) in enumerate(ranges):
+            if category not in CATEGORIES:
+                raise ValueError(f"Unknown IP category {category!r} for {cidr}")
+            network = ipaddress.ip_network(cidr, strict=False)
+            by_version[network.version].append((
+                int(network.network_address), int(network.broadcast_address),
+                network.prefixlen, order, category, label))
+
+        self._tables = {}
+        for version, intervals in by_version.items():
+            segments = _flatten(intervals)
+            self._tables[version] = ([s[0] for s in segments], segments)
+        self._cache = {}
+        self._suspicious = {}
+
+    def lookup(self, ip):
+        """(category, label) for an address string (IPv4-mapped IPv6 as IPv4)."""
+        result = self._cache.get(ip)
+        if result is None:
+            result = self._lookup(ip)
+            self._cache[ip] = result
+        return result
+
+    def _lookup(self, ip):
+        ip = (ip or '').strip()
+        if not ip:
+            return 'none', ''
+        parsed = ip_to_int(ip)
+        if parsed is None:
+            return 'invalid', ''
+        version, value = parsed
+        starts, segments = self._tables[version]
+        index = bisect.bisect_right(starts, value) - 1
+        if index >= 0 and value <= segments[index][1]:
+            return segments[index][2], segments[index][3]
+        return 'unknown', ''
+
+    def classify(self, ip):
+        """Category of an address (one of CATEGORIES)."""
+        return self.lookup(ip)[0]
+
+    def label(self, ip):
+        """Human-readable description of the matching range ('' if none)."""
+        return self.lookup(ip)[1]
+
+    def is_datacenter(self, ip):
+        """True for datacenter/VPS and cloud hosting ranges, known attacker IPs included."""
+        return self.classify(ip) in DATACENTER_CATEGORIES
+
+    def is_suspicious(self, ip):
+        """True for known attacker IPs, datacenter/VPS ranges and unlisted IPv4.
+
+        Cloud ranges are not suspicious here (they are the mail tooling's
+        home); unlisted IPv6 addresses are treated as mobile, as the scripts
+        always have.
+        """
+        result = self._suspicious.get(ip)
+        if result is None:
+            category = self.classify(ip)
+            if category == 'unknown':
+                result = ip_to_int(ip.strip())[0] == 4
+            else:
+                result = category in ('attacker', 'datacenter')
+            self._suspicious[ip] = result
+        return result
+
+    def classify_many(self, ips):
+        """Categories for a whole column of addresses, classifying each distinct one once."""
+        ips = list(ips)
+        table = {ip: self.classify(ip) for ip in set(ips)}
+        return [table[ip] for ip in ips]
+
+    def classify_codes(self, dictionary, codes):
+        """Category indexes (into CATEGORIES) for a dictionary-encoded column.
+
+        dictionary/codes are as returned by ColumnarExport.dictionary() and
+        .codes(); each distinct value is classified once and the per-row
+        result is a single table lookup per code.
+        """
+        per_code = [CATEGORIES.index(self.classify(value)) for value in dictionary]
+        return array('B', map(per_code.__getitem__, codes))
+
+
+_default = None
+
+
+def get_classifier():
+    """The shared classifier built from DEFAULT_RANGES."""
+    global _default
+    if _default is None:
+        _default = IPClassifier()
+    return _default
+
+
+def classify(ip):
+    return get_classifier().classify(ip)
+
+
+def is_datacenter(ip):
+    return get_classifier().is_datacenter(ip)
+
+
+def is_suspicious(ip):
+    return get_classifier().is_suspicious(ip)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Offline IP enrichment: ASN, organization, country and a hosting flag.
+
+Deciding whether an IP is a VPS, a mobile carrier or a cloud service used to
+be a manual lookup per address (investigate_canadian_vps.py,
+investigate_147.py, ...). This module answers it locally from a compact
+binary range table built once from offline ASN/geo data:
+
+- The table is memory-mapped and searched with bisect directly over the
+  mapped integer arrays, so a lookup is O(log n) and reads no file data
+  into Python lists.
+- Hot addresses are served from an LRU cache.
+- annotate_events() / annotate_rows() add the enrichment to Reports API
+  events and Admin Email Log CSV rows.
+
+Input is the iptoasn.com TSV format (ip2asn-v4.tsv / ip2asn-combined.tsv):
+    range_start  range_end  AS_number  country_code  AS_description
+IPv6 ranges are indexed on their top 64 bits (nothing more specific than a
+/48 is globally routed). Hosting is flagged from the AS description
+(HOSTING_KEYWORDS) and an optional file of hosting ASNs, one per line.
+
+Usage:
+    python ip_enrichment.py build ip2asn-combined.tsv [--hosting-asns asns.txt]
+    python ip_enrichment.py lookup 158.51.123.14 147.124.205.9
+
+    from ip_enrichment import describe
+    print(describe('158.51.123.14'))  # AS... ORG (CA) [hosting]
+"""
+
+import argparse
+import functools
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+from ip_classifier import ip_to_int
+
+DEFAULT_DB_PATH = os.getenv('IP_ENRICHMENT_DB', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'output', 'ip_enrichment.bin'))
+
+HOT_CACHE_SIZE = int(os.getenv('IP_ENRICHMENT_CACHE', '65536'))
+
+MAGIC = b'IPENRCH1'
+HEADER = struct.Struct('<8sBxxxIIII')  # magic, little-endian flag, n4, n6, records, org bytes
+
+# AS descriptions that mark hosting / VPS / cloud providers
+HOSTING_KEYWORDS = re.compile(
+    r'HOSTING|HOST\b|VPS|SERVER|DATA ?CENT(ER|RE)|COLOCATION|CLOUD|DEDICATED|'
+    r'AMAZON|GOOGLE|MICROSOFT|DIGITALOCEAN|LINODE|AKAMAI|OVH|HETZNER|VULTR|CHOOPA|'
+    r'LEASEWEB|M247|CONTABO|SCALEWAY|ORACLE|ALIBABA|TENCENT|CLOUDFLARE',
+    re.IGNORECASE)
+
+Enrichment = namedtuple('Enrichment', ['asn', 'org', 'country', 'hosting'])
+
+
+def _pad(f):
+    f.write(b'\0' * (-f.tell() % 8))
+
+
+def build_database(tsv_paths, db_path=DEFAULT_DB_PATH, hosting_asns=()):
+    """Build the binary range table from iptoasn-format TSV files."""
+    hosting_asns = set(hosting_asns)
+    records = {}        # (asn, country, org) -> record id
+    ranges = {4: [], 6: []}
+
+    for tsv_path in tsv_paths:
+        with open(tsv_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) < 5:
+                    continue
+                start, end, asn, country, org = parts[:5]
+                if not asn.isdigit() or asn == '0':
+                    continue  # Not routed
+                start, end = ip_to_int(start), ip_to_int(end)
+                if start is None or end is None or start[0] != end[0]:
+                    continue
+                key = (int(asn), country[:2].upper(), org)
+                if key not in records:
+                    records[key] = len(records)
+                version = start[0]
+                if version == 6:
+                    ranges[6].append((start[1] >> 64, end[1] >> 64, records[key]))
+                else:
+                    ranges[4].append((start[1], end[1], records[key]))
+
+    org_blob = bytearray()
+    org_offsets = array('I', [0])
+    rec_asn = array('I')
+    rec_country = bytearray()
+    rec_hosting = bytearray()
+    for (asn, country, org), _ in sorted(records.items(), key=lambda item: item[1]):
+        org_blob += org.encode('utf-8')
+        org_offsets.append(len(org_blob))
+        rec_asn.append(asn)
+        rec_country += country.encode('ascii', 'replace').ljust(2, b' ')[:2]
+        rec_hosting.append(1 if asn in hosting_asns or HOSTING_KEYWORDS.search(org) else 0)
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = db_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, sys.byteorder == 'little', len(ranges[4]), len(ranges[6]),
+                            len(records), len(org_blob)))
+        _pad(f)
+        for version, typecode in ((4, 'I'), (6, 'Q')):
+            table = sorted(ranges[version])
+            for column, code in ((0, typecode), (1, typecode), (2, 'I')):
+                array(code, (row[column] for row in table)).tofile(f)
+                _pad(f)
+        for section in (rec_asn, org_offsets):
+            section.tofile(f)
+            _pad(f)
+        for section in (rec_country, rec_hosting, org_blob):
+            f.write(section)
+            _pad(f)
+    os.replace(tmp_path, db_path)
+
+    print(f"[+] Wrote {db_path}: {len(ranges[4]):,} IPv4 + {len(ranges[6]):,} IPv6 ranges, "
+          f"{len(records):,} AS records")
+
+
+class IPEnrichmentDB:
+    """Memory-mapped, read-only view of a database written by build_database()."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, cache_size=HOT_CACHE_SIZE):
+        self._file = open(db_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, little, n4, n6, nrec, org_bytes = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{db_path} is not an IP enrichment database")
+        if bool(little) != (sys.byteorder == 'little'):
+            raise ValueError(f"{db_path} was built on a machine with a different byte order")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size + (-HEADER.size % 8)
+
+        def section(count, itemsize, typecode=None):
+            nonlocal offset
+            data = view[offset:offset + count * itemsize]
+            offset += count * itemsize
+            offset += -offset % 8
+            return data.cast(typecode) if typecode else data
+
+        self._v4 = (section(n4, 4, 'I'), section(n4, 4, 'I'), section(n4, 4, 'I'))
+        self._v6 = (section(n6, 8, 'Q'), section(n6, 8, 'Q'), section(n6, 4, 'I'))
+        self._asn = section(nrec, 4, 'I')
+        self._org_offsets = section(nrec + 1, 4, 'I')
+        self._country = section(nrec * 2, 1)
+        self._hosting = section(nrec, 1)
+        self._orgs = section(org_bytes, 1)
+
+        self.lookup = functools.lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _record(self, rec):
+        org = bytes(self._orgs[self._org_offsets[rec]:self._org_offsets[rec + 1]]).decode('utf-8', 'replace')
+        country = bytes(self._country[rec * 2:rec * 2 + 2]).decode('ascii').strip()
+        return Enrichment(self._asn[rec], org, country, bool(self._hosting[rec]))
+
+    def _lookup(self, ip):
+        """Enrichment for an address string, or None if it is not covered."""
+        parsed = ip_to_int((ip or '').strip())
+        if parsed is None:
+            return None
+        version, value = parsed
+        starts, ends, recs = self._v4 if version == 4 else self._v6
+        if version == 6:
+            value >>= 64
+        index = bisect_right(starts, value) - 1
+        if index < 0 or value > ends[index]:
+            return None
+        return self._record(recs[index])
+
+    def close(self):
+        for table in (self._v4, self._v6):
+            for column in table:
+                column.release()
+        for column in (self._asn, self._org_offsets, self._country, self._hosting, self._orgs):
+            column.release()
+        self._mmap.close()
+        self._file.close()
+
+
+_default = None
+
+
+def get_database():
+    """The shared database at DEFAULT_DB_PATH, or None if it has not been built."""
+    global _default
+    if _default is None and os.path.exists(DEFAULT_DB_PATH):
+        _default = IPEnrichmentDB()
+    return _default
+
+
+def lookup(ip):
+    db = get_database()
+    return db.lookup(ip) if db else None
+
+
+def describe(ip):
+    """One-line description like 'AS12345 EXAMPLE-HOST (CA) [hosting]', '' if unknown."""
+    info = lookup(ip)
+    if info is None:
+        return ''
+    text = f"AS{info.asn} {info.org}"
+    if info.country:
+        text += f" ({info.country})"
+    if info.hosting:
+        text += " [hosting]"
+    return text
+
+
+def annotate_events(events):
+    """Add an 'ipEnrichment' dict to each Reports API event with an ipAddress."""
+    for event in events:
+        info = lookup(event.get('ipAddress', ''))
+        if info is not None:
+            event['ipEnrichment'] = info._asdict()
+    return events
+
+
+def describe_row(row):
+    """describe() text for a row annotated by annotate_rows(), '' if unknown."""
+    if not row.get('ASN'):
+        return ''
+    text = f"AS{row['ASN']} {row['AS organization']}"
+    if row.get('Country'):
+        text += f" ({row['Country']})"
+    if row.get('Hosting') == 'yes':
+        text += " [hosting]"
+    return text
+
+
+def annotate_rows(rows, column='IP address'):
+    """Add ASN / AS organization / Country / Hosting columns to CSV row dicts."""
+    for row in rows:
+        info = lookup(row.get(column, ''))
+        row['ASN'] = str(info.asn) if info else ''
+        row['AS organization'] = info.org if info else ''
+        row['Country'] = info.country if info else ''
+        row['Hosting'] = ('yes' if info.hosting else 'no') if info else ''
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the offline IP enrichment database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the database from iptoasn TSV files')
+    build_parser.add_argument('tsv', nargs='+', help='ip2asn-v4.tsv / ip2asn-v6.tsv / ip2asn-combined.tsv')
+    build_parser.add_argument('--hosting-asns', help='File of additional hosting ASNs, one per line')
+    build_parser.add_argument('--output', '-o', default=DEFAULT_DB_PATH, help='Database path')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Look up one or more IPs')
+    lookup_parser.add_argument('ips', nargs='+')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        hosting_asns = set()
+        if args.hosting_asns:
+            with open(args.hosting_asns, 'r') as f:
+                hosting_asns = {int(line.strip().upper().lstrip('AS')) for line in f if line.strip()}
+        build_database(args.tsv, args.output, hosting_asns)
+    else:
+        if get_database() is None:
+            print(f"ERROR: {DEFAULT_DB_PATH} not found - run 'python ip_enrichment.py build' first")
+            sys.exit(1)
+        for ip in args.ips:
+            print(f"{ip:<40} {describe(ip) or 'no data'}")
+
+
+if __name__ == '__main__':
+    main()
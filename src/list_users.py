@@ -8,13 +8,11 @@ Usage:
 
 import os
 from dotenv import load_dotenv
-import google.auth
-from google.auth import iam
-from google.auth.transport import requests as auth_requests
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from directory_users import iter_users
+from workspace_auth import get_delegated_credentials
+
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL', 'moss-service-account@hvac-labs.iam.gserviceaccount.com')
@@ -27,52 +25,19 @@ SCOPES = [
 
 def get_credentials(admin_email: str):
     """Get credentials with domain-wide delegation via ADC impersonation."""
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-    request = auth_requests.Request()
-
-    signer = iam.Signer(
-        request=request,
-        credentials=source_credentials,
-        service_account_email=SERVICE_ACCOUNT_EMAIL
-    )
-
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=admin_email
-    )
-
-    return delegated_credentials
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, admin_email, SCOPES)
 
 
 def list_users():
     """List all users in the domain."""
     credentials = get_credentials(ADMIN_USER)
-    service = build('admin', 'directory_v1', credentials=credentials)
 
     users = []
-    page_token = None
-
-    while True:
-        try:
-            results = service.users().list(
-                customer='my_customer',
-                maxResults=500,
-                pageToken=page_token,
-                orderBy='email'
-            ).execute()
-
-            users.extend(results.get('users', []))
-            page_token = results.get('nextPageToken')
-
-            if not page_token:
-                break
-
-        except HttpError as e:
-            print(f"Error: {e}")
-            break
+    try:
+        for user in iter_users(credentials):
+            users.append(user)
+    except HttpError as e:
+        print(f"Error: {e}")
 
     return users
 
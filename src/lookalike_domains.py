@@ -0,0 +1,175 @@
+"""
+Indexed lookalike-domain matching against a protected set of domains.
+
+Spotting ssdhvca.com next to ssdhvac.com used to mean comparing every pair of
+observed domains with difflib.SequenceMatcher, which is quadratic in the
+number of correspondent domains. Instead, the domains worth protecting (our
+own, vendors, partners) are indexed once and each observed domain is
+matched against the index:
+
+- Domains are reduced to a homoglyph skeleton first (IDNA decoded, Cyrillic
+  and Greek lookalikes, 0/o, 1/l, rn/m, vv/w, ...), so visual spoofs land
+  on the same string as the domain they imitate.
+- The index is a symmetric-delete (SymSpell-style) neighbourhood: every
+  skeleton with up to max_distance characters deleted maps back to its
+  protected domain. A query generates its own deletes and looks them up,
+  so the cost depends on the query's length, not on the protected set.
+- Candidates are confirmed with a Damerau-Levenshtein (optimal string
+  alignment) distance in which substituting a keyboard-adjacent key costs
+  half an edit.
+- Results are cached per domain, so matching every row of a large export
+  costs one dict lookup per row after the first sighting of each domain.
+
+Keep the protected set curated: a domain the victim merely corresponded
+with may be the attacker's lookalike. One that does end up in the set is
+still matched against the domain it imitates.
+
+Usage:
+    from lookalike_domains import LookalikeIndex
+
+    index = LookalikeIndex({'askmoss.com', 'ssdhvac.com'})
+    index.match('ssdhvca.com')   # [Lookalike('ssdhvac.com', 1.0, 'edit')]
+    index.match('askrnoss.com')  # [Lookalike('askmoss.com', 0.0, 'homoglyph')]
+"""
+
+from collections import namedtuple
+
+Lookalike = namedtuple('Lookalike', ['protected', 'distance', 'kind'])
+
+# Unicode and ASCII characters that render like a lowercase ASCII letter
+HOMOGLYPHS = {
+    '0': 'o', '1': 'l', '|': 'l', '!': 'l',
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'с': 'c', 'ԁ': 'd', 'е': 'e', 'һ': 'h', 'і': 'i', 'ј': 'j',
+    'к': 'k', 'ӏ': 'l', 'м': 'm', 'п': 'n', 'о': 'o', 'р': 'p', 'ԛ': 'q', 'ѕ': 's',
+    'т': 't', 'υ': 'u', 'ѵ': 'v', 'ԝ': 'w', 'х': 'x', 'у': 'y', 'ᴢ': 'z',
+    # Greek
+    'α': 'a', 'β': 'b', 'ϲ': 'c', 'ε': 'e', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o',
+    'ρ': 'p', 'τ': 't', 'χ': 'x', 'γ': 'y',
+}
+
+# Letter pairs that read as a single letter
+MULTI_GLYPHS = (('rn', 'm'), ('vv', 'w'), ('cl', 'd'))
+
+KEYBOARD_ROWS = ('1234567890-', 'qwertyuiop', 'asdfghjkl', 'zxcvbnm')
+
+
+def _keyboard_neighbours():
+    positions = {key: (row, col) for row, keys in enumerate(KEYBOARD_ROWS) for col, key in enumerate(keys)}
+    neighbours = {}
+    for key, (row, col) in positions.items():
+        neighbours[key] = {other for other, (r, c) in positions.items()
+                           if other != key and abs(r - row) <= 1 and abs(c - col) <= 1}
+    return neighbours
+
+
+KEYBOARD_NEIGHBOURS = _keyboard_neighbours()
+
+
+def skeleton(domain):
+    """Lowercase, IDNA-decoded domain with homoglyphs folded to ASCII."""
+    domain = (domain or '').strip().lower().rstrip('.')
+    if 'xn--' in domain:
+        try:
+            domain = domain.encode('ascii').decode('idna')
+        except UnicodeError:
+            pass
+    domain = ''.join(HOMOGLYPHS.get(ch, ch) for ch in domain)
+    for glyphs, letter in MULTI_GLYPHS:
+        domain = domain.replace(glyphs, letter)
+    return domain
+
+
+def distance(a, b):
+    """Damerau-Levenshtein (OSA) distance; keyboard-adjacent substitutions cost 0.5."""
+    previous2 = None
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [float(i)] + [0.0] * len(b)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                substitution = 0.0
+            elif b[j - 1] in KEYBOARD_NEIGHBOURS.get(a[i - 1], ()):
+                substitution = 0.5
+            else:
+                substitution = 1.0
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + substitution)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def _deletes(word, max_distance):
+    """word with every combination of up to max_distance characters removed."""
+    variants = {word}
+    level = {word}
+    for _ in range(max_distance):
+        level = {w[:i] + w[i + 1:] for w in level for i in range(len(w))}
+        variants |= level
+    return variants
+
+
+class LookalikeIndex:
+    """Symmetric-delete index of protected domains for lookalike matching."""
+
+    def __init__(self, protected_domains, max_distance=2):
+        self.max_distance = max_distance
+        self.protected = {d.strip().lower() for d in protected_domains if d and d.strip()}
+        self._skeletons = {}
+        self._deletes = {}
+        for domain in self.protected:
+            skel = skeleton(domain)
+            self._skeletons[domain] = skel
+            for variant in _deletes(skel, max_distance):
+                self._deletes.setdefault(variant, set()).add(domain)
+        self._cache = {}
+
+    def _allowed_distance(self, skel):
+        # Short names are a couple of edits away from everything
+        return min(self.max_distance, len(skel.split('.')[0]) // 4)
+
+    def match(self, domain):
+        """Protected domains that `domain` imitates, closest first.
+
+        A protected domain is never matched against itself, but is still
+        matched against the other protected domains.
+        """
+        domain = (domain or '').strip().lower()
+        result = self._cache.get(domain)
+        if result is None:
+            result = self._match(domain)
+            self._cache[domain] = result
+        return result
+
+    def _match(self, domain):
+        if not domain:
+            return []
+        skel = skeleton(domain)
+        allowed = self._allowed_distance(skel)
+
+        candidates = set()
+        for variant in _deletes(skel, allowed):
+            domains = self._deletes.get(variant)
+            if domains:
+                candidates |= domains
+
+        matches = []
+        for protected in candidates - {domain}:
+            target = self._skeletons[protected]
+            if skel == target:
+                matches.append(Lookalike(protected, 0.0, 'homoglyph'))
+                continue
+            dist = distance(skel, target)
+            if dist <= allowed:
+                matches.append(Lookalike(protected, dist, 'edit'))
+        return sorted(matches, key=lambda m: (m.distance, m.protected))
+
+    def match_many(self, domains):
+        """{domain: matches} for every domain with at least one lookalike match."""
+        found = {}
+        for domain in set(domains):
+            matches = self.match(domain)
+            if matches:
+                found[domain] = matches
+        return found
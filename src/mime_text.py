@@ -0,0 +1,199 @@
+"""
+Streaming, size-capped text extraction from MIME messages.
+
+Scripts used to pull a message body with a recursive get_body_text() that
+base64-decoded every text part in full and grew the result with str +=,
+so a newsletter with a 20 MB HTML part, or a 25 MB message, was decoded
+and copied several times just to read its first lines. iter_body_text()
+instead:
+
+- walks the MIME tree iteratively (no recursion), in document order;
+- works on both Gmail API payload dicts (format='full') and parsed
+  email.message objects (format='raw' or .eml files);
+- skips attachments, and skips text/html entirely when the message has a
+  text/plain body;
+- decodes transfer encodings (base64, base64url, quoted-printable) in
+  CHUNK_SIZE slices through an incremental charset decoder, yielding text
+  chunks as it goes;
+- stops after max_bytes decoded bytes (MIME_TEXT_MAX_BYTES, default 1 MB)
+  and says so with a truncation marker; exports that must keep the whole
+  body pass max_bytes=None.
+
+get_body_text() joins the chunks once, for callers that want a string.
+
+Usage:
+    from mime_text import get_body_text, iter_body_text
+
+    body = get_body_text(message['payload'])          # Gmail API 'full'
+    for chunk in iter_body_text(parsed_email):        # email.message
+        out.write(chunk)
+"""
+
+import base64
+import binascii
+import codecs
+import os
+import re
+
+# Decoded bytes of body text kept per message
+MAX_BODY_BYTES = int(os.getenv('MIME_TEXT_MAX_BYTES', str(1024 * 1024)))
+
+# Encoded characters decoded per step
+CHUNK_SIZE = 64 * 1024
+
+CHARSET_RE = re.compile(r'charset="?([^";\s]+)"?', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+# Gmail API payload dicts and email.message objects --------------------
+
+def _children(part):
+    if isinstance(part, dict):
+        return part.get('parts') or []
+    return part.get_payload() if part.is_multipart() else []
+
+
+def _content_type(part):
+    if isinstance(part, dict):
+        return (part.get('mimeType') or 'text/plain').lower()
+    return part.get_content_type()
+
+
+def _is_attachment(part):
+    if isinstance(part, dict):
+        return bool(part.get('filename')) or bool(part.get('body', {}).get('attachmentId'))
+    return part.get_content_disposition() == 'attachment' or bool(part.get_filename())
+
+
+def _header(part, name):
+    if isinstance(part, dict):
+        for header in part.get('headers') or []:
+            if header.get('name', '').lower() == name:
+                return header.get('value', '')
+        return ''
+    return str(part.get(name, ''))
+
+
+def _charset(part):
+    match = CHARSET_RE.search(_header(part, 'content-type'))
+    charset = match.group(1) if match else 'utf-8'
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = 'utf-8'
+    return charset
+
+
+def _base64_chunks(data, altchars=None):
+    """Decode base64 text slice by slice, carrying partial quanta over."""
+    carry = ''
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = carry + WHITESPACE_RE.sub('', data[start:start + CHUNK_SIZE])
+        usable = len(chunk) - len(chunk) % 4
+        carry = chunk[usable:]
+        if usable:
+            yield base64.b64decode(chunk[:usable], altchars=altchars)
+    if carry:
+        # Unpadded tail (Gmail omits base64url padding)
+        yield base64.b64decode(carry + '=' * (-len(carry) % 4), altchars=altchars)
+
+
+def _qp_chunks(data):
+    """Decode quoted-printable text in slices that end on line boundaries."""
+    start = 0
+    while start < len(data):
+        end = start + CHUNK_SIZE
+        if end < len(data):
+            newline = data.rfind('\n', start, end)
+            if newline > start:
+                end = newline + 1
+            else:
+                # Over-long (unwrapped) line: don't cut an =XX escape in two
+                escape = data.rfind('=', end - 2, end)
+                end = escape if escape > start else end
+        yield binascii.a2b_qp(data[start:end].encode('ascii', 'replace'))
+        start = end
+
+
+def _raw_chunks(data):
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = data[start:start + CHUNK_SIZE]
+        try:
+            yield chunk.encode('ascii', 'surrogateescape')
+        except UnicodeEncodeError:
+            # Already-decoded text (e.g. set with set_content)
+            yield chunk.encode('utf-8', 'surrogateescape')
+
+
+def _byte_chunks(part):
+    """The part's content as transfer-decoded byte chunks."""
+    if isinstance(part, dict):
+        data = part.get('body', {}).get('data')
+        return _base64_chunks(data, altchars=b'-_') if data else iter(())
+
+    payload = part.get_payload()
+    if isinstance(payload, bytes):
+        return iter((payload,))
+    encoding = str(part.get('content-transfer-encoding', '')).strip().lower()
+    if encoding == 'base64':
+        return _base64_chunks(payload)
+    if encoding == 'quoted-printable':
+        return _qp_chunks(payload)
+    return _raw_chunks(payload)
+
+
+# Walker -----------------------------------------------------------------
+
+def iter_text_parts(message):
+    """Body text parts (not attachments) of a message, in document order."""
+    stack = [message]
+    while stack:
+        part = stack.pop()
+        children = _children(part)
+        if children:
+            stack.extend(reversed(children))
+        elif _content_type(part) in ('text/plain', 'text/html') and not _is_attachment(part):
+            yield part
+
+
+def iter_body_text(message, max_bytes=MAX_BODY_BYTES, include_html=True, html_marker=''):
+    """Yield the message's body text in chunks, plain text preferred over HTML.
+
+    HTML parts are only used when there is no text/plain part (and
+    include_html is set); html_marker is yielded before each HTML part of a
+    multipart message (a single-part text/html message is yielded as is).
+    At most max_bytes decoded bytes are read, after which a truncation
+    marker is yielded and the walk stops; max_bytes=None reads everything.
+    """
+    parts = list(iter_text_parts(message))
+    has_plain = any(_content_type(part) == 'text/plain' for part in parts)
+    remaining = max_bytes
+
+    for part in parts:
+        if _content_type(part) == 'text/html' and (has_plain or not include_html):
+            continue
+        if _content_type(part) == 'text/html' and html_marker and part is not message:
+            yield html_marker
+
+        decoder = codecs.getincrementaldecoder(_charset(part))(errors='replace')
+        try:
+            for data in _byte_chunks(part):
+                if remaining is not None:
+                    if len(data) > remaining:
+                        yield decoder.decode(data[:remaining], final=True)
+                        yield f"\n[Body truncated at {max_bytes:,} bytes]\n"
+                        return
+                    remaining -= len(data)
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+        except (binascii.Error, ValueError):
+            yield "[Could not decode body part]\n"
+
+
+def get_body_text(message, max_bytes=MAX_BODY_BYTES, include_html=True, html_marker=''):
+    """iter_body_text() joined into one string."""
+    return ''.join(iter_body_text(message, max_bytes, include_html, html_marker))
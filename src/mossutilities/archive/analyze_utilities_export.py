@@ -2,13 +2,22 @@
 """
 Analyze comprehensive utilities-all.csv export for security issues.
 ~1.5M rows of email activity data.
+
+The CSV is converted once into column files (utilities-all.csv.columns/,
+see email_log_columns.py); later runs scan those instead of re-parsing it.
 """
 
-import csv
+import os
+import sys
 from datetime import datetime, timezone
 from collections import defaultdict
 import re
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from email_log_columns import open_export
+from ip_enrichment import annotate_rows, describe, describe_row
+
 CSV_PATH = '/home/robert/Downloads/utilities-all.csv'
 
 # Known attacker IPs from both incidents
@@ -40,17 +49,6 @@ SUSPICIOUS_DOMAINS = {
     'tempmail.com', 'mailinator.com', '10minutemail.com', 'yopmail.com',
 }
 
-def parse_date(date_str):
-    """Parse date string from CSV."""
-    if not date_str:
-        return None
-    try:
-        dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        return dt.astimezone(timezone.utc)
-    except:
-        return None
-
-
 def is_external_domain(email, internal_domains={'mossutilities.com', 'askmoss.com'}):
     """Check if email is external."""
     if not email:
@@ -72,9 +70,6 @@ def main():
     attacker_events = []
     external_sends = []
     suspicious_sends = []
-    events_by_type = defaultdict(int)
-    events_by_user = defaultdict(int)
-    events_by_ip = defaultdict(int)
     attack_window_events = []
 
     # Track unique external recipients
@@ -83,86 +78,82 @@ def main():
     # Track potential data exfiltration (large attachments sent externally)
     large_external_attachments = []
 
-    print("\nReading CSV (this may take a moment for 1.5M rows)...")
-
-    with open(CSV_PATH, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            total_rows += 1
-
-            if total_rows % 200000 == 0:
-                print(f"  Processed {total_rows:,} rows...")
-
-            ip = row.get('IP address', '')
-            event = row.get('Event', '')
-            owner = row.get('Owner', '')
-            date_str = row.get('Date', '')
-            to_env = row.get('To (Envelope)', '')
-            from_header = row.get('From (Header address)', '')
-            subject = row.get('Subject', '')
-            attachment = row.get('Attachment name', '')
-            geo = row.get('Geo location', '')
-            link_domain = row.get('Link domain', '')
-
-            date = parse_date(date_str)
-
-            events_by_type[event] += 1
-            if owner:
-                events_by_user[owner] += 1
-            if ip:
-                events_by_ip[ip] += 1
-
-            # Check for attacker IP activity
-            if ip in ALL_ATTACKER_IPS:
-                attacker_events.append({
-                    'date': date_str,
-                    'event': event,
-                    'owner': owner,
-                    'ip': ip,
-                    'subject': subject[:80] if subject else '',
-                    'to': to_env,
-                    'from': from_header,
-                    'geo': geo,
-                })
-
-            # Check attack window activity
-            if date and ATTACK_START <= date <= ATTACK_END:
-                # Track sends to external addresses
-                if event == 'Send' and is_external_domain(to_env):
-                    external_sends.append({
-                        'date': date_str,
-                        'owner': owner,
-                        'to': to_env,
-                        'subject': subject[:80] if subject else '',
-                        'ip': ip,
-                        'attachment': attachment,
-                    })
-
-                    # Extract domain
-                    match = re.search(r'@([\w.-]+)', to_env.lower())
-                    if match:
-                        external_recipients[owner].add(match.group(1))
-
-                    # Check for suspicious domains
-                    if any(susp in to_env.lower() for susp in SUSPICIOUS_DOMAINS):
-                        suspicious_sends.append({
-                            'date': date_str,
-                            'owner': owner,
-                            'to': to_env,
-                            'subject': subject[:80] if subject else '',
-                            'ip': ip,
-                        })
-
-                    # Large attachments
-                    if attachment and ip in ALL_ATTACKER_IPS:
-                        large_external_attachments.append({
-                            'date': date_str,
-                            'owner': owner,
-                            'to': to_env,
-                            'attachment': attachment,
-                            'ip': ip,
-                        })
+    print("\nLoading export (the CSV is converted to columnar format on first run)...")
+
+    log = open_export(CSV_PATH)
+    total_rows = log.rows
+
+    events_by_type = log.value_counts('Event')
+    events_by_ip = {ip: n for ip, n in log.value_counts('IP address').items() if ip}
+
+    # Check for attacker IP activity
+    for i in log.rows_where('IP address', ALL_ATTACKER_IPS):
+        subject = log.value('Subject', i)
+        attacker_events.append({
+            'date': log.value('Date', i),
+            'event': log.value('Event', i),
+            'owner': log.value('Owner', i),
+            'ip': log.value('IP address', i),
+            'subject': subject[:80] if subject else '',
+            'to': log.value('To (Envelope)', i),
+            'from': log.value('From (Header address)', i),
+            'geo': log.value('Geo location', i),
+        })
+    # ASN / organization / country / hosting from the offline database
+    attacker_events = list(annotate_rows(attacker_events, column='ip'))
+
+    # Check attack window activity: external sends only, decided once per distinct recipient
+    send_code = log.code('Event', 'Send')
+    external_to_codes = {code for code, to_env in enumerate(log.dictionary('To (Envelope)'))
+                         if is_external_domain(to_env)}
+    event_codes = log.codes('Event')
+    to_codes = log.codes('To (Envelope)')
+
+    for i in log.rows_between(ATTACK_START, ATTACK_END):
+        if event_codes[i] != send_code or to_codes[i] not in external_to_codes:
+            continue
+
+        date_str = log.value('Date', i)
+        owner = log.value('Owner', i)
+        to_env = log.value('To (Envelope)', i)
+        subject = log.value('Subject', i)
+        ip = log.value('IP address', i)
+        attachment = log.value('Attachment name', i)
+
+        # Track sends to external addresses
+        external_sends.append({
+            'date': date_str,
+            'owner': owner,
+            'to': to_env,
+            'subject': subject[:80] if subject else '',
+            'ip': ip,
+            'attachment': attachment,
+        })
+
+        # Extract domain
+        match = re.search(r'@([\w.-]+)', to_env.lower())
+        if match:
+            external_recipients[owner].add(match.group(1))
+
+        # Check for suspicious domains
+        if any(susp in to_env.lower() for susp in SUSPICIOUS_DOMAINS):
+            suspicious_sends.append({
+                'date': date_str,
+                'owner': owner,
+                'to': to_env,
+                'subject': subject[:80] if subject else '',
+                'ip': ip,
+            })
+
+        # Large attachments
+        if attachment and ip in ALL_ATTACKER_IPS:
+            large_external_attachments.append({
+                'date': date_str,
+                'owner': owner,
+                'to': to_env,
+                'attachment': attachment,
+                'ip': ip,
+            })
 
     print(f"\nTotal rows processed: {total_rows:,}")
 
@@ -185,6 +176,7 @@ def main():
             print(f"\n  {user}: {len(events)} events")
             for evt in events[:10]:  # Limit per user
                 print(f"    [{evt['date'][:19]}] {evt['event']}")
+                print(f"        IP: {evt['ip']} ({evt['geo']}) {describe_row(evt)}")
                 if evt['subject']:
                     print(f"        Subject: {evt['subject']}")
                 if evt['to']:
@@ -254,7 +246,7 @@ def main():
     print("\nTop 20 IPs by event count:")
     for ip, count in sorted(events_by_ip.items(), key=lambda x: -x[1])[:20]:
         flag = "🚨 ATTACKER" if ip in ALL_ATTACKER_IPS else ""
-        print(f"  {ip}: {count:,} events {flag}")
+        print(f"  {ip}: {count:,} events {flag} {describe(ip)}")
 
     # ================================================================
     # EVENT TYPE SUMMARY
@@ -4,9 +4,15 @@ Analyze Vaughn's email activity export for attacker activity.
 """
 
 import csv
+import os
+import sys
 from datetime import datetime, timezone
 from collections import defaultdict
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_enrichment import annotate_rows, describe_row
+
 CSV_PATH = '/home/robert/Downloads/vaughn-all.csv'
 
 ATTACKER_IPS = {
@@ -42,11 +48,13 @@ def main():
     attack_window_events = []
     sent_emails = []
     event_types = defaultdict(int)
+    ip_networks = {}
 
     with open(CSV_PATH, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
 
-        for row in reader:
+        # ASN / organization / country / hosting columns from the offline database
+        for row in annotate_rows(reader):
             ip = row.get('IP address', '')
             date_str = row.get('Date', '')
             event = row.get('Event', '')
@@ -54,6 +62,8 @@ def main():
             from_addr = row.get('From (Header address)', '')
             to_addr = row.get('To (Envelope)', '')
             geo = row.get('Geo location', '')
+            if ip and ip not in ip_networks:
+                ip_networks[ip] = describe_row(row)
 
             event_types[event] += 1
 
@@ -107,7 +117,7 @@ def main():
         print(f"\nFound {len(attacker_events)} events from attacker IPs:\n")
         for evt in attacker_events:
             print(f"  [{evt['date']}] {evt['event']}")
-            print(f"      IP: {evt['ip']} ({evt['geo']})")
+            print(f"      IP: {evt['ip']} ({evt['geo']}) {ip_networks.get(evt['ip'], '')}")
             if evt['subject']:
                 print(f"      Subject: {evt['subject']}")
             if evt['to']:
@@ -126,7 +136,7 @@ def main():
             print(f"  [{email['date']}]")
             print(f"      To: {email['to']}")
             print(f"      Subject: {email['subject'][:100] if email['subject'] else '(no subject)'}")
-            print(f"      IP: {email['ip']} ({email['geo']})")
+            print(f"      IP: {email['ip']} ({email['geo']}) {ip_networks.get(email['ip'], '')}")
 
             # Flag if from attacker IP
             if email['ip'] in ATTACKER_IPS:
@@ -159,7 +169,7 @@ def main():
     print(f"\nTop IPs in attack window:")
     for ip, count in sorted(window_events_by_ip.items(), key=lambda x: -x[1])[:15]:
         flag = "🚨 ATTACKER" if ip in ATTACKER_IPS else ""
-        print(f"  {ip}: {count} events {flag}")
+        print(f"  {ip}: {count} events {flag} {ip_networks.get(ip, '')}")
 
 
 if __name__ == '__main__':
@@ -5,12 +5,17 @@ Look for what the attacker did: password changes, 2FA changes, email access, etc
 """
 
 import os
+import sys
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import google.auth
 from google.auth.transport import requests as auth_requests
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from reports_activities import iter_activities
+
 load_dotenv('/home/robert/Work/_archive/email-forensics/.env.mossutilities')
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -65,24 +70,16 @@ def get_events(credentials, user_email, application, days=60):
     start_time = end_time - timedelta(days=days)
 
     events = []
-    page_token = None
 
     try:
-        while True:
-            results = service.activities().list(
-                userKey=user_email,
-                applicationName=application,
-                startTime=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                endTime=end_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                maxResults=1000,
-                pageToken=page_token
-            ).execute()
-
-            events.extend(results.get('items', []))
-            page_token = results.get('nextPageToken')
-
-            if not page_token:
-                break
+        for event in iter_activities(
+            service,
+            userKey=user_email,
+            applicationName=application,
+            startTime=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            endTime=end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        ):
+            events.append(event)
     except Exception as e:
         print(f"  Error fetching {application} events: {e}")
 
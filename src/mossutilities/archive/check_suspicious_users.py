@@ -5,12 +5,18 @@ Focus on the IPs that triggered alerts to verify if mobile/VPN.
 """
 
 import os
+import sys
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import google.auth
 from google.auth.transport import requests as auth_requests
 from googleapiclient.discovery import build
 
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ip_classifier import get_classifier
+from ip_enrichment import describe, lookup as enrich_ip
+
 load_dotenv('/home/robert/Work/_archive/email-forensics/.env.mossutilities')
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
@@ -91,21 +97,23 @@ def get_login_events(credentials, user_email, days=30):
 
 def analyze_ip(ip):
     """Categorize IP address."""
-    if ip.startswith('2600:') or ip.startswith('2607:'):
-        return 'Mobile (AT&T/Verizon IPv6)'
-    elif ip.startswith('172.'):
-        # 172.16-31.x.x is private, but 172.32+ is often AT&T
-        second_octet = int(ip.split('.')[1])
-        if second_octet >= 16 and second_octet <= 31:
-            return 'Private network'
-        else:
-            return 'AT&T Mobile (CGNAT)'
-    elif ip.startswith('138.199.114.'):
+    category, label = get_classifier().lookup(ip)
+    if category == 'mobile':
+        return f'Mobile ({label})'
+    elif category == 'private':
+        return label
+    elif category == 'office':
         return 'Office IP'
-    elif ip.startswith('45.') or ip.startswith('46.') or ip.startswith('38.') or ip.startswith('142.') or ip.startswith('156.'):
-        return 'SUSPICIOUS - Datacenter'
-    else:
-        return 'Unknown - needs verification'
+    elif category in ('aws', 'google', 'salesforce'):
+        return f'SUSPICIOUS - Cloud hosting ({label})'
+    elif category == 'attacker':
+        return f'SUSPICIOUS - Known attacker ({label})'
+    elif category == 'datacenter':
+        return f'SUSPICIOUS - Datacenter ({label})'
+    info = enrich_ip(ip)
+    if info is not None and info.hosting:
+        return f'SUSPICIOUS - Datacenter ({describe(ip)})'
+    return 'Unknown - needs verification'
 
 
 def main():
@@ -163,10 +171,11 @@ def main():
     print("⚠️ = Needs further investigation")
     print()
     print("Common legitimate IP patterns:")
-    print("  - 2600:xxxx (AT&T mobile IPv6)")
-    print("  - 2607:xxxx (Verizon mobile IPv6)")
-    print("  - 172.56-172.255.x.x (AT&T CGNAT)")
-    print("  - 138.199.114.x (Office)")
+    print("  - 2600:380::/25 (AT&T Mobility IPv6)")
+    print("  - 2600:1000::/28 (Verizon Wireless IPv6)")
+    print("  - 2607:fb90::/32 (T-Mobile IPv6)")
+    print("  - 172.32.0.0/11, 172.56.0.0/13 (T-Mobile CGNAT)")
+    print("  - 138.199.114.0/24 (Office)")
 
 
 if __name__ == '__main__':
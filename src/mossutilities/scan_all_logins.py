@@ -5,18 +5,29 @@ Look for datacenter IPs, known attacker IPs, and anomalies.
 """
 
 import os
+import sys
 from datetime import datetime, timedelta
 from collections import defaultdict
 from dotenv import load_dotenv
-import google.auth
-from google.auth.transport import requests as auth_requests
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from directory_users import iter_users
+from ip_classifier import LEGIT_CATEGORIES, classify, is_datacenter
+from ip_enrichment import lookup as enrich_ip
+from reports_activities import iter_activities
+from reports_sync import sync_activities
+from workspace_auth import build_service, get_delegated_credentials
 
 load_dotenv()
 
 SERVICE_ACCOUNT_EMAIL = os.getenv('SERVICE_ACCOUNT_EMAIL')
 ADMIN_USER = os.getenv('ADMIN_USER')
 
+# Incremental mode: only fetch login events newer than the previous run's
+REPORTS_INCREMENTAL_SYNC = os.getenv('REPORTS_INCREMENTAL_SYNC', '').lower() in ('1', 'true', 'yes')
+
 # Known Vaughn attacker IPs (Dec 2, 2025)
 KNOWN_ATTACKER_IPS = {
     '45.159.127.16',    # Singularity Telecom
@@ -31,24 +42,6 @@ KNOWN_LEGIT_IPS = {
     '138.199.114.2',    # Office IP
 }
 
-# Datacenter/VPS IP prefixes to flag
-DATACENTER_PREFIXES = (
-    '45.', '46.', '38.', '142.111.', '156.', '172.', '185.', '193.',
-    '31.', '37.', '51.', '62.', '77.', '78.', '79.', '80.', '81.',
-    '82.', '83.', '84.', '85.', '86.', '87.', '88.', '89.', '91.',
-    '92.', '93.', '94.', '95.', '103.', '104.', '107.', '108.',
-    '141.', '144.', '145.', '146.', '147.', '148.', '149.', '150.',
-    '151.', '154.', '155.', '157.', '158.', '159.', '160.', '161.',
-    '162.', '163.', '164.', '165.', '166.', '167.', '168.', '169.',
-    '170.', '171.', '173.', '174.', '175.', '176.', '177.', '178.',
-    '179.', '180.', '181.', '182.', '183.', '184.', '185.', '186.',
-    '187.', '188.', '189.', '190.', '191.', '192.', '193.', '194.',
-    '195.', '196.', '197.', '198.', '199.', '200.', '201.', '202.',
-    '203.', '204.', '205.', '206.', '207.', '208.', '209.', '210.',
-    '211.', '212.', '213.', '214.', '215.', '216.', '217.', '218.',
-    '219.', '220.', '221.', '222.', '223.',
-)
-
 # Skip service accounts and automation
 SKIP_USERS = {
     'abnormal-security@mossutilities.com',
@@ -62,97 +55,53 @@ SKIP_USERS = {
 
 def get_credentials():
     """Get credentials with domain-wide delegation via ADC impersonation."""
-    from google.auth import iam
-    from google.auth.transport import requests as auth_requests
-    from google.oauth2 import service_account
-
     SCOPES = [
         'https://www.googleapis.com/auth/admin.directory.user.readonly',
         'https://www.googleapis.com/auth/admin.reports.audit.readonly',
     ]
 
-    # Get ADC credentials (already impersonating the service account via gcloud)
-    source_credentials, project = google.auth.default(scopes=['https://www.googleapis.com/auth/cloud-platform'])
-
-    request = auth_requests.Request()
-
-    # Use IAM Credentials API to sign JWTs for domain-wide delegation
-    signer = iam.Signer(
-        request=request,
-        credentials=source_credentials,
-        service_account_email=SERVICE_ACCOUNT_EMAIL
-    )
-
-    # Create service account credentials with the signer and subject for domain-wide delegation
-    delegated_credentials = service_account.Credentials(
-        signer=signer,
-        service_account_email=SERVICE_ACCOUNT_EMAIL,
-        token_uri='https://oauth2.googleapis.com/token',
-        scopes=SCOPES,
-        subject=ADMIN_USER
-    )
-
-    return delegated_credentials
-
-
-def get_all_users(credentials):
-    """Get all users from the domain."""
-    from googleapiclient.discovery import build
+    return get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, ADMIN_USER, SCOPES)
 
-    service = build('admin', 'directory_v1', credentials=credentials)
 
-    users = []
-    page_token = None
-
-    while True:
-        results = service.users().list(
-            customer='my_customer',
-            maxResults=500,
-            orderBy='email',
-            pageToken=page_token
-        ).execute()
-
-        users.extend(results.get('users', []))
-        page_token = results.get('nextPageToken')
-
-        if not page_token:
-            break
-
-    return users
-
-
-def get_login_events(credentials, user_email, days=30):
+def get_login_events(credentials, user_email, days=30, sync=REPORTS_INCREMENTAL_SYNC):
     """Get login events for a specific user."""
-    service = build('admin', 'reports_v1', credentials=credentials)
+    service = build_service('admin', 'reports_v1', credentials=credentials)
 
     end_time = datetime.utcnow()
     start_time = end_time - timedelta(days=days)
 
     events = []
-    page_token = None
 
     try:
-        while True:
-            results = service.activities().list(
-                userKey=user_email,
-                applicationName='login',
-                startTime=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                endTime=end_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                maxResults=1000,
-                pageToken=page_token
-            ).execute()
-
-            events.extend(results.get('items', []))
-            page_token = results.get('nextPageToken')
-
-            if not page_token:
-                break
+        if sync:
+            return sync_activities(service, user_email, 'login',
+                                   start_time.strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+        # Appended one by one so a failure part-way keeps what was fetched
+        for event in iter_activities(
+            service,
+            userKey=user_email,
+            applicationName='login',
+            startTime=start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            endTime=end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
+        ):
+            events.append(event)
     except Exception as e:
-        pass  # Some users may not have login events
+        # Some users may not have login events; anything else survived retries
+        if not (isinstance(e, HttpError) and e.resp.status in (400, 404)):
+            print(f"  [!] Login events for {user_email} incomplete: {e}")
 
     return events
 
 
+def is_hosting_ip(ip):
+    """Datacenter/cloud by known provider range, or an AS ip_enrichment flags as hosting."""
+    if is_datacenter(ip):
+        return True
+    info = enrich_ip(ip)
+    return bool(info and info.hosting)
+
+
 def analyze_login(event):
     """Analyze a login event and return details."""
     ip = event.get('ipAddress', 'Unknown')
@@ -171,7 +120,7 @@ def analyze_login(event):
         'ip': ip,
         'params': params,
         'is_known_attacker': ip in KNOWN_ATTACKER_IPS,
-        'is_known_legit': ip in KNOWN_LEGIT_IPS or ip.startswith('2600:'),  # IPv6 mobile
+        'is_known_legit': ip in KNOWN_LEGIT_IPS or classify(ip) in LEGIT_CATEGORIES,
     }
 
 
@@ -184,9 +133,8 @@ def main():
     print()
 
     credentials = get_credentials()
-    users = get_all_users(credentials)
 
-    print(f"Found {len(users)} users to scan")
+    print("Scanning users as the directory is enumerated...")
     print()
 
     # Track findings
@@ -194,7 +142,9 @@ def main():
     suspicious_users = []
     all_attacker_ips = defaultdict(set)  # IP -> set of users
 
-    for i, user in enumerate(users):
+    users = []
+    for i, user in enumerate(iter_users(credentials)):
+        users.append(user)
         email = user.get('primaryEmail', '')
         name = user.get('name', {}).get('fullName', '')
 
@@ -208,7 +158,7 @@ def main():
 
         # Progress indicator
         if i % 20 == 0:
-            print(f"Scanning user {i+1}/{len(users)}...")
+            print(f"Scanning user {i+1}...")
 
         events = get_login_events(credentials, email)
 
@@ -238,11 +188,9 @@ def main():
 
             # Check for successful logins from non-legit IPs
             elif 'success' in analysis['event']:
-                if not analysis['is_known_legit'] and not analysis['ip'].startswith('2600:'):
-                    # Check if it's a datacenter IP
-                    ip = analysis['ip']
-                    if any(ip.startswith(prefix) for prefix in ['45.', '46.', '38.', '142.', '156.', '172.', '158.', '147.']):
-                        user_findings['suspicious_logins'].append(analysis)
+                # Datacenter/VPS or cloud hosting, not a person's device
+                if not analysis['is_known_legit'] and is_hosting_ip(analysis['ip']):
+                    user_findings['suspicious_logins'].append(analysis)
 
         # Categorize user
         if user_findings['attacker_logins']:
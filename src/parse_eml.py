@@ -6,16 +6,28 @@ No API keys, no OAuth, no bullshit.
 Usage:
     python parse_eml.py email.eml
     python parse_eml.py  (scans current directory for .eml files)
+    python parse_eml.py --headers-only big_attachment.eml  (skip body parsing)
+
+    # Bulk mode: mbox files, Maildir trees and .eml directories -> one JSONL
+    python parse_eml.py --bulk takeout.mbox Maildir/ -o messages.jsonl [--workers 8] [--full-parse]
 """
 
-import sys
+import argparse
 import email
 from email import policy
 from pathlib import Path
 
+from eml_bulk import bulk_extract
+from eml_headers import read_headers
+
+
+def parse_eml(file_path, headers_only=False):
+    """Parse an .eml file and extract headers.
 
-def parse_eml(file_path):
-    """Parse an .eml file and extract headers."""
+    headers_only reads just the header block and skips MIME parsing.
+    """
+    if headers_only:
+        return read_headers(file_path)
     with open(file_path, 'rb') as f:
         msg = email.message_from_binary_file(f, policy=policy.default)
     return msg
@@ -149,8 +161,26 @@ def print_forensic_analysis(msg, file_path):
 
 
 def main():
-    if len(sys.argv) > 1:
-        eml_files = [Path(sys.argv[1])]
+    parser = argparse.ArgumentParser(description='Parse .eml files and extract forensic headers')
+    parser.add_argument('paths', nargs='*', help='.eml files (bulk mode: mbox files, Maildirs, directories)')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Extract per-message fields from every message into one JSONL file')
+    parser.add_argument('--output', '-o', default='messages.jsonl', help='Bulk mode output file')
+    parser.add_argument('--workers', type=int, help='Bulk mode worker processes (default: CPU count)')
+    parser.add_argument('--headers-only', action='store_true',
+                        help='Read only the header block of each .eml (fast, skips attachments)')
+    parser.add_argument('--full-parse', action='store_true',
+                        help='Bulk mode: parse whole messages, adding part count, attachments and HTML flag')
+    args = parser.parse_args()
+
+    if args.bulk:
+        if not args.paths:
+            parser.error('--bulk needs at least one mbox, Maildir or directory')
+        bulk_extract(args.paths, args.output, workers=args.workers, full_parse=args.full_parse)
+        return
+
+    if args.paths:
+        eml_files = [Path(p) for p in args.paths]
     else:
         # Find all .eml files in current directory
         eml_files = list(Path('.').glob('*.eml'))
@@ -165,7 +195,7 @@ def main():
             continue
 
         try:
-            msg = parse_eml(eml_file)
+            msg = parse_eml(eml_file, headers_only=args.headers_only)
             print_forensic_analysis(msg, eml_file)
         except Exception as e:
             print(f"[-] Error parsing {eml_file}: {e}")
@@ -0,0 +1,127 @@
+"""
+Bytes-only handling of Gmail format='raw' messages.
+
+The raw export paths used to run base64.urlsafe_b64decode() on the whole
+'raw' field, decode the result to str, and encode it again to parse it,
+so every message existed three or four times over in memory at the peak.
+That hurt most on exactly the mailboxes that matter: attachment-heavy
+ones. A RawMessage instead:
+
+- decodes 'raw' in CHUNK_SIZE slices directly to bytes (the caller keeps
+  or drops its own response; nothing is taken out of it);
+- keeps the bytes in memory, or spills them to an anonymous temporary file
+  when the message is larger than RAW_MESSAGE_SPILL_MB (default 16);
+- parses from a binary stream (BytesParser reads it incrementally), or
+  reads only the header block through eml_headers;
+- writes the original bytes to evidence files unchanged, with no text
+  round-trip.
+
+Usage:
+    from gmail_fetch import get_message
+    from raw_message import RawMessage
+
+    message = get_message(service, msg_id, format='raw')
+    with RawMessage(message['raw'], message.get('labelIds')) as raw:
+        del message  # the base64 text is not needed any more
+        headers = raw.headers()
+        raw.save('output/eml/' + msg_id + '.eml')
+        parsed = raw.parse()
+"""
+
+import base64
+import io
+import os
+import shutil
+import tempfile
+from email import policy
+from email.parser import BytesParser
+
+from eml_headers import HeaderBlock, read_header_block
+
+# Messages that decode to more than this are kept in a temporary file
+SPILL_BYTES = int(float(os.getenv('RAW_MESSAGE_SPILL_MB', '16')) * 1024 * 1024)
+
+# Base64 characters decoded per step (a multiple of 4)
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_decoded(raw):
+    """Decode base64url text (padded or not) in chunks of bytes."""
+    for start in range(0, len(raw), CHUNK_SIZE):
+        chunk = raw[start:start + CHUNK_SIZE]
+        if len(chunk) % 4:
+            chunk += '=' * (-len(chunk) % 4)
+        yield base64.b64decode(chunk, altchars=b'-_')
+
+
+class RawMessage:
+    """Decoded bytes of one format='raw' message, in memory or in a temporary file.
+
+    raw is the response's base64url 'raw' string; labels its labelIds.
+    """
+
+    def __init__(self, raw, labels=None, spill_bytes=SPILL_BYTES):
+        raw = raw or ''
+        self.labels = list(labels or [])
+        self.size = 0
+        self._data = None
+        self._file = None
+
+        if len(raw) * 3 // 4 > spill_bytes:
+            self._file = tempfile.TemporaryFile(prefix='raw_message_')
+            for chunk in iter_decoded(raw):
+                self._file.write(chunk)
+                self.size += len(chunk)
+        else:
+            self._data = b''.join(iter_decoded(raw))
+            self.size = len(self._data)
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def open(self):
+        """Binary file object over the message bytes, positioned at the start."""
+        if self._file is None:
+            # BytesIO shares the bytes object instead of copying it
+            return io.BytesIO(self._data)
+        self._file.seek(0)
+        return self._file
+
+    def read_bytes(self):
+        """The whole message as bytes (reads a spilled message back into memory)."""
+        return self._data if self._file is None else self.open().read()
+
+    def headers(self):
+        """HeaderBlock of the message, reading only the header block."""
+        return HeaderBlock.from_bytes(read_header_block(self.open()))
+
+    def parse(self, headersonly=False):
+        """email.message.EmailMessage parsed incrementally from the bytes."""
+        return BytesParser(policy=policy.default).parse(self.open(), headersonly=headersonly)
+
+    def write_to(self, f):
+        """Copy the original bytes to a binary file object."""
+        if self._file is None:
+            f.write(self._data)
+        else:
+            shutil.copyfileobj(self.open(), f)
+
+    def save(self, path):
+        """Write the original bytes to an evidence file (e.g. an .eml)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            self.write_to(f)
+        return path
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
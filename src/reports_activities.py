@@ -0,0 +1,285 @@
+"""
+Streaming Reports API activities.list iterator.
+
+Scripts paged through activities().list in three different ways, and
+several only read the first page, silently dropping every event past
+maxResults. iter_activities() always pages to the end, yields events one
+at a time as each page arrives, and keeps a background thread fetching the
+next page while the caller works on the current one. Only a couple of
+pages are held at once, so memory does not grow with the size of the
+window being audited.
+
+A long window is still one serial chain of pages, because each page token
+depends on the previous page. When startTime is given, the window is
+fetched as time shards instead:
+
+- The newest page of the window is fetched first. Its time span gives the
+  event density, and so an estimate of how many pages the rest of the
+  window holds.
+- If that is more than one page, the rest is split into equal sub-windows,
+  one per idle worker (up to `shards`), which are fetched concurrently.
+  Every shard re-estimates after each page and hands part of its
+  remainder to workers that have gone idle, so dense stretches end up in
+  narrower shards, and sparse windows never split or cost extra requests.
+- Shards are yielded back newest first, as a single activities.list would
+  be. Adjacent shards share a boundary instant, so events at a boundary
+  time are de-duplicated.
+- Shards stream too: each hands its pages over through a bounded queue
+  and waits when it is SHARD_PREFETCH_PAGES (REPORTS_SHARD_PREFETCH_PAGES,
+  default 8) ahead of the consumer. At most about
+  (shards + 1) * (SHARD_PREFETCH_PAGES + 1) pages are held at once, for
+  any window length; a deeper read-ahead buys more overlap between shards.
+
+Wall-clock time for long windows then drops with the shard count, as far
+as the read-ahead allows, instead of growing with the page count
+(REPORTS_SHARDS, default 4; 1 disables sharding).
+Requests still go through api_executor, so more shards than
+API_CONCURRENCY_REPORTS (default 4) only queue behind each other.
+
+Usage:
+    from reports_activities import iter_activities
+
+    for event in iter_activities(service, userKey='all', applicationName='admin',
+                                 startTime=start, endTime=end):
+        check(event)
+"""
+
+import math
+import os
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+
+from api_cassette import get_cassette
+from api_executor import execute
+from workspace_auth import build_service
+
+# Pages fetched ahead of the consumer
+PREFETCH_PAGES = 2
+
+# Concurrent time shards per long window
+DEFAULT_SHARDS = int(os.getenv('REPORTS_SHARDS', '4'))
+
+# Pages each time shard may fetch ahead of the consumer
+SHARD_PREFETCH_PAGES = int(os.getenv('REPORTS_SHARD_PREFETCH_PAGES', '8'))
+
+# Reports API timestamps have millisecond resolution
+_TICK = timedelta(milliseconds=1)
+
+_DONE = object()
+
+
+def _put(pages, item, stop):
+    """Queue an item for the consumer; False if the consumer has gone away."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _own_client(service):
+    """A reports client for the producer thread (httplib2 clients are not thread-safe)."""
+    http = getattr(service, '_http', None)
+    credentials = getattr(http, 'credentials', None)
+    if credentials is None:
+        # Unknown transport: page with the caller's client
+        return service
+    return build_service('admin', 'reports_v1', credentials=credentials)
+
+
+def _fetch_pages(service, query, pages, stop):
+    """Producer thread: page through activities().list and queue each page's items."""
+    try:
+        service = _own_client(service)
+        request = service.activities().list(**query)
+        while request is not None:
+            response = execute(request)
+            if not _put(pages, response.get('items', []), stop):
+                return
+            request = service.activities().list_next(request, response)
+    except Exception as e:
+        _put(pages, e, stop)
+    finally:
+        _put(pages, _DONE, stop)
+
+
+def _parse_time(ts_str):
+    return datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
+
+
+def _format_time(dt):
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class _Shard:
+    """One time window [start, end], handed to the consumer page by page."""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.pages = queue.Queue(maxsize=SHARD_PREFETCH_PAGES)
+        self.children = []
+
+
+class _ShardedFetch:
+    """Fetches a window as adaptively split, concurrently fetched time shards.
+
+    Each shard runs on its own thread and passes its pages to the consumer
+    through a bounded queue, so a shard that gets ahead of the consumer
+    waits rather than buffering its page chain. At most `shards` shards
+    fetch at once, except that the shard being consumed (the head) may
+    always run, so shards waiting on full queues cannot starve it.
+    """
+
+    def __init__(self, service, query, shards):
+        query = dict(query)
+        self.start = _parse_time(query.pop('startTime'))
+        end = query.pop('endTime', None)
+        self.end = _parse_time(end) if end else datetime.now(timezone.utc)
+        self.service = service
+        self.query = query
+        self.page_size = query['maxResults']
+        self.shards = shards
+        self.clients = []
+        self.stop = threading.Event()
+        self.cond = threading.Condition()
+        self.active = 0     # shards started and not finished
+        self.running = 0    # shards holding a fetch slot
+        self.head = None
+
+    def submit(self, start, end):
+        shard = _Shard(start, end)
+        with self.cond:
+            self.active += 1
+        threading.Thread(target=self.run, args=(shard,), daemon=True).start()
+        return shard
+
+    def idle_workers(self):
+        with self.cond:
+            return self.shards - self.active
+
+    def run(self, shard):
+        with self.cond:
+            while self.running >= self.shards and shard is not self.head and not self.stop.is_set():
+                self.cond.wait()
+            self.running += 1
+        client = None
+        try:
+            # Clients are reused across shards but never shared between threads
+            try:
+                client = self.clients.pop()
+            except IndexError:
+                client = _own_client(self.service)
+            self.fetch(client, shard)
+        except Exception as e:
+            _put(shard.pages, e, self.stop)
+        finally:
+            if client is not None:
+                self.clients.append(client)
+            _put(shard.pages, _DONE, self.stop)
+            with self.cond:
+                self.running -= 1
+                self.active -= 1
+                self.cond.notify_all()
+
+    def fetch(self, service, shard):
+        """Page through one shard until the rest of it is worth splitting."""
+        request = service.activities().list(startTime=_format_time(shard.start),
+                                            endTime=_format_time(shard.end), **self.query)
+        while request is not None and not self.stop.is_set():
+            response = execute(request)
+            items = response.get('items', [])
+            if not response.get('nextPageToken') or not items:
+                _put(shard.pages, items, self.stop)
+                return
+
+            # The page covered [oldest, end]; estimate the pages left before it
+            oldest = _parse_time(items[-1]['id']['time'])
+            covered = max(shard.end - oldest, _TICK)
+            remaining = oldest - shard.start
+            pages_left = len(items) * (remaining / covered) / self.page_size
+            parts = min(self.idle_workers() + 1, math.ceil(pages_left))
+            if parts >= 2 and remaining >= _TICK * parts:
+                # The oldest instant may continue past this page, so the
+                # remainder overlaps it; duplicates are dropped on merge
+                step = remaining / parts
+                bounds = [oldest - step * i for i in range(parts)] + [shard.start]
+                shard.children = [self.submit(bounds[i + 1], bounds[i]) for i in range(parts)]
+                _put(shard.pages, items, self.stop)
+                return
+            if not _put(shard.pages, items, self.stop):
+                return
+            request = service.activities().list_next(request, response)
+
+    def __iter__(self):
+        # Output is newest first, so copies of a boundary event are adjacent:
+        # only keys at the current timestamp need remembering
+        run_time, run_keys = None, set()
+        stack = [self.submit(self.start, self.end)]
+        try:
+            while stack:
+                shard = stack.pop()
+                with self.cond:
+                    self.head = shard
+                    self.cond.notify_all()
+                while True:
+                    item = shard.pages.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    for event in item:
+                        event_id = event.get('id', {})
+                        key = (event_id.get('time'), event_id.get('uniqueQualifier'))
+                        if key[0] != run_time:
+                            run_time, run_keys = key[0], set()
+                        elif key in run_keys:
+                            continue
+                        run_keys.add(key)
+                        yield event
+                # Children are newest first; the stack pops the newest next
+                stack.extend(reversed(shard.children))
+        finally:
+            self.stop.set()
+            with self.cond:
+                self.cond.notify_all()
+
+
+def iter_activities(service, shards=DEFAULT_SHARDS, **kwargs):
+    """Yield every activity matching activities().list(**kwargs), newest first.
+
+    Pages are fetched to completion with maxResults=1000 unless given.
+    With startTime and shards > 1, the window is fetched as concurrent time
+    shards (see module docstring); never while an API cassette is recording
+    or replaying. Errors from the API are re-raised in the
+    caller.
+    """
+    query = dict(maxResults=1000)
+    query.update(kwargs)
+    if get_cassette() is not None:
+        # Shard boundaries depend on timing, so they would not replay
+        shards = 1
+    if shards > 1 and query.get('startTime') and not query.get('pageToken'):
+        yield from _ShardedFetch(service, query, shards)
+        return
+
+    pages = queue.Queue(maxsize=PREFETCH_PAGES)
+    stop = threading.Event()
+
+    producer = threading.Thread(target=_fetch_pages, args=(service, query, pages, stop), daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+    finally:
+        # Lets the producer exit if the caller stops iterating early
+        stop.set()
@@ -0,0 +1,161 @@
+"""
+Cheap Reports API probes for when (not what) an actor was active.
+
+Questions like "when did 158.51.123.14 first touch this tenant?" used to
+be answered by downloading every event in a large window and scanning it.
+The Reports API returns events newest first and filters server-side on
+actorIpAddress / eventName / filters, so a maxResults=1 query answers
+"what is the newest matching event in [start, end]?" in one small call.
+ActivityProbe builds on that:
+
+- last():      the newest matching event, in one call.
+- first():     the oldest matching event, by bisecting the time axis. Each
+               probe that hits moves the upper bound to the event it
+               returned, so this takes O(log window) calls.
+- intervals(): the stretches of the window with activity, at a given
+               resolution. It sweeps backwards from the newest event,
+               jumping straight to the next older event each call, so it
+               costs one call per active bucket plus one per gap and never
+               touches quiet time.
+
+Usage:
+    from reports_probe import ActivityProbe
+
+    probe = ActivityProbe(service, userKey='all', applicationName='login',
+                          actorIpAddress='158.51.123.14')
+    first = probe.first(start, end)
+    for interval in probe.intervals(start, end, resolution=timedelta(hours=1)):
+        print(interval)
+    print(f"{probe.calls} API calls")
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from api_executor import execute
+
+# Reports API timestamps have millisecond resolution
+TICK = timedelta(milliseconds=1)
+
+# Reports API data is kept for about six months
+RETENTION = timedelta(days=180)
+
+
+def parse_time(ts_str):
+    return datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
+
+
+def format_time(dt):
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def floor_time(dt):
+    """dt truncated to the millisecond, as the API reads startTime / endTime."""
+    return dt - timedelta(microseconds=dt.microsecond % 1000)
+
+
+def event_time(event):
+    return parse_time(event['id']['time'])
+
+
+class ActivityInterval:
+    """A stretch of activity: start is bucket-accurate, end is the exact newest event."""
+
+    __slots__ = ('start', 'end', 'buckets', 'last_event')
+
+    def __init__(self, start, end, last_event):
+        self.start = start
+        self.end = end
+        self.buckets = 1
+        self.last_event = last_event
+
+    def __repr__(self):
+        return f"ActivityInterval({format_time(self.start)} - {format_time(self.end)}, {self.buckets} buckets)"
+
+
+class ActivityProbe:
+    """maxResults=1 probes of activities().list for one query (userKey, app, filters)."""
+
+    def __init__(self, service, **query):
+        query.pop('maxResults', None)
+        self.service = service
+        self.query = query
+        self.calls = 0
+
+    def newest(self, start, end):
+        """Newest matching event with start <= time <= end, or None."""
+        if end < start:
+            return None
+        request = self.service.activities().list(
+            startTime=format_time(start), endTime=format_time(end), maxResults=1, **self.query)
+        # Filtered queries can return an empty page that still has a next page
+        while request is not None:
+            self.calls += 1
+            response = execute(request)
+            items = response.get('items', [])
+            if items:
+                return items[0]
+            request = self.service.activities().list_next(request, response)
+        return None
+
+    def last(self, start=None, end=None):
+        """Newest matching event in the window (default: the retention period)."""
+        end = end or datetime.now(timezone.utc)
+        return self.newest(start or end - RETENTION, end)
+
+    def first(self, start=None, end=None):
+        """Oldest matching event in the window, found by bisection."""
+        end = end or datetime.now(timezone.utc)
+        start = floor_time(start or end - RETENTION)
+        found = self.newest(start, end)
+        if found is None:
+            return None
+
+        # Invariant: nothing matches before lo, and found (at hi) matches
+        lo, hi = start, event_time(found)
+        while hi - lo > TICK:
+            mid = lo + TICK * ((hi - lo) // TICK // 2)
+            event = self.newest(lo, mid)
+            if event is None:
+                lo = mid + TICK
+            else:
+                found, hi = event, event_time(event)
+                if hi <= lo:
+                    break
+        if lo < hi:
+            # lo itself was never probed on its own
+            event = self.newest(lo, hi - TICK)
+            if event is not None:
+                found = event
+        return found
+
+    def intervals(self, start=None, end=None, resolution=timedelta(hours=1), max_gap=None):
+        """Active stretches of the window, newest first, as ActivityIntervals.
+
+        The window is divided into resolution-sized buckets (aligned on whole
+        resolutions since the Unix epoch, so hourly buckets start on the hour);
+        buckets with at least one event that are at most max_gap apart
+        (default: adjacent) are merged into one interval.
+        """
+        end = end or datetime.now(timezone.utc)
+        start = start or end - RETENTION
+        max_gap = max_gap or timedelta(0)
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        intervals = []
+        cursor = end
+
+        while cursor >= start:
+            event = self.newest(start, cursor)
+            if event is None:
+                break
+            when = event_time(event)
+            bucket = epoch + resolution * ((when - epoch) // resolution)
+
+            current = intervals[-1] if intervals else None
+            if current is not None and current.start - (bucket + resolution) <= max_gap:
+                current.start = max(bucket, start)
+                current.buckets += 1
+            else:
+                intervals.append(ActivityInterval(max(bucket, start), when, event))
+            cursor = bucket - TICK
+
+        return intervals
@@ -0,0 +1,118 @@
+"""
+Shared domain-wide delegation credentials and API clients.
+
+Every script used to call google.auth.default(), create a new iam.Signer and
+build() a fresh discovery client for each user it touched. The expensive
+parts of that are the IAM signBlob call behind every token refresh and
+loading the discovery document, and both can be reused:
+
+- One ADC source credential and iam.Signer per service account.
+- An LRU cache of delegated credentials keyed on (service account, subject,
+  scopes). A cached credential keeps its access token and google-auth only
+  refreshes it (one signBlob) when it is within a few minutes of expiry.
+- Gmail/Admin discovery documents are read once from the static copies
+  bundled with google-api-python-client, never fetched over the network.
+
+API client objects are still built per call: httplib2-based clients are not
+thread-safe, and building from the cached document is cheap.
+
+With API_CASSETTE set, clients record to or replay from a cassette
+(api_cassette); in replay mode no ADC credentials are needed at all.
+With WORKSPACE_API_ENDPOINT set, clients talk to a local stand-in server
+(workspace_standin) instead of Google, also without credentials.
+
+Usage:
+    from workspace_auth import build_service, get_delegated_credentials
+
+    creds = get_delegated_credentials(SERVICE_ACCOUNT_EMAIL, user_email, SCOPES)
+    gmail = build_service('gmail', 'v1', credentials=creds)
+"""
+
+import functools
+import json
+import os
+
+import google.auth
+from google.auth import iam
+from google.auth.transport import requests as auth_requests
+from google.oauth2 import service_account
+from googleapiclient import _auth
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from api_cassette import CassetteHttp, ReplayCredentials, get_cassette
+from workspace_standin import StandInCredentials
+
+# Base URL of a workspace_standin server to use instead of googleapis.com
+API_ENDPOINT = os.getenv('WORKSPACE_API_ENDPOINT', '').rstrip('/')
+
+TOKEN_URI = 'https://oauth2.googleapis.com/token'
+CLOUD_PLATFORM_SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+# Enough for every user of a 1,000-seat tenant with a couple of scope sets each
+CREDENTIAL_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=None)
+def get_signer(service_account_email):
+    """Get the IAM signer used to sign delegation JWTs for a service account."""
+    # Get ADC credentials (already impersonating the service account via gcloud)
+    source_credentials, project = google.auth.default(scopes=CLOUD_PLATFORM_SCOPES)
+    return iam.Signer(
+        request=auth_requests.Request(),
+        credentials=source_credentials,
+        service_account_email=service_account_email
+    )
+
+
+@functools.lru_cache(maxsize=CREDENTIAL_CACHE_SIZE)
+def _delegated_credentials(service_account_email, subject, scopes):
+    return service_account.Credentials(
+        signer=get_signer(service_account_email),
+        service_account_email=service_account_email,
+        token_uri=TOKEN_URI,
+        scopes=list(scopes),
+        subject=subject
+    )
+
+
+def get_delegated_credentials(service_account_email, subject, scopes):
+    """Get (cached) credentials impersonating subject via domain-wide delegation."""
+    if API_ENDPOINT:
+        return StandInCredentials(subject)
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == 'replay':
+        return ReplayCredentials(subject)
+    return _delegated_credentials(service_account_email, subject, tuple(sorted(scopes)))
+
+
+@functools.lru_cache(maxsize=None)
+def get_discovery_document(api, version):
+    """Read a bundled discovery document once; None if it is not bundled."""
+    return get_static_doc(api, version)
+
+
+def build_service(api, version, credentials):
+    """Drop-in replacement for build() that uses the cached discovery document."""
+    document = get_discovery_document(api, version)
+
+    cassette = get_cassette()
+    if cassette is not None:
+        inner = None if cassette.mode == 'replay' else _auth.authorized_http(credentials)
+        kwargs = dict(http=CassetteHttp(cassette, inner))
+    else:
+        kwargs = dict(credentials=credentials)
+
+    if API_ENDPOINT:
+        if document is None:
+            return build(api, version, client_options={'api_endpoint': API_ENDPOINT}, **kwargs)
+        # Batch requests go to rootUrl + batchPath, so rewrite the document
+        # rather than passing client_options
+        document = json.loads(document)
+        document['rootUrl'] = document['mtlsRootUrl'] = API_ENDPOINT + '/'
+
+    if document is None:
+        return build(api, version, **kwargs)
+    # Resource objects annotate the parsed document in place, so each client
+    # gets its own parse of the cached text rather than a shared dict.
+    return build_from_document(document, **kwargs)
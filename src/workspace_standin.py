@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Workspace APIs the scripts use, for load and concurrency tests.
+
+Tuning concurrency, batching and rate limiting against a live tenant is
+slow and risky. This server emulates the subset of the APIs the scripts
+call, backed by a synthetic tenant generated on the fly (nothing is held in
+memory per event, so millions of events cost nothing):
+
+- Gmail: users.messages.list / get (minimal, metadata, full, raw),
+  users.settings.* (auto-forwarding, filters, forwarding addresses,
+  delegates, send-as, vacation, IMAP, POP) and HTTP batch requests.
+- Admin Directory: users.list, with page etags and 304 Not Modified.
+- Admin Reports: activities.list for any application, one user or 'all',
+  with startTime / endTime / eventName / actorIpAddress.
+
+Every list paginates like the real API. A quota model answers with real
+Google error bodies: a token bucket per API (--qps) returns 429
+rateLimitExceeded when empty, --error-rate injects 500/503, and every
+request is delayed by --latency-ms (+/- --jitter-ms).
+
+Point the scripts at it with WORKSPACE_API_ENDPOINT; workspace_auth then
+builds clients against the stand-in with anonymous credentials that carry
+the impersonated user in an X-Standin-Subject header (so userId='me'
+resolves to the right synthetic mailbox):
+
+    python workspace_standin.py --users 5000 --events-per-user 2000 --qps gmail=250,reports=50
+    WORKSPACE_API_ENDPOINT=http://127.0.0.1:8808 python askmoss/comprehensive_security_audit.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from google.auth.credentials import AnonymousCredentials
+
+SUBJECT_HEADER = 'X-Standin-Subject'
+
+DEFAULT_QPS = {'gmail': 250.0, 'directory': 25.0, 'reports': 50.0}
+
+OFFICE_IPS = ['199.200.88.186', '199.200.88.187', '138.199.114.10']
+OTHER_IPS = ['172.56.21.4', '2600:1700:5a0:1e0::12', '3.91.12.7', '98.47.112.30']
+ATTACKER_IPS = ['158.51.123.14', '147.124.205.9', '45.87.125.150']
+
+EVENT_NAMES = {
+    'login': ['login_success', 'login_success', 'login_success', 'logout', 'login_failure',
+              'login_verification'],
+    'admin': ['CHANGE_USER_SETTING', 'CHANGE_PASSWORD', 'GRANT_ADMIN_PRIVILEGE', 'CREATE_USER'],
+    'token': ['authorize', 'authorize', 'revoke'],
+    'gmail': ['delete', 'trash', 'send', 'open'],
+}
+
+
+class StandInCredentials(AnonymousCredentials):
+    """Unauthenticated credentials that tell the stand-in which user is impersonated."""
+
+    def __init__(self, subject=None):
+        super().__init__()
+        self._subject = subject
+
+    def apply(self, headers, token=None):
+        if self._subject:
+            headers[SUBJECT_HEADER] = self._subject
+
+    def before_request(self, request, method, url, headers):
+        self.apply(headers)
+
+
+def _google_error(code, reason, message):
+    status = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE',
+              404: 'NOT_FOUND', 400: 'INVALID_ARGUMENT'}.get(code, 'UNKNOWN')
+    return code, {'error': {'code': code, 'message': message, 'status': status,
+                            'errors': [{'reason': reason, 'domain': 'usageLimits' if code == 429 else 'global',
+                                        'message': message}]}}
+
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class SyntheticTenant:
+    """Deterministic users, mailboxes and audit events derived from a seed."""
+
+    def __init__(self, users=1000, domain='standin.example', messages_per_user=200,
+                 events_per_user=500, body_kb=20, seed=1, now=None):
+        self.domain = domain
+        self.user_count = users
+        self.messages_per_user = messages_per_user
+        self.events_per_user = events_per_user
+        self.body_kb = body_kb
+        self.seed = seed
+        self.now = (now or datetime.now(timezone.utc)).replace(microsecond=0)
+        # Events are spread evenly over the last 90 days, newest first, on
+        # whole milliseconds like real Reports API timestamps
+        span_ms = 90 * 86400 * 1000 // max(1, users * events_per_user)
+        self.step = timedelta(milliseconds=max(1, span_ms))
+        self._emails = {self.email(i): i for i in range(users)}
+
+    def email(self, index):
+        return f"user{index:05d}@{self.domain}"
+
+    def user_index(self, user_key):
+        return self._emails.get((user_key or '').lower())
+
+    def _rng(self, *parts):
+        return random.Random(hashlib.sha1(repr((self.seed,) + parts).encode()).digest())
+
+    # Directory ---------------------------------------------------------
+
+    def user(self, index):
+        return {
+            'kind': 'admin#directory#user',
+            'id': str(100000000000 + index),
+            'primaryEmail': self.email(index),
+            'name': {'givenName': 'User', 'familyName': f"{index:05d}", 'fullName': f"User {index:05d}"},
+            'isAdmin': index % 100 == 0,
+            'suspended': index % 50 == 49,
+            'orgUnitPath': '/',
+            'lastLoginTime': (self.now - timedelta(hours=index % 240)).isoformat().replace('+00:00', 'Z'),
+            'creationTime': '2020-01-01T00:00:00.000Z',
+        }
+
+    # Reports -----------------------------------------------------------
+
+    def event_time(self, g):
+        return self.now - self.step * g
+
+    def event(self, app, g):
+        user = g % self.user_count
+        rng = self._rng(app, g)
+        roll = rng.random()
+        ip = (rng.choice(ATTACKER_IPS) if roll < 0.002 else
+              rng.choice(OTHER_IPS) if roll < 0.2 else rng.choice(OFFICE_IPS))
+        name = rng.choice(EVENT_NAMES.get(app, ['activity']))
+        parameters = [{'name': 'login_type', 'value': 'google_password'}] if app == 'login' else []
+        return {
+            'kind': 'admin#reports#activity',
+            'id': {'time': self.event_time(g).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+                   'uniqueQualifier': str(g), 'applicationName': app, 'customerId': 'C0standin'},
+            'actor': {'email': self.email(user), 'profileId': str(100000000000 + user)},
+            'ipAddress': ip,
+            'events': [{'type': app, 'name': name, 'parameters': parameters}],
+        }
+
+    def event_range(self, user, start, end):
+        """Global event indexes (g) for one user (or all) between two times, newest first."""
+        total = self.user_count * self.events_per_user
+        g_min = 0 if end is None else max(0, -((end - self.now) // self.step))
+        g_max = total - 1 if start is None else min(total - 1, int((self.now - start) / self.step))
+        if user is None:
+            return range(g_min, g_max + 1)
+        first = g_min + (user - g_min) % self.user_count
+        return range(first, g_max + 1, self.user_count)
+
+    # Gmail -------------------------------------------------------------
+
+    def message_id(self, user, k):
+        return f"{user:05x}{k:011x}"
+
+    def parse_message_id(self, message_id):
+        try:
+            return int(message_id[:5], 16), int(message_id[5:], 16)
+        except ValueError:
+            return None, None
+
+    def message_headers(self, user, k):
+        rng = self._rng('msg', user, k)
+        sent = self.now - timedelta(minutes=37 * k + user % 37)
+        vendor = rng.choice(['ssdhvac.com', 'ssdhvca.com', 'supplier.example', 'partner.example'])
+        sender = f"ap@{vendor}"
+        thread = k - k % 5
+        refs = ' '.join(f"<{user}.{j}@{vendor}>" for j in range(thread, k))
+        ip = rng.choice(OFFICE_IPS + OTHER_IPS + ATTACKER_IPS[:1])
+        headers = [
+            ('Received', f"from mail.{vendor} (mail.{vendor} [{ip}]) by mx.google.com; {format_datetime(sent)}"),
+            ('Authentication-Results', f"mx.google.com; dkim=pass header.d={vendor}; spf=pass; dmarc=pass"),
+            ('DKIM-Signature', f"v=1; a=rsa-sha256; d={vendor}; s=selector1; b=abc"),
+            ('From', f"Accounts Payable <{sender}>"),
+            ('To', self.email(user)),
+            ('Subject', f"Invoice {100000 + k}"),
+            ('Date', format_datetime(sent)),
+            ('Message-ID', f"<{user}.{k}@{vendor}>"),
+        ]
+        if refs:
+            headers.append(('In-Reply-To', f"<{user}.{k - 1}@{vendor}>"))
+            headers.append(('References', refs))
+        if rng.random() < 0.01:
+            headers.append(('Reply-To', 'ap@ssdhvca.com'))
+        return headers, sent
+
+    def message(self, user, k, fmt='full', metadata_headers=None):
+        headers, sent = self.message_headers(user, k)
+        message_id = self.message_id(user, k)
+        resource = {'id': message_id, 'threadId': self.message_id(user, k - k % 5),
+                    'labelIds': ['INBOX'] if k % 7 else ['TRASH'],
+                    'snippet': f"Invoice {100000 + k}", 'internalDate': str(int(sent.timestamp() * 1000)),
+                    'historyId': str(1000 + k)}
+        body = ('Please remit payment.\n' * (self.body_kb * 1024 // 22 + 1))[:self.body_kb * 1024]
+        raw = ''.join(f"{n}: {v}\r\n" for n, v in headers) + '\r\n' + body
+        resource['sizeEstimate'] = len(raw)
+        if fmt == 'minimal':
+            return resource
+        if fmt == 'raw':
+            resource['raw'] = base64.urlsafe_b64encode(raw.encode()).decode()
+            return resource
+        if fmt == 'metadata' and metadata_headers:
+            wanted = {h.lower() for h in metadata_headers}
+            headers = [(n, v) for n, v in headers if n.lower() in wanted]
+        payload = {'mimeType': 'text/plain', 'headers': [{'name': n, 'value': v} for n, v in headers]}
+        if fmt == 'full':
+            payload['body'] = {'size': len(body), 'data': base64.urlsafe_b64encode(body.encode()).decode()}
+        resource['payload'] = payload
+        return resource
+
+
+class StandInAPI:
+    """Routes API requests to the synthetic tenant under the quota model."""
+
+    ROUTES = [
+        ('gmail', re.compile(r'^/gmail/v1/users/([^/]+)/messages$'), 'messages_list'),
+        ('gmail', re.compile(r'^/gmail/v1/users/([^/]+)/messages/([^/]+)$'), 'messages_get'),
+        ('gmail', re.compile(r'^/gmail/v1/users/([^/]+)/settings/(.+)$'), 'settings'),
+        ('directory', re.compile(r'^/admin/directory/v1/users$'), 'users_list'),
+        ('reports', re.compile(r'^/admin/reports/v1/activity/users/([^/]+)/applications/([^/]+)$'),
+         'activities_list'),
+    ]
+
+    def __init__(self, tenant, qps=None, error_rate=0.0, latency_ms=0.0, jitter_ms=0.0):
+        self.tenant = tenant
+        self.buckets = {api: TokenBucket(rate) for api, rate in {**DEFAULT_QPS, **(qps or {})}.items()}
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stats = {'requests': 0, '429': 0, '5xx': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def handle(self, method, target, headers):
+        """(status, json body, extra headers) for one API call (not a batch)."""
+        self._count('requests')
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        parsed = urlsplit(target)
+        query = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(parsed.query).items()}
+        for api, pattern, handler in self.ROUTES:
+            match = pattern.match(unquote(parsed.path))
+            if match:
+                break
+        else:
+            return _google_error(404, 'notFound', f"No stand-in route for {parsed.path}") + ({},)
+
+        if not self.buckets[api].take():
+            self._count('429')
+            return _google_error(429, 'rateLimitExceeded', 'Rate Limit Exceeded') + ({},)
+        if self.error_rate and random.random() < self.error_rate:
+            self._count('5xx')
+            code = random.choice([500, 503])
+            return _google_error(code, 'backendError', 'Backend Error') + ({},)
+
+        subject = headers.get(SUBJECT_HEADER)
+        return getattr(self, handler)(query, headers, subject, *match.groups())
+
+    def _user(self, user_id, subject):
+        return self.tenant.user_index(subject if user_id == 'me' else user_id)
+
+    # Gmail -------------------------------------------------------------
+
+    def messages_list(self, query, headers, subject, user_id):
+        user = self._user(user_id, subject)
+        if user is None:
+            return _google_error(400, 'invalidArgument', 'Unknown mailbox') + ({},)
+        start = int(query.get('pageToken', 0))
+        size = min(int(query.get('maxResults', 100)), 500)
+        end = min(start + size, self.tenant.messages_per_user)
+        body = {'resultSizeEstimate': self.tenant.messages_per_user,
+                'messages': [{'id': self.tenant.message_id(user, k),
+                              'threadId': self.tenant.message_id(user, k - k % 5)} for k in range(start, end)]}
+        if end < self.tenant.messages_per_user:
+            body['nextPageToken'] = str(end)
+        return 200, body, {}
+
+    def messages_get(self, query, headers, subject, user_id, message_id):
+        user, k = self.tenant.parse_message_id(message_id)
+        if user is None or user != self._user(user_id, subject) or not 0 <= k < self.tenant.messages_per_user:
+            return _google_error(404, 'notFound', 'Requested entity was not found.') + ({},)
+        metadata_headers = query.get('metadataHeaders')
+        if isinstance(metadata_headers, str):
+            metadata_headers = [metadata_headers]
+        return 200, self.tenant.message(user, k, query.get('format', 'full'), metadata_headers), {}
+
+    def settings(self, query, headers, subject, user_id, setting):
+        user = self._user(user_id, subject)
+        if user is None:
+            return _google_error(400, 'invalidArgument', 'Unknown mailbox') + ({},)
+        flagged = user % 97 == 3   # A few mailboxes look compromised
+        bodies = {
+            'autoForwarding': {'enabled': flagged, 'emailAddress': 'ap@ssdhvca.com' if flagged else None,
+                               'disposition': 'leaveInInbox'},
+            'filters': {'filter': [{'id': 'f1', 'criteria': {'from': 'ssdhvac.com'},
+                                    'action': {'removeLabelIds': ['INBOX'], 'addLabelIds': ['TRASH']}}]}
+            if flagged else {},
+            'forwardingAddresses': {'forwardingAddresses': [{'forwardingEmail': 'ap@ssdhvca.com',
+                                                            'verificationStatus': 'accepted'}]} if flagged else {},
+            'delegates': {},
+            'sendAs': {'sendAs': [{'sendAsEmail': self.tenant.email(user), 'isPrimary': True,
+                                   'isDefault': True, 'verificationStatus': 'accepted'}]},
+            'vacation': {'enableAutoReply': False},
+            'imap': {'enabled': True, 'autoExpunge': True, 'expungeBehavior': 'archive'},
+            'pop': {'accessWindow': 'disabled'},
+        }
+        if setting not in bodies:
+            return _google_error(404, 'notFound', f"Unknown setting {setting}") + ({},)
+        return 200, {k: v for k, v in bodies[setting].items() if v is not None}, {}
+
+    # Directory ---------------------------------------------------------
+
+    def users_list(self, query, headers, subject):
+        start = int(query.get('pageToken', 0))
+        size = min(int(query.get('maxResults', 100)), 500)
+        end = min(start + size, self.tenant.user_count)
+        etag = '"' + hashlib.sha1(f"{self.tenant.seed}:{start}:{end}".encode()).hexdigest() + '"'
+        if headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        body = {'kind': 'admin#directory#users', 'etag': etag,
+                'users': [self.tenant.user(i) for i in range(start, end)]}
+        if end < self.tenant.user_count:
+            body['nextPageToken'] = str(end)
+        return 200, body, {'ETag': etag}
+
+    # Reports -----------------------------------------------------------
+
+    def activities_list(self, query, headers, subject, user_key, app):
+        user = None if user_key == 'all' else self.tenant.user_index(user_key)
+        if user_key != 'all' and user is None:
+            return _google_error(400, 'invalidArgument', 'Bad userKey') + ({},)
+
+        def parse(value):
+            return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+        events = self.tenant.event_range(user, parse(query.get('startTime')), parse(query.get('endTime')))
+        position = int(query.get('pageToken', 0))
+        size = min(int(query.get('maxResults', 1000)), 1000)
+        event_name = query.get('eventName')
+        actor_ip = query.get('actorIpAddress')
+
+        items = []
+        # Filtered queries scan a bounded number of events per page, like the real API
+        scan_limit = position + max(size * 20, 20000)
+        while position < len(events) and len(items) < size and position < scan_limit:
+            event = self.tenant.event(app, events[position])
+            position += 1
+            if event_name and event['events'][0]['name'] != event_name:
+                continue
+            if actor_ip and event['ipAddress'] != actor_ip:
+                continue
+            items.append(event)
+
+        body = {'kind': 'admin#reports#activities', 'items': items}
+        if position < len(events):
+            body['nextPageToken'] = str(position)
+        return 200, body, {}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api = None   # StandInAPI, set on the server's handler subclass
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None, content_type='application/json; charset=UTF-8'):
+        data = b'' if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        status, body, headers = self.api.handle('GET', self.path, self.headers)
+        self._send(status, body, headers)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+        if urlsplit(self.path).path.startswith('/batch'):
+            self._batch(data)
+        else:
+            status, body, headers = self.api.handle('POST', self.path, self.headers)
+            self._send(status, body, headers)
+
+    def _batch(self, data):
+        """Answer a multipart/mixed batch, one application/http part per call."""
+        boundary = re.search(r'boundary="?([^";]+)"?', self.headers.get('Content-Type', '')).group(1)
+        parts = data.split(b'--' + boundary.encode())
+        out_boundary = 'batch_standin_' + hashlib.sha1(data).hexdigest()[:16]
+        out = []
+        for part in parts:
+            part = part.strip(b'\r\n')
+            if not part or part == b'--':
+                continue
+            outer, _, inner = part.replace(b'\r\n', b'\n').partition(b'\n\n')
+            content_id = re.search(rb'Content-ID: <([^>]+)>', outer, re.IGNORECASE)
+            request_head = inner.split(b'\n\n', 1)[0].decode('utf-8', 'replace').split('\n')
+            method, target = request_head[0].split(' ')[:2]
+            inner_headers = dict(line.split(': ', 1) for line in request_head[1:] if ': ' in line)
+            status, body, headers = self.api.handle(method, target, inner_headers)
+            payload = json.dumps(body) if body is not None else ''
+            response = (f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                        f"Content-Type: application/json; charset=UTF-8\r\n"
+                        + ''.join(f"{k}: {v}\r\n" for k, v in headers.items())
+                        + f"\r\n{payload}")
+            out.append(f"--{out_boundary}\r\nContent-Type: application/http\r\n"
+                       f"Content-ID: <response-{content_id.group(1).decode() if content_id else ''}>\r\n\r\n"
+                       f"{response}\r\n")
+        body = (''.join(out) + f"--{out_boundary}--\r\n").encode()
+        self._send(200, body, content_type=f'multipart/mixed; boundary={out_boundary}')
+
+
+def make_server(api, host='127.0.0.1', port=8808):
+    handler = type('BoundStandInHandler', (StandInHandler,), {'api': api})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def _parse_qps(value):
+    qps = {}
+    for item in filter(None, value.split(',')):
+        name, _, rate = item.partition('=')
+        qps[name.strip()] = float(rate)
+    return qps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Gmail / Directory / Reports APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8808)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--domain', default='standin.example')
+    parser.add_argument('--messages-per-user', type=int, default=200)
+    parser.add_argument('--events-per-user', type=int, default=500)
+    parser.add_argument('--body-kb', type=int, default=20, help='Message body size for format=full/raw')
+    parser.add_argument('--qps', type=_parse_qps, default={}, help='Per-API rate, e.g. gmail=250,reports=50')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls answered 500/503')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    tenant = SyntheticTenant(args.users, args.domain, args.messages_per_user, args.events_per_user,
+                             args.body_kb, args.seed)
+    api = StandInAPI(tenant, args.qps, args.error_rate, args.latency_ms, args.jitter_ms)
+    server = make_server(api, args.host, args.port)
+
+    print(f"[+] Workspace stand-in on http://{args.host}:{args.port} - {args.users:,} users, "
+          f"{args.users * args.events_per_user:,} events per application, "
+          f"{args.users * args.messages_per_user:,} messages")
+    print(f"    WORKSPACE_API_ENDPOINT=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\n[+] {api.stats['requests']:,} requests, {api.stats['429']:,} throttled, "
+              f"{api.stats['5xx']:,} server errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# Shared helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """(tenant, api, reports service) backed by a local workspace_standin server."""
+    import workspace_auth
+    from workspace_standin import StandInAPI, StandInCredentials, SyntheticTenant, make_server
+
+    tenant = SyntheticTenant(users=50, messages_per_user=10, events_per_user=200)
+    api = StandInAPI(tenant, qps={'reports': 100000.0})
+    server = make_server(api, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(workspace_auth, 'API_ENDPOINT', f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        yield tenant, api, workspace_auth.build_service('admin', 'reports_v1', StandInCredentials())
+    finally:
+        server.shutdown()
+        server.server_close()
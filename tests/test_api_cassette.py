@@ -0,0 +1,38 @@
+import httplib2
+import pytest
+
+from api_cassette import Cassette, CassetteMiss
+
+URL = 'https://admin.googleapis.com/admin/reports/v1/activity/users/all/applications/login'
+
+
+def _record(path, windows):
+    cassette = Cassette(str(path), 'record')
+    for start, body in windows:
+        response = httplib2.Response({'status': '200'})
+        cassette.record('GET', f"{URL}?startTime={start}&maxResults=1", None, response, body, 0.01)
+    cassette.close()
+    return Cassette(str(path), 'replay')
+
+
+def test_exact_match(tmp_path):
+    cassette = _record(tmp_path / 'c.jsonl.gz', [('2025-12-01T00:00:00Z', b'a'), ('2025-12-02T00:00:00Z', b'b')])
+    assert cassette.replay('GET', f"{URL}?maxResults=1&startTime=2025-12-02T00:00:00Z", None)[1] == b'b'
+    assert cassette.replay('GET', f"{URL}?startTime=2025-12-01T00:00:00Z&maxResults=1", None)[1] == b'a'
+
+
+def test_loose_match_with_one_recorded_window(tmp_path):
+    cassette = _record(tmp_path / 'c.jsonl.gz', [('2025-12-01T00:00:00Z', b'a')])
+    assert cassette.replay('GET', f"{URL}?startTime=2025-12-05T00:00:00Z&maxResults=1", None)[1] == b'a'
+
+
+def test_loose_match_refused_with_several_windows(tmp_path):
+    cassette = _record(tmp_path / 'c.jsonl.gz', [('2025-12-01T00:00:00Z', b'a'), ('2025-12-02T00:00:00Z', b'b')])
+    with pytest.raises(CassetteMiss):
+        cassette.replay('GET', f"{URL}?startTime=2025-12-03T00:00:00Z&maxResults=1", None)
+
+
+def test_unknown_request(tmp_path):
+    cassette = _record(tmp_path / 'c.jsonl.gz', [('2025-12-01T00:00:00Z', b'a')])
+    with pytest.raises(CassetteMiss):
+        cassette.replay('GET', f"{URL}?startTime=2025-12-01T00:00:00Z&maxResults=2", None)
@@ -0,0 +1,67 @@
+from email_threads import ThreadIndex, id_domain, id_source, is_synthetic_id, normalize_id, parse_message_ids
+
+
+def _ids(nodes):
+    return sorted(node.message_id for node in nodes)
+
+
+def test_parse_and_normalize():
+    assert parse_message_ids('<a@x>\n\t<b@y> junk') == ['<a@x>', '<b@y>']
+    assert parse_message_ids('NOT PRESENT') == []
+    assert normalize_id('a@x') == '<a@x>'
+    assert normalize_id('UNKNOWN') is None
+    assert id_domain('<a@Mail.Example>') == 'mail.example'
+    assert id_source('<x.BLAPR19MB4417@outlook>', {'BLAPR19MB4417': 'Vendor tenant'}) == 'Vendor tenant'
+
+
+def test_references_chain():
+    index = ThreadIndex()
+    index.add('<a@x>', data={'n': 1})
+    index.add('<b@x>', '<a@x>', '<a@x>', data={'n': 2})
+    index.add('<c@x>', '<a@x> <b@x>', '<b@x>', data={'n': 3})
+
+    assert [n.message_id for n in index.roots()] == ['<a@x>']
+    assert [(d, n.message_id) for d, n in index.walk(index.get('<a@x>'))] == [(0, '<a@x>'), (1, '<b@x>'), (2, '<c@x>')]
+    assert index.missing() == []
+    assert [n.message_id for n in index.ancestors('<c@x>')] == ['<b@x>', '<a@x>']
+
+
+def test_missing_parents_reported():
+    index = ThreadIndex()
+    index.add('<c@x>', '<a@x> <b@x>', None, data={})
+    assert _ids(index.missing()) == ['<a@x>', '<b@x>']
+    assert index.thread_of('<c@x>').message_id == '<a@x>'
+
+
+def test_in_reply_to_is_unioned_with_references():
+    index = ThreadIndex()
+    # Parent only in In-Reply-To (References is truncated / stripped)
+    index.add('<c@x>', '<a@x>', '<b@x>', data={})
+    assert _ids(index.missing()) == ['<a@x>', '<b@x>']
+    assert index.get('<c@x>').parent.message_id == '<b@x>'
+    assert index.get('<b@x>').parent.message_id == '<a@x>'
+
+
+def test_in_reply_to_alone():
+    index = ThreadIndex()
+    index.add('<b@x>', 'NOT PRESENT', '<a@x>', data={})
+    assert _ids(index.missing()) == ['<a@x>']
+
+
+def test_no_loops_and_duplicates_keep_first():
+    index = ThreadIndex()
+    index.add('<a@x>', '<b@x>', None, data={'n': 1})
+    index.add('<b@x>', '<a@x>', None, data={'n': 2})
+    index.add('<a@x>', None, None, data={'n': 3})
+
+    assert index.get('<a@x>').data == {'n': 1}
+    assert len(index.roots()) == 1
+
+
+def test_synthetic_ids():
+    index = ThreadIndex()
+    node = index.add('UNKNOWN', '<a@x>', None, data={})
+    assert is_synthetic_id(node.message_id)
+    assert not is_synthetic_id('<a@x>')
+    assert _ids(index.missing()) == ['<a@x>']
+    assert [n for n in index.messages() if not is_synthetic_id(n.message_id)] == []
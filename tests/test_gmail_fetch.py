@@ -0,0 +1,23 @@
+import gmail_cache
+import gmail_fetch
+import workspace_auth
+from workspace_standin import StandInCredentials
+
+
+def test_live_labels_override_cached_labels(standin, tmp_path, monkeypatch):
+    tenant, api, _ = standin
+    cache = gmail_cache.GmailCache(str(tmp_path / 'gmail_cache.sqlite'))
+    monkeypatch.setattr(gmail_fetch, 'get_cache', lambda: cache)
+    service = workspace_auth.build_service('gmail', 'v1', StandInCredentials(tenant.email(0)))
+    message_id = service.users().messages().list(userId='me').execute()['messages'][0]['id']
+
+    message = gmail_fetch.get_message(service, message_id, format='raw')
+    current = gmail_fetch.get_labels(service, message_id)
+    assert message['labelIds'] == current
+
+    # The message has since been moved: the cached copy still says INBOX
+    key = gmail_cache.cache_key(gmail_cache.mailbox_of(service), message_id, dict(format='raw'))
+    cache.put(key, tenant.email(0), message_id, 'raw', dict(message, labelIds=['INBOX']))
+
+    assert gmail_fetch.get_message(service, message_id, format='raw')['labelIds'] == ['INBOX']
+    assert gmail_fetch.get_message(service, message_id, format='raw', live_labels=True)['labelIds'] == current
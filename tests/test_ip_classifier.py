@@ -0,0 +1,84 @@
+from ip_classifier import CATEGORIES, IPClassifier, ip_to_int
+
+
+def test_longest_prefix_wins():
+    c = IPClassifier()
+    assert c.classify('172.120.137.37') == 'attacker'
+    assert c.classify('172.16.4.1') == 'private'
+    assert c.classify('172.58.1.1') == 'mobile'
+    assert c.classify('172.100.1.1') == 'unknown'
+
+
+def test_office_is_exact():
+    c = IPClassifier()
+    assert c.classify('199.200.88.186') == 'office'
+    assert c.classify('199.200.1.1') == 'unknown'
+    assert c.classify('138.199.114.2') == 'office'
+
+
+def test_cloud_hosting_is_datacenter_not_legit():
+    c = IPClassifier()
+    assert c.classify('54.12.3.4') == 'aws'
+    assert c.classify('34.1.2.3') == 'google'
+    assert c.is_datacenter('54.12.3.4')
+    assert c.is_datacenter('34.1.2.3')
+    assert not c.is_datacenter('138.199.114.2')
+
+
+def test_no_first_octet_guessing():
+    c = IPClassifier()
+    # Google and T-Mobile space in the old "datacenter" /8s
+    assert c.classify('142.250.72.14') == 'google'
+    assert c.classify('172.217.3.110') == 'google'
+    assert not c.is_suspicious('142.250.72.14')
+    assert c.classify('172.56.20.1') == 'mobile'
+    assert not c.is_suspicious('172.56.20.1')
+    # Everything else there is left to ip_enrichment's ASN data
+    for ip in ('45.1.2.3', '46.1.2.3', '38.1.2.3', '142.1.2.3', '156.1.2.3', '158.1.2.3', '147.1.2.3'):
+        assert c.classify(ip) == 'unknown', ip
+        assert not c.is_datacenter(ip), ip
+
+
+def test_residential_is_not_datacenter():
+    c = IPClassifier()
+    assert c.classify('73.15.2.9') == 'unknown'
+    assert not c.is_datacenter('73.15.2.9')
+    # Still worth a look in the delete/export analyses
+    assert c.is_suspicious('73.15.2.9')
+
+
+def test_ipv6_carriers_are_specific():
+    c = IPClassifier()
+    assert c.classify('2600:1000:b00c::1') == 'mobile'
+    assert c.classify('2607:fb90:1234::1') == 'mobile'
+    assert c.classify('2600:3c00::1') == 'datacenter'
+    assert c.classify('2607:f8b0::1') == 'google'
+    assert c.is_datacenter('2600:3c00::1')
+    assert c.is_datacenter('2607:f8b0::1')
+    assert c.classify('2600:9000::1') == 'unknown'
+    assert not c.is_suspicious('2600:9000::1')
+
+
+def test_ipv4_mapped_addresses():
+    c = IPClassifier()
+    assert ip_to_int('::ffff:45.87.125.150') == ip_to_int('45.87.125.150')
+    assert c.classify('::ffff:45.87.125.150') == 'attacker'
+    assert c.is_suspicious('::ffff:45.87.125.150')
+    assert c.is_suspicious('::ffff:73.15.2.9')
+
+
+def test_empty_and_invalid():
+    c = IPClassifier()
+    assert c.classify('') == 'none'
+    assert c.classify(None) == 'none'
+    assert c.classify('not-an-ip') == 'invalid'
+    assert not c.is_suspicious('')
+    assert not c.is_suspicious('not-an-ip')
+
+
+def test_classify_codes_matches_classify():
+    c = IPClassifier()
+    dictionary = ['45.87.125.150', '54.12.3.4', '']
+    codes = [0, 1, 2, 1, 0]
+    result = [CATEGORIES[i] for i in c.classify_codes(dictionary, codes)]
+    assert result == ['attacker', 'aws', 'none', 'aws', 'attacker']
@@ -0,0 +1,53 @@
+import os
+import sys
+
+from lookalike_domains import LookalikeIndex, distance, skeleton
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'askmoss', 'archive'))
+from extract_all_domains import find_similar_domains  # noqa: E402
+
+
+def test_transposition_and_homoglyphs():
+    index = LookalikeIndex({'askmoss.com', 'ssdhvac.com'})
+
+    assert index.match('ssdhvca.com') == [('ssdhvac.com', 1.0, 'edit')]
+    assert index.match('aksmoss.com') == [('askmoss.com', 1.0, 'edit')]
+    assert index.match('askrnoss.com') == [('askmoss.com', 0.0, 'homoglyph')]
+    assert index.match('xn--skmoss-2nf.com') == [('askmoss.com', 0.0, 'homoglyph')]  # Cyrillic а
+
+
+def test_unrelated_and_exact_domains_do_not_match():
+    index = LookalikeIndex({'askmoss.com', 'ssdhvac.com'})
+
+    assert index.match('askmoss.com') == []
+    assert index.match('example.org') == []
+    assert index.match_many(['askmoss.com', 'example.org', 'ssdhvca.com']) == {
+        'ssdhvca.com': [('ssdhvac.com', 1.0, 'edit')]}
+
+
+def test_protected_lookalike_still_matches_the_domain_it_imitates():
+    # The victim replied to the attacker, so the lookalike got into the set
+    index = LookalikeIndex({'ssdhvac.com', 'ssdhvca.com'})
+
+    assert index.match('ssdhvca.com') == [('ssdhvac.com', 1.0, 'edit')]
+
+
+def test_keyboard_neighbours_cost_half():
+    assert distance('askmoss', 'asjmoss') == 0.5
+    assert distance('askmoss', 'aspmoss') == 1.0
+    assert skeleton('ASKM0SS.COM.') == 'askmoss.com'
+
+
+def test_find_similar_domains_reports_bec_lookalike():
+    # ssdhvca.com appears among the correspondents but is never protected
+    pairs = find_similar_domains({'ssdhvac.com', 'ssdhvca.com', 'aksmoss.com', 'gmail.com'},
+                                 {'ssdhvac.com', 'askmoss.com'})
+
+    assert [(a, b) for a, b, _, _ in pairs] == [('aksmoss.com', 'askmoss.com'), ('ssdhvca.com', 'ssdhvac.com')]
+
+
+def test_find_similar_domains_with_both_protected_reports_once():
+    pairs = find_similar_domains({'ssdhvac.com', 'ssdhvca.com'}, {'ssdhvac.com', 'ssdhvca.com'})
+
+    assert len(pairs) == 1
+    assert set(pairs[0][:2]) == {'ssdhvac.com', 'ssdhvca.com'}
@@ -0,0 +1,119 @@
+import base64
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+
+import mime_text
+from mime_text import get_body_text, iter_body_text
+
+
+def _b64url(data):
+    # Gmail API bodies: base64url without padding
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _gmail_payload(*parts):
+    return {'mimeType': 'multipart/alternative', 'parts': list(parts)}
+
+
+def _gmail_part(mime_type, data, charset='utf-8', filename=''):
+    return {
+        'mimeType': mime_type,
+        'filename': filename,
+        'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+        'body': {'data': _b64url(data)},
+    }
+
+
+def _parsed(raw):
+    return message_from_bytes(raw, policy=policy.default)
+
+
+def test_gmail_payload_prefers_plain_over_html():
+    payload = _gmail_payload(_gmail_part('text/plain', b'plain body'),
+                             _gmail_part('text/html', b'<p>html body</p>'))
+
+    assert get_body_text(payload) == 'plain body'
+
+
+def test_html_used_only_without_plain():
+    payload = _gmail_payload(_gmail_part('text/html', b'<p>only html</p>'))
+
+    assert get_body_text(payload, html_marker='[HTML]\n') == '[HTML]\n<p>only html</p>'
+    assert get_body_text(payload, include_html=False) == ''
+
+
+def test_html_marker_only_inside_multipart():
+    single = EmailMessage()
+    single.set_content('<p>hi</p>', subtype='html')
+    assert get_body_text(_parsed(single.as_bytes()), html_marker='[HTML]\n') == '<p>hi</p>\n'
+
+    payload = {'mimeType': 'text/html', 'body': {'data': _b64url(b'<p>hi</p>')}}
+    assert get_body_text(payload, html_marker='[HTML]\n') == '<p>hi</p>'
+
+
+def test_attachments_skipped():
+    payload = _gmail_payload(_gmail_part('text/plain', b'body'),
+                             _gmail_part('text/plain', b'attached notes', filename='notes.txt'))
+
+    assert get_body_text(payload) == 'body'
+
+
+def test_base64_chunks_carry_partial_quanta(monkeypatch):
+    # A chunk size that is not a multiple of 4 splits base64 quanta, and one
+    # that splits multibyte characters across chunks
+    monkeypatch.setattr(mime_text, 'CHUNK_SIZE', 7)
+    text = 'Grüße aus Köln – ' * 50
+
+    payload = _gmail_payload(_gmail_part('text/plain', text.encode('utf-8')))
+    assert get_body_text(payload) == text
+
+    msg = EmailMessage()
+    msg.set_content(text, cte='base64')
+    assert get_body_text(_parsed(msg.as_bytes())).rstrip('\n') == text
+
+
+def test_quoted_printable(monkeypatch):
+    monkeypatch.setattr(mime_text, 'CHUNK_SIZE', 16)
+    text = 'Invoice für März = 1.000 € ' * 20
+
+    msg = EmailMessage()
+    msg.set_content(text, cte='quoted-printable')
+
+    assert get_body_text(_parsed(msg.as_bytes())).rstrip('\n') == text
+
+
+def test_declared_charset_and_unknown_charset():
+    payload = _gmail_payload(_gmail_part('text/plain', 'café'.encode('latin-1'), charset='iso-8859-1'))
+    assert get_body_text(payload) == 'café'
+
+    payload = _gmail_payload(_gmail_part('text/plain', 'café'.encode('utf-8'), charset='x-no-such-charset'))
+    assert get_body_text(payload) == 'café'
+
+
+def test_max_bytes_truncates():
+    payload = _gmail_payload(_gmail_part('text/plain', b'a' * 1000))
+
+    chunks = list(iter_body_text(payload, max_bytes=100))
+
+    assert ''.join(chunks[:-1]) == 'a' * 100
+    assert chunks[-1] == '\n[Body truncated at 100 bytes]\n'
+
+
+def test_max_bytes_none_reads_everything():
+    payload = _gmail_payload(_gmail_part('text/plain', b'a' * (mime_text.MAX_BODY_BYTES + 10)))
+
+    assert get_body_text(payload, max_bytes=None) == 'a' * (mime_text.MAX_BODY_BYTES + 10)
+
+
+def test_nested_parts_in_document_order():
+    msg = EmailMessage()
+    msg.set_content('first')
+    msg.add_attachment(b'%PDF', maintype='application', subtype='pdf', filename='x.pdf')
+    outer = EmailMessage()
+    outer.make_mixed()
+    outer.attach(msg)
+    second = EmailMessage()
+    second.set_content('second')
+    outer.attach(second)
+
+    assert get_body_text(_parsed(outer.as_bytes())).split() == ['first', 'second']
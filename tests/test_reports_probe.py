@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import pytest
+
+from reports_activities import iter_activities
+from reports_probe import ActivityProbe, event_time, format_time
+from workspace_standin import ATTACKER_IPS
+
+
+def _all_events(service, start, end, **query):
+    return list(iter_activities(service, shards=1, userKey='all', applicationName='login',
+                                startTime=format_time(start), endTime=format_time(end), **query))
+
+
+@pytest.mark.parametrize('filters', [{}, {'actorIpAddress': ATTACKER_IPS[0]}])
+def test_first_and_last_match_full_listing(standin, filters):
+    tenant, api, service = standin
+    start, end = tenant.now - timedelta(days=30), tenant.now
+    events = _all_events(service, start, end, **filters)
+    assert events
+
+    probe = ActivityProbe(service, userKey='all', applicationName='login', **filters)
+
+    assert probe.last(start, end)['id'] == events[0]['id']
+    assert probe.first(start, end)['id'] == events[-1]['id']
+    # Bisection over a 30-day window at millisecond resolution
+    assert probe.calls < 50
+
+
+def test_first_with_no_match(standin):
+    tenant, api, service = standin
+    probe = ActivityProbe(service, userKey='all', applicationName='login', actorIpAddress='192.0.2.1')
+
+    assert probe.first(tenant.now - timedelta(days=30), tenant.now) is None
+    assert probe.last(tenant.now - timedelta(days=30), tenant.now) is None
+
+
+def test_intervals_cover_every_event(standin):
+    tenant, api, service = standin
+    start, end = tenant.now - timedelta(days=30), tenant.now
+    filters = {'actorIpAddress': ATTACKER_IPS[0]}
+    events = _all_events(service, start, end, **filters)
+
+    probe = ActivityProbe(service, userKey='all', applicationName='login', **filters)
+    intervals = probe.intervals(start, end, resolution=timedelta(hours=1))
+
+    assert intervals[0].end == event_time(events[0])
+    for event in events:
+        assert any(i.start <= event_time(event) <= i.end for i in intervals)
+    assert probe.calls <= 2 * len(intervals) + 1